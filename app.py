@@ -1,94 +1,131 @@
-from flask import Flask, render_template, request, jsonify
-import csv
+from flask import Flask, render_template, request, jsonify, abort, send_from_directory, url_for
 import os
 import io
+import csv
 import json
-import urllib.request
-import urllib.error
+import re
+import time
 from dotenv import load_dotenv
-import matcher
-import email_service
+import assets
+import csv_journal
+import metrics
+from participant_store import ParticipantStore
+from participants import Participant
+from progress import RegistrationProgress
+from supabase_client import SupabaseClient, SupabaseError
+# matcher, draw_jobs and delivery_ledger (which pull in the process pool and
+# the SMTP/ssl/email stack) are imported on first use: most serverless
+# invocations only serve / or /api/check_user
 
 # Load environment variables from .env file (if exists)
 load_dotenv()
 
 app = Flask(__name__)
 
+# Fingerprinted, precompressed static files (python assets.py builds them)
+static_assets = assets.Assets()
+
+@app.template_global()
+def asset_url(name):
+    # Falls back to the plain static file when the build step hasn't run
+    return static_assets.url(name) or url_for('static', filename=name)
+
 # CSV Configuration (Fallback)
 CSV_FILE = 'bbdd-amigoinvisible.csv'
+DRAW_STATE_FILE = 'bbdd-amigoinvisible.draw.json'
+DELIVERIES_FILE = 'bbdd-amigoinvisible.deliveries.csv'
 
 # Supabase Configuration
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 USE_SUPABASE = SUPABASE_URL and SUPABASE_KEY
+# Optional participants column holding the group key for multi-group draws
+SUPABASE_GROUP_COLUMN = os.environ.get("SUPABASE_GROUP_COLUMN")
+
+# Local SQLite database (see sqlite_store.py), used when Supabase is not configured
+SQLITE_DB = os.environ.get("SQLITE_DB")
+USE_SQLITE = not USE_SUPABASE and bool(SQLITE_DB)
 
 # Column mapping: Internal name -> CSV header / DB column
 COL_MAPPING = {
     'phone': 'ID',
     'name': 'nombre',
     'relationship': 'parentesco',
-    'email': 'email'
+    'email': 'email',
+    'group': 'grupo'  # Optional column
 }
 INV_COL_MAPPING = {v: k for k, v in COL_MAPPING.items()}
 
-def get_supabase_headers():
-    return {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
+# Keep-alive PostgREST client, shared by every request in this process
+supabase = SupabaseClient(SUPABASE_URL, SUPABASE_KEY) if USE_SUPABASE else None
+sqlite_db = None
+if USE_SQLITE:
+    from sqlite_store import SqliteStore
+    sqlite_db = SqliteStore(SQLITE_DB)
+
+def backend_name():
+    if USE_SUPABASE:
+        return 'supabase'
+    return 'sqlite' if USE_SQLITE else 'csv'
+
+def supabase_columns():
+    # Only the columns we use
+    columns = 'id,name,relationship,email'
+    if SUPABASE_GROUP_COLUMN:
+        columns += f',{SUPABASE_GROUP_COLUMN}'
+    return columns
+
+def participant_from_row(row):
+    return Participant(
+        str(row.get('id') or "").strip(),
+        row.get('name') or "",
+        row.get('relationship') or "",
+        row.get('email') or "",
+        str(row.get(SUPABASE_GROUP_COLUMN) or "") if SUPABASE_GROUP_COLUMN else ""
+    )
 
 def load_data():
     """
-    Returns a list of dictionaries with internal keys: phone, name, relationship, email
+    Returns a list of Participant records (phone, name, relationship, email)
     """
+    with metrics.LOAD_DATA_SECONDS.time(backend=backend_name()):
+        return _load_data()
+
+def _load_data():
     if USE_SUPABASE:
         try:
-            url = f"{SUPABASE_URL}/rest/v1/participants?select=*"
-            req = urllib.request.Request(url, headers=get_supabase_headers())
-            
-            with urllib.request.urlopen(req, timeout=10) as response:
-                if response.status != 200:
-                    print(f"Error loading from Supabase: Status {response.status}")
-                    return []
-                
-                # Manual decode
-                data = json.loads(response.read().decode('utf-8'))
-            
             normalized_data = []
-            if data:
-                for row in data:
-                    normalized_row = {
-                        'phone': str(row.get('id') or row.get('ID') or "").strip(),
-                        'name': row.get('name') or row.get('nombre') or "",
-                        'relationship': row.get('relationship') or row.get('parentesco') or "",
-                        'email': row.get('email') or ""
-                    }
-                    normalized_data.append(normalized_row)
+            for row in supabase.select('participants', columns=supabase_columns()):
+                normalized_data.append(participant_from_row(row))
             return normalized_data
-        except urllib.error.HTTPError as e:
-            print(f"HTTP Error in load_data: {e.code} - {e.read().decode()}")
+        except SupabaseError as e:
+            print(f"HTTP Error in load_data: {e.code} - {e.body}")
             return []
         except Exception as e:
             print(f"Error loading from Supabase: {e}")
             return []
 
-    # Fallback: Load from CSV
+    if USE_SQLITE:
+        try:
+            return sqlite_db.load_all()
+        except Exception as e:
+            print(f"Error loading from SQLite: {e}")
+            return []
+
+    # Fallback: Load from CSV (pending journal changes merged in)
     if not os.path.exists(CSV_FILE):
         return []
     
     data = []
     try:
-        with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                internal_row = {
-                    'phone': str(row.get(COL_MAPPING['phone'], '')).strip(),
-                    'name': row.get(COL_MAPPING['name'], ''),
-                    'relationship': row.get(COL_MAPPING['relationship'], ''),
-                    'email': row.get(COL_MAPPING['email'], '')
-                }
-                data.append(internal_row)
+        for row in csv_journal.read_rows(CSV_FILE):
+            data.append(Participant(
+                str(row.get(COL_MAPPING['phone'], '')).strip(),
+                row.get(COL_MAPPING['name'], ''),
+                row.get(COL_MAPPING['relationship'], ''),
+                row.get(COL_MAPPING['email'], ''),
+                row.get(COL_MAPPING['group']) or ''
+            ))
     except Exception as e:
         print(f"Error reading CSV: {e}")
         return []
@@ -96,71 +133,224 @@ def load_data():
     return data
 
 def save_email(phone, email):
+    backend = backend_name()
+    with metrics.SAVE_EMAIL_SECONDS.time(backend=backend, bulk='false'):
+        success, error_msg = _save_email(phone, email)
+    if not success:
+        metrics.SAVE_EMAIL_ERRORS.inc(backend=backend)
+    return success, error_msg
+
+def _save_email(phone, email):
     if USE_SUPABASE:
         try:
-            url = f"{SUPABASE_URL}/rest/v1/participants?id=eq.{phone}"
-            headers = get_supabase_headers()
-            headers["Prefer"] = "return=representation"
-            
-            # Prepare data
-            data = json.dumps({'email': email}).encode('utf-8')
-            
-            # PATCH method needs to be specified as Request doesn't support it directly via method arg in older python versions simply?
-            # method='PATCH' is supported in Python 3.3+
-            req = urllib.request.Request(url, data=data, headers=headers, method='PATCH')
-            
-            with urllib.request.urlopen(req, timeout=10) as response:
-                if response.status not in [200, 204]:
-                    return False, f"Supabase Error: Status {response.status}"
-                
-                response_data = json.loads(response.read().decode('utf-8'))
-                if not response_data:
-                     return False, "No se encontró el usuario para actualizar."
-                     
-                return True, ""
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8')
-            print(f"HTTP Error saving to Supabase: {e.code} - {error_body}")
-            return False, f"HTTP Error {e.code}: {error_body}"
+            updated = supabase.update('participants', f"id=eq.{phone}", {'email': email})
+            if not updated:
+                return False, "No se encontró el usuario para actualizar."
+            return True, ""
+        except SupabaseError as e:
+            print(f"HTTP Error saving to Supabase: {e.code} - {e.body}")
+            return False, f"HTTP Error {e.code}: {e.body}"
         except Exception as e:
             print(f"Error saving to Supabase: {e}")
             return False, str(e)
 
-    # Fallback: Save to CSV
+    if USE_SQLITE:
+        try:
+            return sqlite_db.update_email(phone, email)
+        except Exception as e:
+            print(f"Error saving to SQLite: {e}")
+            return False, str(e)
+
+    # Fallback: Save to CSV (appended to the journal, compacted periodically)
     try:
-        # We need to read all, update one, write all.
-        rows = []
-        updated = False
-        
         if not os.path.exists(CSV_FILE):
              return False, "Archivo CSV no encontrado"
 
-        fieldnames = ['ID', 'nombre', 'parentesco', 'email']
-        
-        with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                if str(row.get('ID', '')).strip() == phone:
-                    row['email'] = email
-                    updated = True
-                rows.append(row)
-        
-        if updated:
-            with open(CSV_FILE, mode='w', encoding='utf-8', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
-                writer.writeheader()
-                writer.writerows(rows)
-            return True, ""
-        
-        return False, "Usuario no encontrado en CSV"
+        return csv_journal.append_email(CSV_FILE, phone, email)
             
     except Exception as e:
         print(f"Error saving to CSV (Fallback): {e}")
         return False, str(e)
 
+# Rows per PostgREST upsert in bulk imports
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", "500"))
+
+def save_emails(emails):
+    """
+    Bulk version of save_email for a {phone: email} dict, in one batched write:
+    a single CSV rewrite, or chunked upserts on Supabase. Phones must already
+    be validated against the participant list.
+    Returns: (success, error_message, phones not found)
+    """
+    backend = backend_name()
+    with metrics.SAVE_EMAIL_SECONDS.time(backend=backend, bulk='true'):
+        success, error_msg, missing = _save_emails(emails)
+    if not success:
+        metrics.SAVE_EMAIL_ERRORS.inc(len(emails), backend=backend)
+    return success, error_msg, missing
+
+def _save_emails(emails):
+    if USE_SUPABASE:
+        phones = list(emails)
+        missing = []
+        try:
+            for start in range(0, len(phones), BULK_CHUNK_SIZE):
+                chunk = phones[start:start + BULK_CHUNK_SIZE]
+                # Upsert whole current rows: a partial {id, email} row fails
+                # NOT NULL checks and would insert phones that don't exist
+                quoted = ','.join(f'"{phone}"' for phone in chunk)
+                rows = list(supabase.select('participants', filters=f"id=in.({quoted})"))
+                found = {str(row.get('id')).strip() for row in rows}
+                missing.extend(phone for phone in chunk if phone not in found)
+                for row in rows:
+                    row['email'] = emails[str(row.get('id')).strip()]
+                if rows:
+                    supabase.upsert('participants', rows, 'id')
+            return True, "", missing
+        except SupabaseError as e:
+            print(f"HTTP Error bulk saving to Supabase: {e.code} - {e.body}")
+            return False, f"HTTP Error {e.code}: {e.body}", []
+        except Exception as e:
+            print(f"Error bulk saving to Supabase: {e}")
+            return False, str(e), []
+
+    if USE_SQLITE:
+        try:
+            return True, "", sqlite_db.update_emails(emails)
+        except Exception as e:
+            print(f"Error bulk saving to SQLite: {e}")
+            return False, str(e), []
+
+    try:
+        if not os.path.exists(CSV_FILE):
+            return False, "Archivo CSV no encontrado", []
+        return True, "", csv_journal.apply_emails(CSV_FILE, emails)
+    except Exception as e:
+        print(f"Error bulk saving to CSV (Fallback): {e}")
+        return False, str(e), []
+
+# Cached, phone-indexed view of load_data() shared by the request handlers
+participant_store = ParticipantStore(load_data, ttl=float(os.environ.get("PARTICIPANTS_CACHE_TTL", "30")))
+
+# Draw job state and delivery ledger live next to the participant data;
+# created by draw_backend() on first use
+draw_store = None
+ledger = None
+
+def draw_backend():
+    """
+    Returns (draw_store, ledger), importing the draw machinery the first time.
+    """
+    global draw_store, ledger
+    import draw_jobs
+    import delivery_ledger
+    if draw_store is None:
+        if USE_SUPABASE:
+            draw_store = draw_jobs.SupabaseJobStore(supabase)
+        elif USE_SQLITE:
+            draw_store = draw_jobs.FileJobStore(f"{SQLITE_DB}.draw.json")
+        else:
+            draw_store = draw_jobs.FileJobStore(DRAW_STATE_FILE)
+    if ledger is None:
+        if USE_SUPABASE:
+            ledger = delivery_ledger.SupabaseLedger(supabase)
+        elif USE_SQLITE:
+            ledger = delivery_ledger.SqliteLedger(sqlite_db)
+        else:
+            ledger = delivery_ledger.FileLedger(DELIVERIES_FILE)
+    return draw_store, ledger
+
+# Long-running servers can pay the imports at startup instead of on the first draw
+if os.environ.get("PRELOAD_MODULES", "false").lower() == "true":
+    draw_backend()
+
+def find_participant(phone):
+    """
+    SQLite answers with a single-row primary-key lookup; the other backends
+    go through the cached participant_store.
+    """
+    if USE_SQLITE:
+        return sqlite_db.get(phone)
+    return participant_store.get(phone)
+
+def registration_progress():
+    """
+    (registered, total) participants.
+    """
+    if USE_SQLITE:
+        return sqlite_db.progress()
+    all_participants = participant_store.all()
+    return sum(1 for p in all_participants if p.get('email')), len(all_participants)
+
+# Registered/total counters bumped on each registration; recounted with
+# registration_progress() every PROGRESS_RECONCILE_SECONDS
+registration_counter = RegistrationProgress(registration_progress, reconcile_every=float(os.environ.get("PROGRESS_RECONCILE_SECONDS", "60")))
+
+def is_admin_request(allow_query_key=False):
+    provided_key = request.headers.get('X-Admin-Key')
+    if provided_key is None and allow_query_key:
+        # EventSource can't send headers
+        provided_key = request.args.get('key')
+    admin_key = os.environ.get("ADMIN_SECRET_KEY")
+    return bool(admin_key) and provided_key == admin_key
+
+def check_auto_draw():
+    """
+    AUTO-DRAW: Execute draw when everyone is registered.
+    """
+    try:
+        progress = registration_counter.snapshot()
+
+        print(f"DEBUG: Registration progress: {progress['registered']}/{progress['total']}")
+
+        all_registered = False
+        if progress['complete']:
+            # Confirm against the backend before drawing
+            if not USE_SQLITE:
+                participant_store.refresh()
+            registration_counter.reconcile()
+            all_registered = registration_counter.snapshot()['complete']
+
+        if all_registered:
+            # Runs in the background; a draw already running or done is not repeated
+            import draw_jobs
+            store, draw_ledger = draw_backend()
+            job = draw_jobs.start_background_draw(store, load_data, draw_ledger, trigger='auto')
+            if job:
+                print(f"DEBUG: All registered! Automatic draw queued as job {job['id']}")
+            else:
+                print("DEBUG: All registered, but a draw is already running or completed")
+    except Exception as e:
+        print(f"DEBUG ERROR: Auto-draw failure: {e}")
+
+_index_page = {}
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # The page has no per-request content: render and compress it once
+    if not _index_page:
+        html = render_template('index.html').encode('utf-8')
+        _index_page.update(assets.compress(html), identity=html)
+    encoding = assets.pick_encoding(request.headers.get('Accept-Encoding'), _index_page)
+    headers = {'Content-Type': 'text/html; charset=utf-8', 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return _index_page[encoding or 'identity'], 200, headers
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """
+    Serves the best variant (Brotli/gzip, AVIF/WebP) of a fingerprinted file.
+    """
+    resolved = static_assets.resolve(filename, request.headers.get('Accept-Encoding'), request.headers.get('Accept'))
+    if resolved is None:
+        abort(404)
+    variant, mimetype, headers = resolved
+    response = send_from_directory(static_assets.dist_dir, variant, mimetype=mimetype)
+    # The variant's own name (e.g. .css.br) is not what the browser asked for
+    del response.headers['Content-Disposition']
+    response.headers.update(headers)
+    return response
 
 @app.route('/api/check_user', methods=['POST'])
 def check_user():
@@ -168,10 +358,8 @@ def check_user():
         data = request.json
         phone_input = str(data.get('phone')).strip()
         
-        participants = load_data()
-        
         # Find user
-        user = next((p for p in participants if p['phone'] == phone_input), None)
+        user = find_participant(phone_input)
         
         if not user:
             return jsonify({'found': False, 'message': 'Teléfono no encontrado'}), 200 # Return 200 for JSON visibility
@@ -192,105 +380,272 @@ def register_email():
         email_input = str(data.get('email')).strip()
         
         # Verify user exists first
-        participants = load_data()
-        user_exists = any(p['phone'] == phone_input for p in participants)
+        user = find_participant(phone_input)
         
-        if not user_exists:
+        if not user:
             return jsonify({'success': False, 'message': 'Usuario no encontrado'}), 200
+        # Read before update_email() changes the cached record
+        was_registered = bool(user.get('email'))
         
         # Save
         success, error_msg = save_email(phone_input, email_input)
         
         if not success:
              return jsonify({'success': False, 'message': f'Error guardando: {error_msg}'}), 200
-        
-        # --- AUTO-DRAW: Execute draw when everyone is registered ---
-        try:
-            # Re-load data to check updated status
-            all_participants = load_data()
-            emails_found = [p for p in all_participants if p.get('email')]
-            total_count = len(all_participants)
-            registered_count = len(emails_found)
-            
-            print(f"DEBUG: Registration progress: {registered_count}/{total_count}")
-            
-            if total_count > 0 and registered_count == total_count:
-                print("DEBUG: All registered! Executing automatic draw...")
-                
-                # Generate assignments
-                assignments = matcher.generate_assignments(emails_found)
-                
-                if assignments:
-                    print(f"DEBUG: Generated {len(assignments)} assignments. Sending emails...")
-                    for giver, receiver in assignments:
-                        success = email_service.send_assignment_email(
-                            giver['email'], 
-                            giver['name'], 
-                            receiver['name']
-                        )
-                        print(f"DEBUG: Email to {giver['name']}: {'OK' if success else 'FAILED'}")
-                    print("DEBUG: Automatic draw completed!")
-                else:
-                    print("DEBUG ERROR: Could not generate valid assignments")
-        except Exception as e:
-            print(f"DEBUG ERROR: Auto-draw failure: {e}")
-        # ---------------------------------------------
 
-        # Get user name again manually
-        user_name = next((p['name'] for p in participants if p['phone'] == phone_input), "")
+        participant_store.update_email(phone_input, email_input)
+        registration_counter.record(0 if was_registered else 1)
         
+        check_auto_draw()
+
         return jsonify({
             'success': True,
-            'message': f"Gracias {user_name}, tu correo ha sido registrado correctamente."
+            'message': f"Gracias {user['name']}, tu correo ha sido registrado correctamente."
         })
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
         return jsonify({'success': False, 'message': f'Error interno del servidor: {str(e)}'}), 200
 
-@app.route('/api/admin/draw', methods=['POST'])
-def run_draw():
+_EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def _read_bulk_rows():
+    """
+    Phone/email rows of a bulk import: a JSON list (or {"rows": [...]}), a CSV
+    body (text/csv) or an uploaded CSV 'file'. CSV headers can be the
+    internal names (phone, email) or the CSV file ones (ID, email).
+    Returns a list of {'phone', 'email'} dicts, or None if unreadable.
+    """
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        # utf-8-sig drops the BOM Excel puts in front of the header
+        text = (upload.read() if upload is not None else request.get_data()).decode('utf-8-sig')
+        first_line = text.split('\n', 1)[0]
+        reader = csv.DictReader(io.StringIO(text), delimiter=';' if ';' in first_line else ',')
+        return [
+            {INV_COL_MAPPING.get(key.strip(), key.strip()): (value or '') for key, value in row.items() if key}
+            for row in reader
+        ]
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+    return data
+
+@app.route('/api/admin/register_emails', methods=['POST'])
+def register_emails():
+    """
+    Bulk registration (e.g. an HR export): validates every row against one
+    participant snapshot and saves them all in a single batched write.
+    """
+    if not is_admin_request():
+        return jsonify({'success': False, 'message': 'No autorizado'}), 401
+
     try:
-        # 1. Verify Admin Secret Key (from header for security)
-        provided_key = request.headers.get('X-Admin-Key')
-        admin_key = os.environ.get("ADMIN_SECRET_KEY")
-        
-        if not admin_key or provided_key != admin_key:
-            return jsonify({'success': False, 'message': 'No autorizado'}), 401
-            
-        # 2. Load participants
-        participants = load_data()
-        
-        # 3. Filter only those who have provided an email
-        valid_participants = [p for p in participants if p.get('email')]
-        
-        if len(valid_participants) < 2:
-            return jsonify({'success': False, 'message': 'No hay suficientes participantes con email registrado'}), 400
-            
-        # 4. Generate assignments
-        assignments = matcher.generate_assignments(valid_participants)
-        
-        if not assignments:
-            return jsonify({'success': False, 'message': 'No se pudo generar un sorteo válido con las restricciones actuales'}), 500
-            
-        # 5. Send emails
+        rows = _read_bulk_rows()
+        if rows is None:
+            return jsonify({'success': False, 'message': 'Formato no válido: envía una lista JSON o un CSV con columnas phone/email'}), 400
+
+        participants = {p['phone']: p for p in participant_store.refresh()}
         results = []
-        for giver, receiver in assignments:
-            success = email_service.send_assignment_email(
-                giver['email'], 
-                giver['name'], 
-                receiver['name']
-            )
-            results.append({'giver': giver['name'], 'success': success})
-            
+        emails = {}
+        seen = set()
+        for number, row in enumerate(rows, start=1):
+            phone = str(row.get('phone') or '').strip()
+            email = str(row.get('email') or '').strip()
+            result = {'row': number, 'phone': phone, 'success': False}
+            results.append(result)
+            user = participants.get(phone)
+            if not user:
+                result['message'] = 'Teléfono no encontrado'
+            elif not _EMAIL_PATTERN.match(email):
+                result['message'] = 'Email no válido'
+            elif phone in seen:
+                result['message'] = 'Teléfono repetido en la importación'
+            elif user.get('email') == email:
+                result['success'] = True
+                result['message'] = 'Sin cambios'
+            else:
+                emails[phone] = email
+                result['message'] = 'Registrado'
+            if result['message'] in ('Registrado', 'Sin cambios'):
+                seen.add(phone)
+
+        if emails:
+            success, error_msg, missing = save_emails(emails)
+            if not success:
+                return jsonify({'success': False, 'message': f'Error guardando: {error_msg}'}), 500
+            missing = set(missing)
+            pending = [r for r in results if r['phone'] in emails and r['message'] == 'Registrado']
+            newly_registered = 0
+            for result in pending:
+                if result['phone'] in missing:
+                    result['message'] = 'Usuario no encontrado'
+                else:
+                    result['success'] = True
+                    newly_registered += not participants[result['phone']].get('email')
+                    participant_store.update_email(result['phone'], emails[result['phone']])
+            registration_counter.record(newly_registered)
+            check_auto_draw()
+
+        registered = sum(1 for r in results if r['message'] == 'Registrado')
+        failed = sum(1 for r in results if not r['success'])
         return jsonify({
             'success': True,
-            'message': f'Sorteo completado. Se enviaron {len(results)} correos.',
+            'message': f"{registered} correos registrados, {failed} filas con errores.",
+            'registered': registered,
+            'failed': failed,
             'results': results
         })
+    except Exception as e:
+        print(f"CRITICAL ERROR during bulk registration: {e}")
+        return jsonify({'success': False, 'message': f'Error interno: {str(e)}'}), 500
+
+def _run_draw(by_group):
+    try:
+        # 1. Verify Admin Secret Key (from header for security)
+        if not is_admin_request():
+            return jsonify({'success': False, 'message': 'No autorizado'}), 401
+
+        # Optional matcher mode, e.g. {"mode": "uniform"} or {"mode": "single_cycle"}
+        options = request.get_json(silent=True) or {}
+        mode = options.get('mode')
+        import draw_jobs
+        import matcher
+        if mode is not None and mode not in matcher.MODES:
+            return jsonify({'success': False, 'message': f"Modo de sorteo desconocido: {mode}"}), 400
+
+        # 2. Claim the draw slot so only one draw runs at a time, across processes
+        store, draw_ledger = draw_backend()
+        job = store.try_start(trigger='admin')
+        if not job:
+            return jsonify({'success': False, 'message': 'Ya hay un sorteo en curso'}), 409
+
+        # 3. Load, match and send (recorded in the job as it goes)
+        job = draw_jobs.run_draw_job(store, job, load_data, draw_ledger, by_group=by_group, mode=mode)
+
+        if job['status'] != 'done':
+            if job['reason'] == 'conflict':
+                response = {'success': False, 'message': job['message'], 'conflict': job['conflict']}
+                if 'groups' in job:
+                    response['groups'] = job['groups']
+                return jsonify(response), 400
+            status_code = 400 if job['reason'] == 'not_enough' else 500
+            return jsonify({'success': False, 'message': job['message']}), status_code
+
+        response = {
+            'success': True,
+            'message': job['message'],
+            'results': job['results']
+        }
+        if 'groups' in job:
+            response['groups'] = job['groups']
+        return jsonify(response)
         
     except Exception as e:
         print(f"CRITICAL ERROR during draw: {e}")
         return jsonify({'success': False, 'message': f'Error interno: {str(e)}'}), 500
 
+@app.route('/api/admin/draw', methods=['POST'])
+def run_draw():
+    # Draws per group automatically when participants have one
+    return _run_draw(by_group=None)
+
+@app.route('/api/admin/draw/groups', methods=['POST'])
+def run_group_draws():
+    """
+    Bulk draw: one independent draw per participant group, run in a process
+    pool, with a per-group report.
+    """
+    return _run_draw(by_group=True)
+
+@app.route('/api/admin/draw/resume', methods=['POST'])
+def resume_draw():
+    """
+    Re-sends only the emails of the last draw that were not delivered.
+    """
+    try:
+        if not is_admin_request():
+            return jsonify({'success': False, 'message': 'No autorizado'}), 401
+
+        import draw_jobs
+        store, draw_ledger = draw_backend()
+        current = store.get()
+        if not current:
+            return jsonify({'success': False, 'message': 'No hay ningún sorteo que reanudar'}), 404
+
+        job = store.try_resume(current['id'])
+        if not job:
+            return jsonify({'success': False, 'message': 'Ya hay un sorteo en curso'}), 409
+
+        job = draw_jobs.resume_draw_job(store, job, draw_ledger)
+
+        if job['status'] != 'done':
+            status_code = 404 if job['reason'] == 'not_found' else 500
+            return jsonify({'success': False, 'message': job['message']}), status_code
+
+        return jsonify({
+            'success': True,
+            'message': job['message'],
+            'results': job['results']
+        })
+
+    except Exception as e:
+        print(f"CRITICAL ERROR resuming draw: {e}")
+        return jsonify({'success': False, 'message': f'Error interno: {str(e)}'}), 500
+
+@app.route('/api/admin/metrics', methods=['GET'])
+def admin_metrics():
+    """
+    Latency histograms and counters of the hot paths, in Prometheus text format.
+    """
+    if not is_admin_request():
+        return jsonify({'success': False, 'message': 'No autorizado'}), 401
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# Keep-alive comment interval, and how long one stream stays open before the
+# browser reconnects (serverless platforms cut long responses anyway)
+PROGRESS_HEARTBEAT_SECONDS = 15
+PROGRESS_STREAM_SECONDS = float(os.environ.get("PROGRESS_STREAM_SECONDS", "300"))
+
+def _progress_events(duration):
+    deadline = time.monotonic() + duration
+    version = None
+    yield "retry: 3000\n\n"
+    while True:
+        progress = registration_counter.snapshot()
+        if progress['version'] != version:
+            version = progress['version']
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not registration_counter.wait(version, min(PROGRESS_HEARTBEAT_SECONDS, remaining)):
+            yield ": keep-alive\n\n"
+
+@app.route('/api/admin/progress', methods=['GET'])
+def admin_progress():
+    """
+    Server-sent events: a 'progress' event ({registered, total, complete,
+    version}) on connect and on every change. Accepts ?key= for EventSource.
+    """
+    if not is_admin_request(allow_query_key=True):
+        return jsonify({'success': False, 'message': 'No autorizado'}), 401
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return app.response_class(_progress_events(PROGRESS_STREAM_SECONDS), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/admin/draw/status', methods=['GET'])
+def draw_status():
+    if not is_admin_request():
+        return jsonify({'success': False, 'message': 'No autorizado'}), 401
+
+    try:
+        job = draw_backend()[0].get()
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error interno: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'job': job})
+
 if __name__ == '__main__':
     app.run(debug=True, port=8000)
@@ -0,0 +1,243 @@
+"""
+Optional asyncio serving mode. /api/check_user and /api/register_email run
+on the event loop, and their Supabase reads and writes go through
+AsyncSupabaseClient, so a slow upstream call suspends that request instead
+of holding a worker thread. Every other route (admin draws included) is the
+Flask app from app.py, run in a small thread pool so long draws, SMTP
+sessions and SSE streams never block the loop.
+
+    pip install uvicorn
+    uvicorn asgi:app --port 8000
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import app as flask_app
+import metrics
+from async_supabase import AsyncSupabaseClient
+from supabase_client import SupabaseError
+
+supabase = AsyncSupabaseClient(flask_app.SUPABASE_URL, flask_app.SUPABASE_KEY) if flask_app.USE_SUPABASE else None
+
+# Threads for the Flask routes and for the blocking CSV/SQLite backends
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("ASGI_THREADS", "8")), thread_name_prefix='asgi-sync')
+
+# Single-flight participant reload, like ParticipantStore's lock
+_load_lock = asyncio.Lock()
+
+def _in_thread(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+async def load_data():
+    """
+    Async load_data() for Supabase: [] on errors, like the blocking one.
+    """
+    with metrics.LOAD_DATA_SECONDS.time(backend='supabase'):
+        try:
+            rows = await supabase.select('participants', columns=flask_app.supabase_columns())
+            return [flask_app.participant_from_row(row) for row in rows]
+        except SupabaseError as e:
+            print(f"HTTP Error in load_data: {e.code} - {e.body}")
+            return []
+        except Exception as e:
+            print(f"Error loading from Supabase: {e}")
+            return []
+
+async def find_participant(phone):
+    if flask_app.USE_SQLITE:
+        return await _in_thread(flask_app.sqlite_db.get, phone)
+    store = flask_app.participant_store
+    if not store.is_fresh():
+        async with _load_lock:
+            if not store.is_fresh():
+                if supabase is None:
+                    await _in_thread(store.refresh)
+                else:
+                    store.replace(await load_data())
+    return store.peek(phone)
+
+async def save_email(phone, email):
+    if supabase is None:
+        return await _in_thread(flask_app.save_email, phone, email)
+    with metrics.SAVE_EMAIL_SECONDS.time(backend='supabase', bulk='false'):
+        success, error_msg = await _save_email(phone, email)
+    if not success:
+        metrics.SAVE_EMAIL_ERRORS.inc(backend='supabase')
+    return success, error_msg
+
+async def _save_email(phone, email):
+    try:
+        updated = await supabase.update('participants', f"id=eq.{phone}", {'email': email})
+        if not updated:
+            return False, "No se encontró el usuario para actualizar."
+        return True, ""
+    except SupabaseError as e:
+        print(f"HTTP Error saving to Supabase: {e.code} - {e.body}")
+        return False, f"HTTP Error {e.code}: {e.body}"
+    except Exception as e:
+        print(f"Error saving to Supabase: {e}")
+        return False, str(e)
+
+# --- Routes (same contracts as the Flask views) ---
+
+async def check_user(body):
+    try:
+        data = json.loads(body)
+        phone_input = str(data.get('phone')).strip()
+
+        user = await find_participant(phone_input)
+
+        if not user:
+            return {'found': False, 'message': 'Teléfono no encontrado'}
+
+        return {
+            'found': True,
+            'name': user['name'],
+            'message': f"Gracias {user['name']}"
+        }
+    except Exception as e:
+        return {'found': False, 'message': f'Error interno: {str(e)}'}
+
+async def register_email(body):
+    try:
+        data = json.loads(body)
+        phone_input = str(data.get('phone')).strip()
+        email_input = str(data.get('email')).strip()
+
+        user = await find_participant(phone_input)
+
+        if not user:
+            return {'success': False, 'message': 'Usuario no encontrado'}
+        was_registered = bool(user.get('email'))
+
+        success, error_msg = await save_email(phone_input, email_input)
+
+        if not success:
+            return {'success': False, 'message': f'Error guardando: {error_msg}'}
+
+        flask_app.participant_store.update_email(phone_input, email_input)
+        flask_app.registration_counter.record(0 if was_registered else 1)
+
+        # Only a recount or a possible draw needs the (blocking) check
+        counter = flask_app.registration_counter
+        if counter.stale() or counter.current()['complete']:
+            await _in_thread(flask_app.check_auto_draw)
+
+        return {
+            'success': True,
+            'message': f"Gracias {user['name']}, tu correo ha sido registrado correctamente."
+        }
+    except Exception as e:
+        print(f"CRITICAL ERROR: {e}")
+        return {'success': False, 'message': f'Error interno del servidor: {str(e)}'}
+
+ROUTES = {
+    '/api/check_user': check_user,
+    '/api/register_email': register_email,
+}
+
+# --- ASGI plumbing ---
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def _send_json(send, payload, status=200):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+def _environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = f"HTTP_{key}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def _call_flask(scope, body, send):
+    """
+    Runs the Flask app in the thread pool, sending its output chunk by chunk
+    (so the SSE progress stream still streams).
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    def first_chunk():
+        chunks = iter(flask_app.app.wsgi_app(_environ(scope, body), start_response))
+        return chunks, next(chunks, None)
+
+    chunks, chunk = await _in_thread(first_chunk)
+    try:
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await _in_thread(next, chunks, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(chunks, 'close'):
+            await _in_thread(chunks.close)
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if supabase is not None:
+                await supabase.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    body = await _read_body(receive)
+    handler = ROUTES.get(scope['path'])
+    if handler is not None and scope['method'] == 'POST':
+        await _send_json(send, await handler(body))
+    else:
+        await _call_flask(scope, body, send)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:app", port=int(os.environ.get("PORT", "8000")))
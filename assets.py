@@ -0,0 +1,216 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+
+# Build-only dependencies (requirements-build.txt); serving needs neither
+try:
+    import brotli
+except ImportError:  # Optional: builds without .br variants
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:  # Optional: builds without WebP/AVIF variants
+    Image = features = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'manifest.json'
+
+# Fingerprinted files never change, so browsers may keep them for a year
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+IMAGES = ('.png', '.jpg', '.jpeg')
+# Best first: served when the browser lists them in Accept-Encoding / Accept
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMAGE_FORMATS = (('image/avif', '.avif', {'quality': 50, 'speed': 4}), ('image/webp', '.webp', {'quality': 80, 'method': 6}))
+
+def _fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def missing_encoders():
+    """
+    Variants this environment can't produce, e.g. ['br'] without brotli.
+    """
+    missing = [] if brotli is not None else ['br']
+    for mimetype, suffix, _ in IMAGE_FORMATS:
+        if features is None or not features.check(suffix[1:]):
+            missing.append(mimetype)
+    return missing
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR, strict=False):
+    """
+    Build step: copies every static file to `dist_dir` under a content-hashed
+    name, with gzip/Brotli variants of text files and WebP/AVIF versions of
+    images (each kept only if smaller), and writes the manifest.
+    Missing encoders (see requirements-build.txt) raise RuntimeError when
+    `strict`, and otherwise print a warning.
+    Returns the manifest: {source name: {'file', 'type', 'size', 'encodings', 'formats'}}.
+    """
+    missing = missing_encoders()
+    if missing:
+        problem = f"cannot build {', '.join(missing)} variants: pip install -r requirements-build.txt"
+        if strict:
+            raise RuntimeError(problem)
+        print(f"WARNING: {problem}")
+
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    for name in sorted(os.listdir(static_dir)):
+        source = os.path.join(static_dir, name)
+        if not os.path.isfile(source):
+            continue
+        with open(source, 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(name)[1].lower()
+        hashed = _fingerprint(name, data)
+        _write(os.path.join(dist_dir, hashed), data)
+        entry = {
+            'file': hashed,
+            'type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'size': len(data),
+            'encodings': {},
+            'formats': {},
+        }
+
+        if ext in COMPRESSIBLE:
+            variants = compress(data)
+            for encoding, suffix in ENCODINGS:
+                if encoding in variants and len(variants[encoding]) < len(data):
+                    _write(os.path.join(dist_dir, hashed + suffix), variants[encoding])
+                    entry['encodings'][encoding] = {'file': hashed + suffix, 'size': len(variants[encoding])}
+
+        if ext in IMAGES and Image is not None:
+            image = Image.open(io.BytesIO(data))
+            for mimetype, suffix, options in IMAGE_FORMATS:
+                out = io.BytesIO()
+                try:
+                    image.save(out, suffix[1:].upper(), **options)
+                except (KeyError, OSError, ValueError):
+                    continue  # Pillow built without this encoder
+                if out.tell() < len(data):
+                    converted = os.path.splitext(hashed)[0] + suffix
+                    _write(os.path.join(dist_dir, converted), out.getvalue())
+                    entry['formats'][mimetype] = {'file': converted, 'size': out.tell()}
+
+        manifest[name] = entry
+
+    with open(os.path.join(dist_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(dist_dir=DIST_DIR):
+    """
+    The build manifest, or {} when the build step hasn't been run.
+    """
+    try:
+        with open(os.path.join(dist_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _accepted(header):
+    """
+    Values listed in an Accept / Accept-Encoding header with a non-zero q.
+    Wildcards don't count: a variant is only sent when asked for by name.
+    """
+    accepted = set()
+    for item in (header or '').split(','):
+        value, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if value:
+            accepted.add(value.strip().lower())
+    return accepted
+
+def compress(data):
+    """
+    {encoding: compressed bytes} for every available encoding.
+    """
+    # mtime=0 keeps the build reproducible
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+def pick_encoding(accept_encoding, available):
+    """
+    Best encoding in `available` the client accepts, or None for identity.
+    """
+    accepted = _accepted(accept_encoding)
+    for encoding, _ in ENCODINGS:
+        if encoding in accepted and encoding in available:
+            return encoding
+    return None
+
+class Assets:
+    """
+    Maps source names to fingerprinted URLs and picks the variant to serve
+    for a request's Accept-Encoding / Accept headers.
+    """
+
+    def __init__(self, dist_dir=DIST_DIR, url_prefix='/assets/'):
+        self.dist_dir = dist_dir
+        self.url_prefix = url_prefix
+        self.manifest = load_manifest(dist_dir)
+        self._by_file = {entry['file']: entry for entry in self.manifest.values()}
+
+    def url(self, name):
+        """
+        Fingerprinted URL of a static file, or None if it isn't in the manifest.
+        """
+        entry = self.manifest.get(name)
+        return self.url_prefix + entry['file'] if entry else None
+
+    def resolve(self, filename, accept_encoding='', accept=''):
+        """
+        Returns (file to send, mimetype, extra headers) or None if unknown.
+        """
+        entry = self._by_file.get(filename)
+        if entry is None:
+            return None
+        headers = {'Cache-Control': CACHE_CONTROL}
+
+        if entry['formats']:
+            headers['Vary'] = 'Accept'
+            accepted = _accepted(accept)
+            for mimetype, _, _ in IMAGE_FORMATS:
+                if mimetype in accepted and mimetype in entry['formats']:
+                    return entry['formats'][mimetype]['file'], mimetype, headers
+            return entry['file'], entry['type'], headers
+
+        if entry['encodings']:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = pick_encoding(accept_encoding, entry['encodings'])
+            if encoding:
+                headers['Content-Encoding'] = encoding
+                return entry['encodings'][encoding]['file'], entry['type'], headers
+        return entry['file'], entry['type'], headers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds static/dist and its manifest.")
+    parser.add_argument('--allow-missing', action='store_true', help='build without the variants whose encoder is not installed')
+    args = parser.parse_args()
+    built = build(strict=not args.allow_missing)
+    for name, entry in built.items():
+        variants = [f"{key} {value['size']}" for key, value in {**entry['encodings'], **entry['formats']}.items()]
+        print(f"{name} -> {entry['file']} ({entry['size']} bytes{', ' + ', '.join(variants) if variants else ''})")
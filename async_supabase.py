@@ -0,0 +1,145 @@
+"""
+asyncio PostgREST client for the ASGI entry point (asgi.py). Kept out of
+supabase_client.py so the WSGI app never imports asyncio.
+"""
+import asyncio
+import http.client
+import json
+import urllib.parse
+from supabase_client import SupabaseClient, SupabaseError, _select_query
+
+class AsyncSupabaseClient:
+    """
+    asyncio counterpart of SupabaseClient for the ASGI app (asgi.py): the
+    same keep-alive pooling over asyncio streams, so a slow PostgREST call
+    suspends one request instead of blocking a worker thread. Must be used
+    from a single event loop.
+    """
+
+    # Idle connections are cheap here; keep enough for every concurrent request
+    def __init__(self, base_url, key, pool_size=64, timeout=10):
+        parsed = urllib.parse.urlsplit(base_url)
+        self._https = parsed.scheme == 'https'
+        self._host = parsed.hostname
+        self._port = parsed.port or (443 if self._https else 80)
+        self._prefix = parsed.path.rstrip('/') + '/rest/v1/'
+        self._key = key
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._idle = []
+
+    _headers = SupabaseClient._headers
+
+    async def _new_connection(self):
+        # Bounded like the rest of the request: a stuck TCP/TLS connect can hang
+        return await asyncio.wait_for(asyncio.open_connection(
+            self._host, self._port, ssl=True if self._https else None,
+            server_hostname=self._host if self._https else None
+        ), self._timeout)
+
+    async def _exchange(self, reader, writer, method, url, data, headers):
+        lines = [f"{method} {url} HTTP/1.1", f"Host: {self._host}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(data) if data else 0}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (data or b''))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        status = int(status_line.split(b' ', 2)[1])
+        response_headers = http.client.HTTPMessage()
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip()] = value.strip()
+
+        if response_headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            payload = b''.join(chunks)
+        elif 'Content-Length' in response_headers:
+            payload = await reader.readexactly(int(response_headers['Content-Length']))
+        elif status in (204, 304):
+            payload = b''
+        else:
+            payload = await reader.read()
+            response_headers['Connection'] = 'close'
+        keep_alive = response_headers.get('Connection', '').lower() != 'close'
+        return status, response_headers, payload, keep_alive
+
+    async def request(self, method, path, body=None, headers=None):
+        """
+        Sends one request on a pooled connection.
+        Returns: (status, response headers, decoded JSON or None).
+        """
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        url = self._prefix + path
+        headers = self._headers(headers)
+
+        reused = bool(self._idle)
+        reader, writer = self._idle.pop() if reused else await self._new_connection()
+        try:
+            try:
+                status, response_headers, payload, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, url, data, headers), self._timeout)
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry on a fresh one
+                writer.close()
+                reader, writer = await self._new_connection()
+                status, response_headers, payload, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, url, data, headers), self._timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive and len(self._idle) < self._pool_size:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+        text = payload.decode('utf-8')
+        if status >= 400:
+            raise SupabaseError(status, text)
+        return status, response_headers, json.loads(text) if text else None
+
+    async def select(self, table, columns='*', filters='', page_size=1000, order='id'):
+        """
+        Every matching row, fetched page by page using Range headers
+        (ordered as in SupabaseClient.select).
+        """
+        query = _select_query(table, columns, filters, order)
+        rows = []
+        offset = 0
+        while True:
+            _, _, page = await self.request('GET', query, headers={
+                "Range-Unit": "items",
+                "Range": f"{offset}-{offset + page_size - 1}"
+            })
+            page = page or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+
+    async def update(self, table, filters, data):
+        """
+        PATCH matching rows. Returns the updated rows.
+        """
+        _, _, rows = await self.request('PATCH', f"{table}?{filters}", data, {"Prefer": "return=representation"})
+        return rows or []
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
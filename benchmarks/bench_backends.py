@@ -0,0 +1,85 @@
+"""
+Lookup and registration latency of the three participant backends at each
+table size, without the app's in-process cache:
+
+  csv       - full rescan per lookup (csv_journal.read_rows), journal append per registration
+  sqlite    - primary-key lookup and single-row UPDATE (sqlite_store)
+  supabase  - id=eq filter and PATCH against the local PostgREST stub
+
+    python -m benchmarks.bench_backends [--ops N] [count ...]
+
+The stub scans and filters rows in Python on every request, so its numbers
+measure the stub rather than Postgres, which would use the primary-key index.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv_journal
+import sqlite_store
+from stubs.postgrest_server import StubPostgRESTServer
+from supabase_client import SupabaseClient
+
+def _phone(i):
+    return str(600000000 + i)
+
+def _write_csv(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('ID;nombre;parentesco;email\n')
+        for i in range(count):
+            f.write(f'{_phone(i)};P{i};P{(i + 1) % count};\n')
+
+def _timed(fn, phones):
+    samples = []
+    for phone in phones:
+        start = time.perf_counter()
+        fn(phone)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0]
+
+def _report(backend, count, operation, timings):
+    median, p95 = timings
+    print(f"{backend:9} {count:>8} {operation:13} median {median:9.3f} ms  p95 {p95:9.3f} ms")
+
+def run(counts=(10000, 1000000), ops=20):
+    for count in counts:
+        phones = [_phone(random.randrange(count)) for _ in range(ops)]
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'participants.csv')
+            _write_csv(csv_path, count)
+
+            def csv_lookup(phone):
+                return next(row for row in csv_journal.read_rows(csv_path) if row['ID'] == phone)
+            _report('csv', count, 'lookup', _timed(csv_lookup, phones))
+            _report('csv', count, 'registration', _timed(lambda p: csv_journal.append_email(csv_path, p, f'{p}@test.com'), phones))
+
+            db_path = os.path.join(tmp, 'participants.db')
+            sqlite_store.migrate(csv_path, db_path)
+            db = sqlite_store.SqliteStore(db_path)
+            _report('sqlite', count, 'lookup', _timed(db.get, phones))
+            _report('sqlite', count, 'registration', _timed(lambda p: db.update_email(p, f'{p}@test.com'), phones))
+            db.close()
+
+        rows = [{'id': _phone(i), 'name': f'P{i}', 'relationship': '', 'email': ''} for i in range(count)]
+        server = StubPostgRESTServer({'participants': rows}).start()
+        client = SupabaseClient(server.url, server.key)
+        try:
+            _report('supabase', count, 'lookup', _timed(lambda p: list(client.select('participants', filters=f"id=eq.{p}")), phones))
+            _report('supabase', count, 'registration', _timed(lambda p: client.update('participants', f"id=eq.{p}", {'email': f'{p}@test.com'}), phones))
+        finally:
+            client.close()
+            server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=20)
+    parser.add_argument('counts', nargs='*', type=int, default=[10000, 1000000])
+    args = parser.parse_args()
+    run(args.counts, args.ops)
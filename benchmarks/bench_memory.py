@@ -0,0 +1,56 @@
+"""
+Peak RSS of a draw over N synthetic participants, each mode in its own
+process:
+
+  dicts  - participants as dicts plus the deepcopy + shuffle the matcher
+           used to do on every draw
+  slots  - Participant records and the index-based matcher
+
+    python -m benchmarks.bench_memory [count]
+"""
+import copy
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _peak_rss_mb():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_mode(mode, count):
+    start = time.perf_counter()
+    if mode == 'dicts':
+        participants = [
+            {'phone': str(600000000 + i), 'name': f'P{i}', 'relationship': f'P{(i + 1) % count}', 'email': f'p{i}@test.com'}
+            for i in range(count)
+        ]
+        receivers = copy.deepcopy(participants)
+        random.shuffle(receivers)
+        assignments = list(zip(participants, receivers))
+    else:
+        import matcher
+        from participants import Participant
+        participants = [
+            Participant(str(600000000 + i), f'P{i}', f'P{(i + 1) % count}', f'p{i}@test.com')
+            for i in range(count)
+        ]
+        assignments = matcher.generate_assignments(participants)
+    elapsed = time.perf_counter() - start
+    print(f"{mode}: {len(assignments)} assignments, peak RSS {_peak_rss_mb():.0f} MB, {elapsed:.1f}s")
+
+def run(count=1000000):
+    for mode in ('dicts', 'slots'):
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--mode', mode, str(count)], check=True)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ['--mode']:
+        _run_mode(args[1], int(args[2]))
+    else:
+        run(int(args[0]) if args else 1000000)
@@ -0,0 +1,58 @@
+"""
+Bytes transferred for one page view (HTML + CSS + JS, and the reyes-magos
+image when a page shows it) through the Flask test client:
+
+  before  - plain files from Flask's /static handler, no compression
+  after   - fingerprinted /assets/ URLs from the manifest, Brotli/gzip and
+            AVIF/WebP picked from the request headers of a current browser
+
+    python -m benchmarks.bench_page_weight
+
+Run `python assets.py` first. Repeat views cost nothing for /assets/ files
+(immutable caching); /static/ files are revalidated on every view.
+"""
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, static_assets
+
+BROWSER = {
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept': 'image/avif,image/webp,image/apng,*/*;q=0.8',
+}
+
+def _fetch(client, url, headers=None):
+    response = client.get(url, headers=headers or {})
+    assert response.status_code == 200, url
+    return len(response.data)
+
+def run():
+    client = app.test_client()
+    files = ('style.css', 'script.js', 'reyes-magos.png')
+
+    before = {'/': _fetch(client, '/', {'Accept-Encoding': 'identity'})}
+    for name in files:
+        before[name] = _fetch(client, f'/static/{name}')
+
+    page = client.get('/', headers=BROWSER)
+    after = {'/': len(page.data)}
+    html = page.get_data() if not page.headers.get('Content-Encoding') else client.get('/').get_data()
+    linked = re.findall(rb'(?:href|src)="(/assets/[^"]+)"', html)
+    for name in files:
+        url = static_assets.url(name)
+        assert name == 'reyes-magos.png' or url.encode() in linked, name
+        after[name] = _fetch(client, url, BROWSER)
+
+    print(f"{'':18}{'before':>10}{'after':>10}")
+    for key in before:
+        print(f"{key:18}{before[key]:>10}{after[key]:>10}")
+    for label, keys in (('page (no image)', ('/', 'style.css', 'script.js')), ('page + image', tuple(before))):
+        old, new = sum(before[k] for k in keys), sum(after[k] for k in keys)
+        print(f"{label:18}{old:>10}{new:>10}   -{1 - new / old:.0%}")
+    return before, after
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+"""
+Messages per second for one SMTP session per email (send_assignment_email)
+versus a reused session and four parallel reused sessions
+(send_assignment_emails), against a local stub that
+simulates the handshake/login cost of a real provider.
+
+    python -m benchmarks.bench_smtp [count] [connect_delay_seconds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_service
+from stubs.smtp_server import StubSMTPServer
+
+def _assignments(count):
+    people = [{'name': f'P{i}', 'email': f'p{i}@test.com'} for i in range(count)]
+    return [(people[i], people[(i + 1) % count]) for i in range(count)]
+
+def run(count=200, connect_delay=0.02, message_delay=0.002):
+    server = StubSMTPServer(connect_delay=connect_delay, message_delay=message_delay).start()
+    os.environ.update(server.env())
+    assignments = _assignments(count)
+    results = {}
+    try:
+        start = time.perf_counter()
+        for giver, receiver in assignments:
+            email_service.send_assignment_email(giver['email'], giver['name'], receiver['name'])
+        elapsed = time.perf_counter() - start
+        results['per_message_session'] = count / elapsed
+
+        start = time.perf_counter()
+        email_service.send_assignment_emails(assignments, rate=0, workers=1)
+        elapsed = time.perf_counter() - start
+        results['pooled_session'] = count / elapsed
+
+        start = time.perf_counter()
+        email_service.send_assignment_emails(assignments, rate=0, workers=4)
+        elapsed = time.perf_counter() - start
+        results['pooled_4_sessions'] = count / elapsed
+    finally:
+        server.stop()
+    return results
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    for mode, rate in run(count, delay).items():
+        print(f"{mode}: {rate:.1f} msg/s")
@@ -0,0 +1,89 @@
+"""
+Messages per second rendered for N recipients (nothing is sent):
+
+  legacy    - the old per-message f-string + MIMEMultipart tree + as_string()
+  template  - email_templates: parsed once, bound to the event once, then
+              only names substituted per recipient
+
+    python -m benchmarks.bench_templates [count]
+"""
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_service
+
+def _legacy_message(sender_email, to_email, giver_name, receiver_name):
+    """
+    The previous email_service.build_assignment_message, kept for comparison.
+    """
+    subject = "🎅 Tu Amigo Invisible 2026 es..."
+    
+    # HTML Body
+    html = f"""
+    <html>
+      <body style="font-family: Arial, sans-serif; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #eee; border-radius: 10px;">
+            <h1 style="color: #d42426; text-align: center;">🎁 Amigo Invisible 2026 🎁</h1>
+            <p><strong>¡Hola {giver_name}!</strong></p>
+            <p>Ya se ha realizado el sorteo. Este año te ha tocado regalar a:</p>
+            
+            <div style="background-color: #f9f9f9; padding: 15px; text-align: center; margin: 20px 0; border-radius: 5px;">
+                <h2 style="color: #0c0; margin: 0; font-size: 24px;">✨ {receiver_name} ✨</h2>
+            </div>
+
+            <div style="background-color: #fff5f5; border: 1px solid #d42426; padding: 15px; margin: 20px 0; border-radius: 8px;">
+                <h3 style="color: #d42426; margin-top: 0; font-size: 16px; text-align: center;">📜 NORMAS DE PARTICIPACIÓN</h3>
+                <ul style="font-size: 14px; color: #555; padding-left: 20px; line-height: 1.5;">
+                    <li>💰 El importe máximo es de <strong>30 €</strong></li>
+                    <li>🎫 Hay que incluir <strong>ticket regalo</strong></li>
+                    <li>💭 Si se piensa en el regalado es más fácil acertar :)</li>
+                </ul>
+            </div>
+            
+            <p style="text-align: center; font-size: 12px; color: #777;">
+                (Shhh... es un secreto. No se lo digas a nadie)
+            </p>
+            <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
+            <p style="text-align: center; font-size: 10px; color: #999;">
+                Este mensaje ha sido enviado automáticamente por el sistema de Amigo Invisible de la Familia.
+            </p>
+        </div>
+      </body>
+    </html>
+    """
+
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender_email
+    message["To"] = to_email
+    message.attach(MIMEText(html, "html"))
+    return message.as_string()
+
+
+def run(count=100000):
+    people = [(f'p{i}@test.com', f'Participante {i}', f'Participante {(i + 1) % count}') for i in range(count)]
+    results = {}
+
+    start = time.perf_counter()
+    for to_email, giver, receiver in people:
+        _legacy_message('santa@test.com', to_email, giver, receiver)
+    results['legacy'] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    template = email_service.assignment_template()
+    for to_email, giver, receiver in people:
+        email_service.build_assignment_message('santa@test.com', to_email, giver, receiver, template)
+    results['template'] = count / (time.perf_counter() - start)
+
+    for name, rate in results.items():
+        print(f"{name}: {rate:.0f} messages/s")
+    print(f"speedup: {results['template'] / results['legacy']:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
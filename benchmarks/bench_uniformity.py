@@ -0,0 +1,51 @@
+"""
+How far each matcher mode is from a uniform draw on a small instance whose
+valid assignments can be enumerated, plus the time per draw:
+
+    python -m benchmarks.bench_uniformity [draws]
+"""
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matcher
+
+PARTICIPANTS = [
+    {'name': 'Ricardo', 'relationship': 'Liliana'},
+    {'name': 'Liliana', 'relationship': 'Ricardo'},
+    {'name': 'Juan', 'relationship': ''},
+    {'name': 'Maria', 'relationship': ''},
+    {'name': 'Pedro', 'relationship': 'Juan'},
+    {'name': 'Eva', 'relationship': 'Maria, Pedro'},
+]
+
+def _exact(participants):
+    counts, valid = {}, 0
+    for perm in itertools.permutations(range(len(participants))):
+        if all(matcher.is_valid_assignment(participants[i], participants[r]) for i, r in enumerate(perm)):
+            valid += 1
+            for pair in enumerate(perm):
+                counts[pair] = counts.get(pair, 0) + 1
+    return {pair: c / valid for pair, c in counts.items()}
+
+def run(draws=20000, seed=2026):
+    expected = _exact(PARTICIPANTS)
+    index = {id(p): i for i, p in enumerate(PARTICIPANTS)}
+    for mode in matcher.MODES:
+        random.seed(seed)
+        observed = {}
+        start = time.perf_counter()
+        for _ in range(draws):
+            for giver, receiver in matcher.generate_assignments(PARTICIPANTS, mode=mode):
+                pair = (index[id(giver)], index[id(receiver)])
+                observed[pair] = observed.get(pair, 0) + 1
+        elapsed = time.perf_counter() - start
+        worst = max(abs(observed.get(pair, 0) / draws - p) for pair, p in expected.items())
+        print(f"{mode}: max pair-probability deviation {worst:.4f}, {elapsed / draws * 1e6:.0f} us/draw")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
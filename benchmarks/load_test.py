@@ -0,0 +1,204 @@
+"""
+Load test of the registration endpoints under a slow upstream: concurrent
+clients mixing /api/check_user and /api/register_email against each serving
+mode, with Supabase replaced by the local PostgREST stub (every call delayed
+by --latency seconds).
+
+  flask-pool  - app.py on a fixed pool of --threads worker threads
+                (the shape of gunicorn --threads or a serverless instance)
+  flask-dev   - app.py on Werkzeug's thread-per-request dev server
+  asgi        - asgi.py on uvicorn (pip install uvicorn)
+
+    python -m benchmarks.load_test [--requests N] [--concurrency C]
+                                   [--latency S] [--threads T] [--json]
+
+Each server runs in its own process; every request uses a fresh connection.
+The stub filters rows in Python on every call, so the table is kept small
+(PARTICIPANTS) to keep the stub from becoming the bottleneck.
+server_cpu_ms is the server process's CPU time per timed request (Linux).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stubs.postgrest_server import StubPostgRESTServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARTICIPANTS = 200
+
+_FLASK_POOL = """
+import logging, sys
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+import app
+
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+class PooledServer(BaseWSGIServer):
+    def __init__(self, port, threads):
+        super().__init__('127.0.0.1', port, app.app)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+PooledServer(int(sys.argv[1]), int(sys.argv[2])).serve_forever()
+"""
+
+_FLASK_DEV = """
+import logging, sys
+from werkzeug.serving import make_server
+import app
+
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+make_server('127.0.0.1', int(sys.argv[1]), app.app, threaded=True).serve_forever()
+"""
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _start(mode, port, threads, env):
+    if mode == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    elif mode == 'flask-pool':
+        command = [sys.executable, '-c', _FLASK_POOL, str(port), str(threads)]
+    else:
+        command = [sys.executable, '-c', _FLASK_DEV, str(port)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+async def _post(port, path, payload):
+    body = json.dumps(payload).encode('utf-8')
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode('ascii') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+def _workload(count, seed):
+    """
+    Half lookups, half registrations; the last participant never registers,
+    so the auto-draw doesn't fire mid-run.
+    """
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        phone = str(600000000 + rng.randrange(PARTICIPANTS - 1))
+        if i % 2:
+            requests.append(('/api/register_email', {'phone': phone, 'email': f'{phone}@test.com'}))
+        else:
+            requests.append(('/api/check_user', {'phone': phone}))
+    return requests
+
+async def _drive(port, requests, concurrency):
+    latencies = []
+    errors = 0
+    pending = iter(requests)
+
+    async def client():
+        nonlocal errors
+        for path, payload in pending:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(_post(port, path, payload), 30)
+                errors += status != 200
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def _cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime, fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def run_mode(mode, requests=2000, concurrency=64, latency=0.05, threads=8):
+    rows = [{'id': str(600000000 + i), 'name': f'P{i}', 'relationship': '', 'email': ''} for i in range(PARTICIPANTS)]
+    stub = StubPostgRESTServer({'participants': rows}, latency=latency).start()
+    env = dict(os.environ, **stub.env(), PRELOAD_MODULES='false', ASGI_THREADS=str(threads))
+    env.pop('SQLITE_DB', None)
+    port = _free_port()
+    process = _start(mode, port, threads, env)
+    try:
+        # Warm-up: loads the participant cache before timing
+        asyncio.run(_drive(port, _workload(concurrency, seed=1), concurrency))
+        cpu_before = _cpu_seconds(process.pid)
+        elapsed, latencies, errors = asyncio.run(_drive(port, _workload(requests, seed=2), concurrency))
+        cpu_after = _cpu_seconds(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        stub.stop()
+    latencies.sort()
+    return {
+        'requests_per_s': requests / elapsed,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'errors': errors,
+        'server_cpu_ms': (cpu_after - cpu_before) * 1000 / requests if cpu_before is not None else None,
+    }
+
+def run(modes=('flask-pool', 'flask-dev', 'asgi'), as_json=False, **options):
+    report = {}
+    for mode in modes:
+        report[mode] = run_mode(mode, **options)
+        if not as_json:
+            result = report[mode]
+            print(f"{mode:11} {result['requests_per_s']:8.1f} req/s   p50 {result['p50_ms']:8.1f} ms   "
+                  f"p95 {result['p95_ms']:8.1f} ms   p99 {result['p99_ms']:8.1f} ms   errors {result['errors']}"
+                  + (f"   server cpu {result['server_cpu_ms']:.2f} ms/req" if result['server_cpu_ms'] is not None else ""), flush=True)
+    if as_json:
+        print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every PostgREST call')
+    parser.add_argument('--threads', type=int, default=8, help='worker threads of flask-pool (and the ASGI sync pool)')
+    parser.add_argument('--modes', default='flask-pool,flask-dev,asgi')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    run(tuple(args.modes.split(',')), as_json=args.json, requests=args.requests,
+        concurrency=args.concurrency, latency=args.latency, threads=args.threads)
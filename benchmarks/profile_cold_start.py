@@ -0,0 +1,99 @@
+"""
+Cold-start profile of app.py, as a fresh serverless instance sees it: each
+run is a new interpreter that imports the app and serves GET / and one
+POST /api/check_user through the Flask test client.
+
+  lazy     - default: the draw machinery is imported on first use
+  preload  - PRELOAD_MODULES=true: everything imported at startup (the old behaviour)
+
+    python -m benchmarks.profile_cold_start [runs] [--json]
+
+Also lists the slowest top-level imports (python -X importtime) per mode.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/')
+client.post('/api/check_user', json={'phone': '000'})
+done = time.perf_counter()
+import sys, json
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_response_ms': (done - start) * 1000,
+                  'modules': len(sys.modules)}))
+"""
+
+def _env(mode):
+    env = dict(os.environ, PRELOAD_MODULES='true' if mode == 'preload' else 'false')
+    # Profile the CSV fallback; no network round trips in the numbers
+    env.pop('SUPABASE_URL', None)
+    env.pop('SUPABASE_KEY', None)
+    env.pop('SQLITE_DB', None)
+    return env
+
+def _measure(mode):
+    output = subprocess.run([sys.executable, '-c', _CHILD], cwd=ROOT, env=_env(mode),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def _slowest_imports(mode, top=8):
+    """
+    Top-level modules imported by app.py, by cumulative import time (ms).
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=_env(mode),
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                rows.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative) / 1000))
+    # importtime prints children before their parent: app's direct imports
+    # are the depth-2 lines between the previous top-level line and app's own
+    end = next(i for i, (depth, name, _) in enumerate(rows) if depth == 1 and name == 'app')
+    start = max((i for i in range(end) if rows[i][0] == 1), default=-1) + 1
+    modules = [(name, ms) for depth, name, ms in rows[start:end] if depth == 3]
+    return sorted(modules, key=lambda m: m[1], reverse=True)[:top]
+
+def run(runs=30, as_json=False):
+    modes = ('preload', 'lazy')
+    samples = {mode: [] for mode in modes}
+    # Interleaved, so machine noise hits both modes alike
+    for _ in range(runs):
+        for mode in modes:
+            samples[mode].append(_measure(mode))
+
+    report = {}
+    for mode in modes:
+        report[mode] = {
+            'import_ms': statistics.median(s['import_ms'] for s in samples[mode]),
+            'first_response_ms': statistics.median(s['first_response_ms'] for s in samples[mode]),
+            'first_response_min_ms': min(s['first_response_ms'] for s in samples[mode]),
+            'modules_loaded': samples[mode][-1]['modules'],
+            'slowest_imports_ms': dict(_slowest_imports(mode)),
+        }
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return report
+
+    for mode, result in report.items():
+        print(f"{mode:8} import {result['import_ms']:7.1f} ms   first response {result['first_response_ms']:7.1f} ms "
+              f"(min {result['first_response_min_ms']:.1f})   {result['modules_loaded']} modules")
+        for name, ms in result['slowest_imports_ms'].items():
+            print(f"           {name:20} {ms:7.1f} ms")
+    saved = report['preload']['first_response_ms'] - report['lazy']['first_response_ms']
+    print(f"lazy startup saves {saved:.1f} ms ({saved / report['preload']['first_response_ms']:.0%}) to first response")
+    return report
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--json']
+    run(int(args[0]) if args else 30, '--json' in sys.argv)
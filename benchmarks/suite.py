@@ -0,0 +1,289 @@
+"""
+Repeatable benchmark suite with machine-readable output, to compare versions:
+
+  matcher  - generate_assignments over synthetic populations of several sizes
+             and exclusion densities (success rate, swap tries, wall time)
+  groups   - draw_groups with a few large groups and with thousands of small
+             ones, inline (workers=1) and on the process pool
+  storage  - app.load_data on the CSV, SQLite and Supabase (PostgREST stub) backends
+  flows    - /api/register_email and /api/admin/draw through the Flask test
+             client on each backend, with the local SMTP stub
+
+    python -m benchmarks.suite [--quick] [--only matcher,groups,storage,flows]
+                               [--output results.json] [--compare baseline.json]
+
+Every measurement is printed as one JSON line. --output writes the whole run
+(with environment info) to a file; --compare reads such a file and exits
+with status 1 when a timing got slower than --tolerance (default 25%).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matcher
+from participants import Participant
+
+SEED = 2026
+
+def _is_timing(metric):
+    # Durations, where a higher value is a regression (not rates like rows_per_s)
+    return metric.endswith(('_s', '_ms')) and '_per_' not in metric
+
+def _population(count, density, emails=False):
+    """
+    `count` participants, each excluding `density` random others by name.
+    """
+    rng = random.Random(SEED + count + density)
+    people = []
+    for i in range(count):
+        excluded = ', '.join(f'P{rng.randrange(count)}' for _ in range(density))
+        people.append(Participant(str(600000000 + i), f'P{i}', excluded, f'p{i}@test.com' if emails else ''))
+    return people
+
+def _emit(results, suite, name, params, metrics):
+    record = {'suite': suite, 'name': name, 'params': params, 'metrics': metrics}
+    results.append(record)
+    print(json.dumps(record), flush=True)
+
+def bench_matcher(results, sizes, densities, runs):
+    for count in sizes:
+        for density in densities:
+            people = _population(count, density)
+            random.seed(SEED)
+            times, tries, paths, successes = [], [], [], 0
+            for _ in range(runs):
+                stats = {}
+                start = time.perf_counter()
+                assignments = matcher.generate_assignments(people, stats=stats)
+                times.append(time.perf_counter() - start)
+                successes += assignments is not None
+                tries.append(stats.get('swap_tries', 0))
+                paths.append(stats.get('augmenting_paths', 0))
+            _emit(results, 'matcher', 'generate_assignments', {'participants': count, 'exclusions_per_person': density, 'runs': runs}, {
+                'success_rate': successes / runs,
+                'swap_tries_mean': statistics.mean(tries),
+                'augmenting_paths_mean': statistics.mean(paths),
+                'median_s': statistics.median(times),
+                'max_s': max(times),
+            })
+
+def bench_groups(results, shapes, runs):
+    for groups, size in shapes:
+        people = _population(groups * size, 1)
+        for i, p in enumerate(people):
+            # Exclusions are drawn from the whole population, so most fall outside the group
+            p.group = f'G{i // size}'
+        for workers in (1, None):
+            random.seed(SEED)
+            times, drawn = [], 0
+            for _ in range(runs):
+                start = time.perf_counter()
+                assignments, report = matcher.draw_groups(people, workers=workers)
+                times.append(time.perf_counter() - start)
+                drawn = sum(1 for group in report.values() if group['success'])
+            _emit(results, 'groups', 'draw_groups', {
+                'groups': groups, 'group_size': size, 'pool': workers is None, 'runs': runs,
+            }, {
+                'groups_drawn': drawn,
+                'parallel': workers != 1 and groups > 1 and groups * size >= matcher.PARALLEL_THRESHOLD,
+                'median_s': statistics.median(times),
+            })
+
+def _write_csv(path, people):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('ID;nombre;parentesco;email\n')
+        for p in people:
+            f.write(f'{p.phone};{p.name};{p.relationship};{p.email}\n')
+
+@contextlib.contextmanager
+def _app_backend(backend, people, tmp):
+    """
+    Points the app module at a fresh `backend` ('csv', 'sqlite' or 'supabase')
+    holding `people`, the way the app would be configured through env vars.
+    """
+    import app as app_module
+    import delivery_ledger
+    import draw_jobs
+    import sqlite_store
+    from participant_store import ParticipantStore
+    from stubs.postgrest_server import StubPostgRESTServer
+    from supabase_client import SupabaseClient
+
+    saved = {name: getattr(app_module, name) for name in (
+        'USE_SUPABASE', 'USE_SQLITE', 'CSV_FILE', 'supabase', 'sqlite_db', 'participant_store', 'draw_store', 'ledger')}
+    server = None
+    try:
+        csv_path = os.path.join(tmp, f'{backend}.csv')
+        _write_csv(csv_path, people)
+        app_module.USE_SUPABASE = backend == 'supabase'
+        app_module.USE_SQLITE = backend == 'sqlite'
+        app_module.CSV_FILE = csv_path
+        app_module.draw_store = draw_jobs.FileJobStore(os.path.join(tmp, f'{backend}.draw.json'))
+        app_module.ledger = delivery_ledger.FileLedger(os.path.join(tmp, f'{backend}.deliveries.csv'))
+        if backend == 'sqlite':
+            db_path = os.path.join(tmp, 'participants.db')
+            with contextlib.redirect_stdout(sys.stderr):
+                sqlite_store.migrate(csv_path, db_path)
+            app_module.sqlite_db = sqlite_store.SqliteStore(db_path)
+            app_module.ledger = delivery_ledger.SqliteLedger(app_module.sqlite_db)
+        elif backend == 'supabase':
+            server = StubPostgRESTServer({'participants': [
+                {'id': p.phone, 'name': p.name, 'relationship': p.relationship, 'email': p.email} for p in people
+            ]}).start()
+            app_module.supabase = SupabaseClient(server.url, server.key)
+            app_module.draw_store = draw_jobs.SupabaseJobStore(app_module.supabase)
+            app_module.ledger = delivery_ledger.SupabaseLedger(app_module.supabase)
+        app_module.participant_store = ParticipantStore(app_module.load_data)
+        yield app_module
+    finally:
+        if server is not None:
+            app_module.supabase.close()
+            server.stop()
+        for name, value in saved.items():
+            setattr(app_module, name, value)
+
+def bench_storage(results, sizes, runs):
+    for count in sizes:
+        people = _population(count, 1)
+        for backend in ('csv', 'sqlite', 'supabase'):
+            with tempfile.TemporaryDirectory() as tmp, _app_backend(backend, people, tmp) as app_module:
+                times = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    loaded = app_module.load_data()
+                    times.append(time.perf_counter() - start)
+                assert len(loaded) == count
+                _emit(results, 'storage', 'load_data', {'backend': backend, 'participants': count, 'runs': runs}, {
+                    'median_s': statistics.median(times),
+                    'rows_per_s': count / statistics.median(times),
+                })
+
+@contextlib.contextmanager
+def _smtp_env():
+    from stubs.smtp_server import StubSMTPServer
+    server = StubSMTPServer().start()
+    env = dict(server.env(), EMAIL_RATE_LIMIT='0', ADMIN_SECRET_KEY='bench')
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield server
+    finally:
+        server.stop()
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def bench_flows(results, population, registrations):
+    with _smtp_env() as smtp:
+        for backend in ('csv', 'sqlite', 'supabase'):
+            # Registration: nobody has an email yet, so no auto-draw kicks in
+            people = _population(population, 1)
+            with tempfile.TemporaryDirectory() as tmp, _app_backend(backend, people, tmp) as app_module:
+                client = app_module.app.test_client()
+                times = []
+                with contextlib.redirect_stdout(sys.stderr):
+                    for p in people[:registrations]:
+                        start = time.perf_counter()
+                        body = client.post('/api/register_email', json={'phone': p.phone, 'email': f'{p.name}@test.com'}).get_json()
+                        times.append(time.perf_counter() - start)
+                        assert body['success'], body
+                times.sort()
+                _emit(results, 'flows', 'register_email', {'backend': backend, 'participants': population, 'requests': registrations}, {
+                    'median_ms': statistics.median(times) * 1000,
+                    'p95_ms': times[int(len(times) * 0.95) - 1] * 1000,
+                    'requests_per_s': len(times) / sum(times),
+                })
+
+            people = _population(population, 1, emails=True)
+            with tempfile.TemporaryDirectory() as tmp, _app_backend(backend, people, tmp) as app_module:
+                client = app_module.app.test_client()
+                sent_before = len(smtp.messages)
+                random.seed(SEED)
+                with contextlib.redirect_stdout(sys.stderr):
+                    start = time.perf_counter()
+                    response = client.post('/api/admin/draw', headers={'X-Admin-Key': 'bench'})
+                    elapsed = time.perf_counter() - start
+                body = response.get_json()
+                _emit(results, 'flows', 'admin_draw', {'backend': backend, 'participants': population}, {
+                    'success': bool(body['success']),
+                    'emails_sent': len(smtp.messages) - sent_before,
+                    'wall_s': elapsed,
+                })
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'commit': commit, 'time': time.time()}
+
+def _key(record):
+    return json.dumps([record['suite'], record['name'], record['params']], sort_keys=True)
+
+def compare(results, baseline, tolerance):
+    """
+    Timing metrics more than `tolerance` slower than the baseline, and any
+    success rate that dropped. Returns a list of human-readable lines.
+    """
+    previous = {_key(r): r['metrics'] for r in baseline['results']}
+    regressions = []
+    for record in results:
+        old = previous.get(_key(record))
+        if old is None:
+            continue
+        for metric, value in record['metrics'].items():
+            before = old.get(metric)
+            if before is None:
+                continue
+            slower = _is_timing(metric) and before > 0 and value > before * (1 + tolerance)
+            worse = metric in ('success_rate', 'success') and value < before
+            if slower or worse:
+                regressions.append(f"{record['suite']}/{record['name']} {record['params']}: {metric} {before:.4g} -> {value:.4g}")
+    return regressions
+
+def run(only=('matcher', 'groups', 'storage', 'flows'), quick=False):
+    results = []
+    if 'matcher' in only:
+        bench_matcher(results, (1000, 10000) if quick else (1000, 10000, 100000), (0, 1, 5), 3 if quick else 5)
+    if 'groups' in only:
+        # Few large groups, then thousands of small ones (same total)
+        shapes = ((4, 5000), (2500, 8)) if quick else ((4, 25000), (12500, 8))
+        bench_groups(results, shapes, 3)
+    if 'storage' in only:
+        bench_storage(results, (1000,) if quick else (10000, 100000), 3)
+    if 'flows' in only:
+        bench_flows(results, 100 if quick else 500, 20 if quick else 100)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a smoke run')
+    parser.add_argument('--only', default='matcher,groups,storage,flows')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run(tuple(args.only.split(',')), args.quick)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': _environment(), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
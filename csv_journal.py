@@ -0,0 +1,156 @@
+import csv
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+FIELDNAMES = ['ID', 'nombre', 'parentesco', 'email']
+
+# Fold the journal back into the CSV once it grows past this size (0 disables it)
+COMPACT_AT_BYTES = int(os.environ.get("CSV_JOURNAL_COMPACT_AT_BYTES", str(64 * 1024)))
+
+_thread_lock = threading.Lock()
+_known_ids = {}  # csv_path -> (mtime, set of IDs)
+
+def journal_path(csv_path):
+    return f"{csv_path}.journal"
+
+class FileLock:
+    """
+    Exclusive (or shared) fcntl lock on a <path>.lock sidecar, so it survives
+    the locked file being replaced (e.g. the CSV during compaction).
+    """
+
+    def __init__(self, path, shared=False):
+        self._path = f"{path}.lock"
+        self._shared = shared
+        self._file = None
+
+    def __enter__(self):
+        _thread_lock.acquire()
+        if fcntl:
+            self._file = open(self._path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_SH if self._shared else fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        _thread_lock.release()
+
+def _read_base(csv_path):
+    with open(csv_path, mode='r', encoding='utf-8') as f:
+        return list(csv.DictReader(f, delimiter=';'))
+
+def _read_journal(csv_path):
+    """
+    Returns {ID: email} with the latest change per participant.
+    """
+    changes = {}
+    path = journal_path(csv_path)
+    if not os.path.exists(path):
+        return changes
+    with open(path, mode='r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f, delimiter=';'):
+            if len(row) == 2:
+                changes[row[0]] = row[1]
+    return changes
+
+def _apply(rows, changes):
+    if changes:
+        for row in rows:
+            phone = str(row.get('ID', '')).strip()
+            if phone in changes:
+                row['email'] = changes[phone]
+    return rows
+
+def _ids(csv_path):
+    """
+    IDs present in the base CSV, cached until the file changes.
+    """
+    mtime = os.stat(csv_path).st_mtime_ns
+    cached = _known_ids.get(csv_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    ids = {str(row.get('ID', '')).strip() for row in _read_base(csv_path)}
+    _known_ids[csv_path] = (mtime, ids)
+    return ids
+
+def read_rows(csv_path):
+    """
+    Rows of the CSV (original headers as keys) with pending journal changes applied.
+    """
+    with FileLock(csv_path, shared=True):
+        return _apply(_read_base(csv_path), _read_journal(csv_path))
+
+def append_email(csv_path, phone, email):
+    """
+    Records an email change by appending one line to the journal.
+    Returns: (success, error_message) like app.save_email.
+    """
+    with FileLock(csv_path):
+        if phone not in _ids(csv_path):
+            return False, "Usuario no encontrado en CSV"
+
+        with open(journal_path(csv_path), mode='a', encoding='utf-8', newline='') as f:
+            csv.writer(f, delimiter=';').writerow([phone, email])
+            f.flush()
+            os.fsync(f.fileno())
+            journal_size = f.tell()
+
+        if COMPACT_AT_BYTES and journal_size > COMPACT_AT_BYTES:
+            _compact_locked(csv_path)
+    return True, ""
+
+def _compact_locked(csv_path, extra=None):
+    changes = _read_journal(csv_path)
+    if extra:
+        changes.update(extra)
+    if not changes:
+        return 0
+    rows = _apply(_read_base(csv_path), changes)
+    # Keep any extra columns (e.g. grupo) the file may have
+    fieldnames = list(rows[0]) if rows else FIELDNAMES
+
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, csv_path)
+    if os.path.exists(journal_path(csv_path)):
+        os.remove(journal_path(csv_path))
+    return len(changes)
+
+def apply_emails(csv_path, emails):
+    """
+    Bulk version of append_email: writes many {phone: email} changes with a
+    single CSV rewrite (pending journal lines folded in too).
+    Returns: the phones that are not in the CSV (left untouched).
+    """
+    with FileLock(csv_path):
+        ids = _ids(csv_path)
+        missing = [phone for phone in emails if phone not in ids]
+        found = {phone: email for phone, email in emails.items() if phone in ids}
+        if found:
+            _compact_locked(csv_path, found)
+    return missing
+
+def compact(csv_path):
+    """
+    Folds the journal back into the CSV. Returns the number of participants updated.
+    """
+    with FileLock(csv_path):
+        return _compact_locked(csv_path)
+
+if __name__ == "__main__":
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else 'bbdd-amigoinvisible.csv'
+    print(f"Compacted {compact(path)} changes into {path}")
@@ -0,0 +1,239 @@
+import csv
+import os
+import time
+import email_service
+from csv_journal import FileLock
+
+# Send attempts per giver before giving up, and the first backoff delay (doubles each round)
+MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.environ.get("EMAIL_RETRY_BASE_DELAY", "2"))
+
+FIELDS = ['draw_id', 'drawn_at', 'position', 'giver_phone', 'giver_name', 'giver_email', 'receiver_name', 'status', 'attempts']
+
+def _entries(draw_id, assignments):
+    drawn_at = time.time()
+    return [{
+        'draw_id': draw_id,
+        'drawn_at': drawn_at,
+        'position': position,
+        'giver_phone': giver.get('phone', ''),
+        'giver_name': giver['name'],
+        'giver_email': giver['email'],
+        'receiver_name': receiver['name'],
+        'status': 'pending',
+        'attempts': 0
+    } for position, (giver, receiver) in enumerate(assignments)]
+
+def _history_window(years, now=None):
+    """
+    (start, end) epoch seconds of the `years` calendar years before the
+    current one. The current year is left out: a draw run again this year
+    replaces the earlier one instead of being constrained by it.
+    """
+    year = time.localtime(now).tm_year
+    start = time.mktime((year - years, 1, 1, 0, 0, 0, 0, 0, -1))
+    end = time.mktime((year, 1, 1, 0, 0, 0, 0, 0, -1))
+    return start, end
+
+def _latest_per_year(draws):
+    """
+    Ids of the latest of `draws` ((draw_id, drawn_at) pairs) in each calendar year.
+    """
+    latest = {}
+    for draw_id, drawn_at in draws:
+        year = time.localtime(drawn_at).tm_year
+        if year not in latest or drawn_at > latest[year][1]:
+            latest[year] = (draw_id, drawn_at)
+    return [draw_id for draw_id, _ in sorted(latest.values(), key=lambda d: d[1], reverse=True)]
+
+class FileLedger:
+    """
+    Append-only CSV of delivery entries next to the participant CSV. Status
+    changes are appended as new lines; the last line per position wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _append(self, entries):
+        with FileLock(self.path):
+            is_new = not os.path.exists(self.path)
+            with open(self.path, mode='a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS, delimiter=';')
+                if is_new:
+                    writer.writeheader()
+                writer.writerows(entries)
+
+    def record(self, draw_id, assignments):
+        entries = _entries(draw_id, assignments)
+        self._append(entries)
+        return entries
+
+    def update(self, entries):
+        self._append(entries)
+
+    def load(self, draw_id):
+        if not os.path.exists(self.path):
+            return []
+        latest = {}
+        with FileLock(self.path, shared=True):
+            with open(self.path, mode='r', encoding='utf-8') as f:
+                for row in csv.DictReader(f, delimiter=';'):
+                    if row['draw_id'] == draw_id:
+                        row['position'] = int(row['position'])
+                        row['attempts'] = int(row['attempts'] or 0)
+                        latest[row['position']] = row
+        return [latest[position] for position in sorted(latest)]
+
+    def recent_pairs(self, years, now=None):
+        """
+        (giver_name, receiver_name) pairs of the last completed draw (at least
+        one email sent) of each of the `years` calendar years before this one.
+        """
+        if years <= 0 or not os.path.exists(self.path):
+            return []
+        start, end = _history_window(years, now)
+        rows_by_draw = {}
+        with FileLock(self.path, shared=True):
+            with open(self.path, mode='r', encoding='utf-8') as f:
+                for row in csv.DictReader(f, delimiter=';'):
+                    if start <= float(row['drawn_at']) < end:
+                        # Status changes are appended: the last line per position wins
+                        rows_by_draw.setdefault(row['draw_id'], {})[int(row['position'])] = row
+        completed = [
+            (draw_id, float(next(iter(rows.values()))['drawn_at']))
+            for draw_id, rows in rows_by_draw.items()
+            if any(row['status'] == 'sent' for row in rows.values())
+        ]
+        return [
+            (row['giver_name'], row['receiver_name'])
+            for draw_id in _latest_per_year(completed)
+            for _, row in sorted(rows_by_draw[draw_id].items())
+        ]
+
+class SupabaseLedger:
+    """
+    Delivery entries in a `deliveries` table keyed by (draw_id, position),
+    written with upserts.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def _upsert(self, entries):
+        self._client.upsert('deliveries', entries, on_conflict='draw_id,position')
+
+    def record(self, draw_id, assignments):
+        entries = _entries(draw_id, assignments)
+        self._upsert(entries)
+        return entries
+
+    def update(self, entries):
+        self._upsert(entries)
+
+    def load(self, draw_id):
+        return list(self._client.select('deliveries', filters=f"draw_id=eq.{draw_id}&order=position"))
+
+    def recent_pairs(self, years, now=None):
+        """
+        (giver_name, receiver_name) pairs of the last completed draw (at least
+        one email sent) of each of the `years` calendar years before this one.
+        """
+        if years <= 0:
+            return []
+        start, end = _history_window(years, now)
+        completed = {}
+        rows = self._client.select('deliveries', columns='draw_id,drawn_at',
+                                   filters=f"status=eq.sent&drawn_at=gte.{start}&drawn_at=lt.{end}", order='draw_id,position')
+        for row in rows:
+            completed[row['draw_id']] = row['drawn_at']
+        pairs = []
+        for draw_id in _latest_per_year(completed.items()):
+            rows = self._client.select('deliveries', columns='giver_name,receiver_name', filters=f"draw_id=eq.{draw_id}", order='position')
+            pairs.extend((r['giver_name'], r['receiver_name']) for r in rows)
+        return pairs
+
+class SqliteLedger:
+    """
+    Delivery entries in the `deliveries` table of a sqlite_store.SqliteStore.
+    Every record/update is one transaction, so a draw's history is all-or-nothing.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def _upsert(self, entries):
+        columns = ', '.join(FIELDS)
+        placeholders = ', '.join('?' for _ in FIELDS)
+        with self._store.connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO deliveries ({columns}) VALUES ({placeholders})",
+                [tuple(e[field] for field in FIELDS) for e in entries]
+            )
+
+    def record(self, draw_id, assignments):
+        entries = _entries(draw_id, assignments)
+        self._upsert(entries)
+        return entries
+
+    def update(self, entries):
+        self._upsert(entries)
+
+    def load(self, draw_id):
+        rows = self._store.connection().execute(
+            "SELECT * FROM deliveries WHERE draw_id = ? ORDER BY position", (draw_id,)
+        )
+        return [dict(row) for row in rows]
+
+    def recent_pairs(self, years, now=None):
+        """
+        (giver_name, receiver_name) pairs of the last completed draw (at least
+        one email sent) of each of the `years` calendar years before this one.
+        """
+        if years <= 0:
+            return []
+        conn = self._store.connection()
+        completed = conn.execute(
+            "SELECT draw_id, MAX(drawn_at) FROM deliveries WHERE status = 'sent' AND drawn_at >= ? AND drawn_at < ? GROUP BY draw_id",
+            _history_window(years, now)
+        ).fetchall()
+        pairs = []
+        for draw_id in _latest_per_year(tuple(row) for row in completed):
+            rows = conn.execute("SELECT giver_name, receiver_name FROM deliveries WHERE draw_id = ? ORDER BY position", (draw_id,))
+            pairs.extend(tuple(row) for row in rows)
+        return pairs
+
+def deliver(ledger, entries, on_result=None, max_attempts=None, base_delay=None):
+    """
+    Sends every entry that is not yet 'sent', retrying failures up to
+    `max_attempts` rounds with exponential backoff, and records each outcome
+    in the ledger. Calling it again later resumes with whatever is left.
+    Returns: the entries with their final status.
+    """
+    max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+    base_delay = RETRY_BASE_DELAY if base_delay is None else base_delay
+
+    for round_number in range(max_attempts):
+        pending = [e for e in entries if e['status'] != 'sent']
+        if not pending:
+            break
+        if round_number:
+            time.sleep(base_delay * 2 ** (round_number - 1))
+
+        assignments = [({'name': e['giver_name'], 'email': e['giver_email']}, {'name': e['receiver_name']}) for e in pending]
+        results = email_service.send_assignment_emails(assignments, on_result=on_result)
+        for entry, result in zip(pending, results):
+            entry['attempts'] += 1
+            entry['status'] = 'sent' if result['success'] else 'failed'
+        ledger.update(pending)
+        if any(r.get('error') == 'login' for r in results):
+            # Bad credentials won't fix themselves between rounds
+            break
+
+    return entries
+
+def as_results(entries):
+    """
+    Per-giver results in the shape /api/admin/draw returns.
+    """
+    return [{'giver': e['giver_name'], 'success': e['status'] == 'sent'} for e in entries]
@@ -0,0 +1,288 @@
+import json
+import os
+import threading
+import time
+import uuid
+import matcher
+import metrics
+import delivery_ledger
+from csv_journal import FileLock
+from supabase_client import SupabaseError
+
+# A queued/running job that hasn't reported progress for this long is
+# considered dead (e.g. its worker was killed) and can be replaced.
+STALE_AFTER = int(os.environ.get("DRAW_JOB_STALE_SECONDS", "900"))
+
+# Avoid repeating who gave to whom in the last N calendar years (0 = off),
+# using each year's last draw that sent any email (see recent_pairs)
+HISTORY_YEARS = int(os.environ.get("DRAW_HISTORY_YEARS", "0"))
+
+# Matcher mode used when the caller doesn't ask for one (see matcher.MODES)
+DEFAULT_MODE = os.environ.get("DRAW_MODE", "default")
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Fields persisted in the job store; anything else on the job dict is transient
+FIELDS = ('id', 'status', 'trigger', 'created_at', 'updated_at', 'total', 'sent', 'failed', 'message')
+
+def _new_job(trigger):
+    now = time.time()
+    return {
+        'id': uuid.uuid4().hex,
+        'status': 'queued',
+        'trigger': trigger,
+        'created_at': now,
+        'updated_at': now,
+        'total': 0,
+        'sent': 0,
+        'failed': 0,
+        'message': ''
+    }
+
+def _is_active(job):
+    return bool(job) and job['status'] in ACTIVE_STATUSES and time.time() - job['updated_at'] < STALE_AFTER
+
+def _persisted(job):
+    return {k: job.get(k) for k in FIELDS}
+
+class FileJobStore:
+    """
+    Draw job state as a JSON file next to the CSV, guarded by an fcntl lock so
+    several worker processes agree on which draw is running.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, mode='r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, job):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode='w', encoding='utf-8') as f:
+            json.dump(_persisted(job), f)
+        os.replace(tmp_path, self.path)
+
+    def get(self):
+        with FileLock(self.path, shared=True):
+            return self._read()
+
+    def try_start(self, trigger, skip_if_done=False):
+        """
+        Atomically records a new queued job, unless one is already active
+        (or, with skip_if_done, a draw already completed).
+        Returns: the new job dict or None.
+        """
+        with FileLock(self.path):
+            current = self._read()
+            if _is_active(current) or (skip_if_done and current and current['status'] == 'done'):
+                return None
+            job = _new_job(trigger)
+            self._write(job)
+            return job
+
+    def try_resume(self, job_id):
+        """
+        Moves a finished job back to queued to re-send its pending emails.
+        Returns: the job dict or None if it isn't the current, idle job.
+        """
+        with FileLock(self.path):
+            current = self._read()
+            if not current or current['id'] != job_id or _is_active(current):
+                return None
+            current.update(status='queued', updated_at=time.time())
+            self._write(current)
+            return current
+
+    def update(self, job, **fields):
+        job.update(fields, updated_at=time.time())
+        with FileLock(self.path):
+            current = self._read()
+            # Never overwrite a job that replaced this one
+            if current and current['id'] != job['id']:
+                return
+            self._write(job)
+
+class SupabaseJobStore:
+    """
+    Draw job state in a single-row `draw_jobs` table (slot = 'current') with
+    the job fields as columns (id renamed to job_id). Conditional PATCHes act
+    as compare-and-set, so only one process can move the slot to a new job.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @staticmethod
+    def _to_row(job):
+        row = _persisted(job)
+        row['job_id'] = row.pop('id')
+        return row
+
+    @staticmethod
+    def _from_row(row):
+        job = {k: row.get(k) for k in FIELDS if k != 'id'}
+        job['id'] = row.get('job_id')
+        return job
+
+    def get(self):
+        rows = list(self._client.select('draw_jobs', filters="slot=eq.current", order='slot'))
+        return self._from_row(rows[0]) if rows else None
+
+    def try_start(self, trigger, skip_if_done=False):
+        job = _new_job(trigger)
+        row = self._to_row(job)
+        cutoff = time.time() - STALE_AFTER
+        finished = "failed" if skip_if_done else "done,failed"
+        stale = f"and(status.in.(queued,running),updated_at.lt.{cutoff})"
+        query = f"slot=eq.current&or=(status.in.({finished}),{stale})"
+        if self._client.update('draw_jobs', query, row):
+            return job
+
+        # First draw ever: create the slot; a concurrent insert makes this fail
+        try:
+            row['slot'] = 'current'
+            if self._client.insert('draw_jobs', row):
+                return job
+        except SupabaseError as e:
+            if e.code != 409:
+                raise
+        return None
+
+    def try_resume(self, job_id):
+        cutoff = time.time() - STALE_AFTER
+        query = f"slot=eq.current&job_id=eq.{job_id}&or=(status.in.(done,failed),updated_at.lt.{cutoff})"
+        rows = self._client.update('draw_jobs', query, {'status': 'queued', 'updated_at': time.time()})
+        return self._from_row(rows[0]) if rows else None
+
+    def update(self, job, **fields):
+        job.update(fields, updated_at=time.time())
+        self._client.update('draw_jobs', f"slot=eq.current&job_id=eq.{job['id']}", self._to_row(job))
+
+def _deliver(store, job, ledger, entries, note=""):
+    store.update(job, total=len(entries), sent=sum(1 for e in entries if e['status'] == 'sent'), failed=0)
+    progress_lock = threading.Lock()
+    last_saved = [time.monotonic()]
+
+    def on_result(result):
+        if not result['success']:
+            return
+        with progress_lock:
+            job['sent'] += 1
+            # Persist progress at most once a second
+            if time.monotonic() - last_saved[0] >= 1:
+                last_saved[0] = time.monotonic()
+                store.update(job)
+
+    delivery_ledger.deliver(ledger, entries, on_result=on_result)
+    job['results'] = delivery_ledger.as_results(entries)
+    failed = sum(1 for r in job['results'] if not r['success'])
+    store.update(job, status='done', failed=failed, message=f"Sorteo completado. Se enviaron {len(job['results'])} correos.{note}")
+
+def run_draw_job(store, job, load_participants, ledger, by_group=None, mode=None):
+    """
+    Executes the draw for `job`, recording its progress in `store`.
+    On return job['status'] is 'done' or 'failed'. Transient keys: 'results'
+    (per-giver send results), 'conflict' (over-constrained names), 'groups'
+    (per-group report of a multi-group draw) and, on failure,
+    'reason': not_enough | conflict | unmatched | error.
+    `by_group` draws each participant group separately; by default that
+    happens whenever any participant has a group. `mode` is the matcher mode
+    (DRAW_MODE by default).
+    Assignments are recorded in `ledger` before any email goes out.
+    """
+    try:
+        store.update(job, status='running')
+
+        participants = [p for p in load_participants() if p.get('email')]
+        if len(participants) < 2:
+            job['reason'] = 'not_enough'
+            store.update(job, status='failed', message='No hay suficientes participantes con email registrado')
+            return job
+
+        history = ledger.recent_pairs(HISTORY_YEARS)
+        mode = mode or DEFAULT_MODE
+        if by_group is None:
+            by_group = any(matcher.group_key(p) for p in participants)
+
+        note = ""
+        if by_group:
+            with metrics.MATCHER_SECONDS.time(mode=mode, grouped='true'):
+                assignments, job['groups'] = matcher.draw_groups(participants, history, mode=mode)
+            failed_groups = [key for key, group in job['groups'].items() if not group['success']]
+            metrics.MATCHER_FAILURES.inc(len(failed_groups), mode=mode)
+            if failed_groups:
+                job['conflict'] = [name for key in failed_groups for name in job['groups'][key]['conflict']]
+                note = f" Grupos sin sorteo posible: {', '.join(key or '(sin grupo)' for key in failed_groups)}"
+            if not assignments and not job.get('conflict'):
+                job['reason'] = 'unmatched'
+                store.update(job, status='failed', message='No se pudo generar un sorteo válido con las restricciones actuales')
+                return job
+            if not assignments:
+                job['reason'] = 'conflict'
+                store.update(job, status='failed', message=f"Sorteo imposible en todos los grupos: {', '.join(job['conflict'])}")
+                return job
+        else:
+            stats = {}
+            with metrics.MATCHER_SECONDS.time(mode=mode, grouped='false'):
+                assignments, conflict = matcher.draw(participants, history, mode=mode, stats=stats)
+            metrics.MATCHER_SWAP_TRIES.inc(stats.get('swap_tries', 0), mode=mode)
+            metrics.MATCHER_AUGMENTING_PATHS.inc(stats.get('augmenting_paths', 0), mode=mode)
+            if conflict:
+                job['reason'] = 'conflict'
+                job['conflict'] = [p['name'] for p in conflict]
+                store.update(job, status='failed', message=f"Sorteo imposible: {', '.join(job['conflict'])} no tienen a quién regalar con las restricciones actuales")
+                return job
+            if not assignments:
+                metrics.MATCHER_FAILURES.inc(mode=mode)
+                job['reason'] = 'unmatched'
+                store.update(job, status='failed', message='No se pudo generar un sorteo válido con las restricciones actuales')
+                return job
+
+        # Persist who gives to whom before sending anything, so a partial
+        # outage can be resumed without reshuffling
+        entries = ledger.record(job['id'], assignments)
+        _deliver(store, job, ledger, entries, note)
+    except Exception as e:
+        print(f"CRITICAL ERROR during draw job {job['id']}: {e}")
+        job['reason'] = 'error'
+        try:
+            store.update(job, status='failed', message=f'Error interno: {str(e)}')
+        except Exception as store_error:
+            print(f"Error saving draw job state: {store_error}")
+    return job
+
+def resume_draw_job(store, job, ledger):
+    """
+    Re-sends only the undelivered emails of `job`, keeping its assignments.
+    """
+    try:
+        store.update(job, status='running')
+        entries = ledger.load(job['id'])
+        if not entries:
+            job['reason'] = 'not_found'
+            store.update(job, status='failed', message='No hay envíos registrados para este sorteo')
+            return job
+        _deliver(store, job, ledger, entries)
+    except Exception as e:
+        print(f"CRITICAL ERROR resuming draw job {job['id']}: {e}")
+        job['reason'] = 'error'
+        try:
+            store.update(job, status='failed', message=f'Error interno: {str(e)}')
+        except Exception as store_error:
+            print(f"Error saving draw job state: {store_error}")
+    return job
+
+def start_background_draw(store, load_participants, ledger, trigger):
+    """
+    Queues a draw and runs it in a background thread, unless a draw is
+    already running or has completed. Returns the job or None.
+    """
+    job = store.try_start(trigger, skip_if_done=True)
+    if job:
+        threading.Thread(target=run_draw_job, args=(store, job, load_participants, ledger), daemon=False).start()
+    return job
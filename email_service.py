@@ -1,82 +1,231 @@
 import smtplib
 import ssl
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import email_templates
+import metrics
 
-def send_assignment_email(to_email, giver_name, receiver_name):
+def _smtp_settings():
+    # Default to Gmail, user can change if needed
+    host = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+    port = int(os.environ.get("SMTP_PORT", "465"))
+    use_ssl = os.environ.get("SMTP_USE_SSL", "true").lower() not in ("0", "false", "no")
+    # Without SSL, upgrade with STARTTLS before logging in; only a local
+    # relay or test server should ever turn this off
+    starttls = os.environ.get("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no")
+    return host, port, use_ssl, starttls
+
+def _open_connection():
+    host, port, use_ssl, starttls = _smtp_settings()
+    if use_ssl:
+        context = ssl.create_default_context()
+        return smtplib.SMTP_SSL(host, port, context=context, timeout=30)
+    server = smtplib.SMTP(host, port, timeout=30)
+    if starttls:
+        try:
+            server.ehlo()
+            if not server.has_extn('starttls'):
+                # Never send the password in cleartext
+                raise smtplib.SMTPNotSupportedError(f"{host} does not offer STARTTLS; use SMTP_USE_SSL=true")
+            server.starttls(context=ssl.create_default_context())
+        except Exception:
+            server.close()
+            raise
+    return server
+
+def assignment_template():
     """
-    Sends the Secret Santa assignment email.
+    The assignment email with this event's year, budget and rules filled in;
+    only the names are left to substitute per recipient.
     """
-    smtp_server = "smtp.gmail.com" # Default to Gmail, user can change if needed
-    smtp_port = 465
-    
-    sender_email = os.environ.get("EMAIL_USER")
-    password = os.environ.get("EMAIL_PASSWORD")
+    return email_templates.load('assignment').bind(**email_templates.event_params())
 
-    if not sender_email or not password:
-        print("Error: Email credentials missing in .env")
-        return False
+def build_assignment_message(sender_email, to_email, giver_name, receiver_name, template=None):
+    """
+    Builds the Secret Santa assignment email (HTML with a plain-text
+    alternative), ready to send. Pass `template` to reuse a bound one.
+    """
+    template = template or assignment_template()
+    return template.render(sender_email, to_email, giver_name=giver_name, receiver_name=receiver_name)
 
-    subject = "🎅 Tu Amigo Invisible 2026 es..."
-    
-    # HTML Body
-    html = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #eee; border-radius: 10px;">
-            <h1 style="color: #d42426; text-align: center;">🎁 Amigo Invisible 2026 🎁</h1>
-            <p><strong>¡Hola {giver_name}!</strong></p>
-            <p>Ya se ha realizado el sorteo. Este año te ha tocado regalar a:</p>
-            
-            <div style="background-color: #f9f9f9; padding: 15px; text-align: center; margin: 20px 0; border-radius: 5px;">
-                <h2 style="color: #0c0; margin: 0; font-size: 24px;">✨ {receiver_name} ✨</h2>
-            </div>
-
-            <div style="background-color: #fff5f5; border: 1px solid #d42426; padding: 15px; margin: 20px 0; border-radius: 8px;">
-                <h3 style="color: #d42426; margin-top: 0; font-size: 16px; text-align: center;">📜 NORMAS DE PARTICIPACIÓN</h3>
-                <ul style="font-size: 14px; color: #555; padding-left: 20px; line-height: 1.5;">
-                    <li>💰 El importe máximo es de <strong>30 €</strong></li>
-                    <li>🎫 Hay que incluir <strong>ticket regalo</strong></li>
-                    <li>💭 Si se piensa en el regalado es más fácil acertar :)</li>
-                </ul>
-            </div>
-            
-            <p style="text-align: center; font-size: 12px; color: #777;">
-                (Shhh... es un secreto. No se lo digas a nadie)
-            </p>
-            <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
-            <p style="text-align: center; font-size: 10px; color: #999;">
-                Este mensaje ha sido enviado automáticamente por el sistema de Amigo Invisible de la Familia.
-            </p>
-        </div>
-      </body>
-    </html>
+class BatchMailer:
+    """
+    Reuses one authenticated SMTP connection for many messages instead of a
+    TLS handshake and login per recipient. Reconnects if the server drops the
+    session and throttles to `rate` messages per second (0 = no limit).
+    A rejected login or missing STARTTLS is not retried: it is kept in
+    `login_error` and every later send fails straight away.
     """
 
-    message = MIMEMultipart("alternative")
-    message["Subject"] = subject
-    message["From"] = sender_email
-    message["To"] = to_email
-    message.attach(MIMEText(html, "html"))
+    def __init__(self, rate=None, max_retries=2):
+        self.sender_email = os.environ.get("EMAIL_USER")
+        self.password = os.environ.get("EMAIL_PASSWORD")
+        if rate is None:
+            rate = float(os.environ.get("EMAIL_RATE_LIMIT", "0"))
+        self.rate = rate
+        self.max_retries = max_retries
+        self._server = None
+        self._next_send = 0.0
+        self.login_error = None
+        # Assignment template bound to the event on first use
+        self._template = None
 
-    try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-            server.login(sender_email, password)
-            server.sendmail(sender_email, to_email, message.as_string())
-        print(f"Email sent to {to_email}")
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        with metrics.SMTP_CONNECT_SECONDS.time():
+            server = _open_connection()
+            try:
+                server.login(self.sender_email, self.password)
+            except Exception:
+                server.close()
+                raise
+        self._server = server
+
+    def _drop(self):
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+            self._server = None
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._drop()
+
+    def _throttle(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next_send > now:
+            time.sleep(self._next_send - now)
+            now = self._next_send
+        self._next_send = now + 1.0 / self.rate
+
+    def send(self, to_email, message):
+        start = time.perf_counter()
+        sent = self._send(to_email, message)
+        metrics.SMTP_SEND_SECONDS.observe(time.perf_counter() - start, result='sent' if sent else 'failed')
+        return sent
+
+    def _has_credentials(self):
+        if not self.sender_email or not self.password:
+            print("Error: Email credentials missing in .env")
+            return False
         return True
-    except Exception as e:
-        print(f"Error sending email to {to_email}: {e}")
+
+    def _send(self, to_email, message):
+        if not self._has_credentials():
+            return False
+        if self.login_error:
+            return False
+
+        self._throttle()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._server is None:
+                    self._connect()
+                self._server.sendmail(self.sender_email, to_email, message if isinstance(message, str) else message.as_string())
+                print(f"Email sent to {to_email}")
+                return True
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Rejected message, the session itself is still usable
+                print(f"Error sending email to {to_email}: {e}")
+                return False
+            except (smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError) as e:
+                # Retrying can't fix bad credentials or a server without TLS
+                print(f"Error: SMTP login failed, not sending any more emails: {e}")
+                self._drop()
+                self.login_error = e
+                return False
+            except Exception as e:
+                # Connection-level failure: reconnect and retry
+                print(f"Error sending email to {to_email} (attempt {attempt + 1}): {e}")
+                self._drop()
         return False
 
+    def send_assignment(self, to_email, giver_name, receiver_name):
+        # Rendering needs the sender address, so check before building the message
+        if not self._has_credentials():
+            return False
+        if self._template is None:
+            self._template = assignment_template()
+        message = build_assignment_message(self.sender_email, to_email, giver_name, receiver_name, self._template)
+        return self.send(to_email, message)
+
+def send_assignment_email(to_email, giver_name, receiver_name):
+    """
+    Sends the Secret Santa assignment email.
+    """
+    with BatchMailer(rate=0) as mailer:
+        return mailer.send_assignment(to_email, giver_name, receiver_name)
+
+def send_assignment_emails(assignments, rate=None, workers=None, on_result=None):
+    """
+    Sends every assignment using up to `workers` parallel SMTP sessions
+    (EMAIL_WORKERS, default 4), each one reused for many messages. `rate` is
+    the overall messages-per-second limit, split evenly between sessions.
+    `on_result(result)` is called (from the worker threads) after each send.
+    The first rejected login stops every session; the givers left unsent get
+    'error': 'login' in their result.
+    Returns: List of {'giver': name, 'success': bool} in assignment order.
+    """
+    if rate is None:
+        rate = float(os.environ.get("EMAIL_RATE_LIMIT", "0"))
+    if workers is None:
+        workers = int(os.environ.get("EMAIL_WORKERS", "4"))
+    workers = max(1, min(workers, len(assignments)))
+
+    results = [None] * len(assignments)
+    pending = iter(range(len(assignments)))
+    pending_lock = threading.Lock()
+    login_failed = threading.Event()
+
+    def deliver():
+        # Each worker pulls the next giver, so slow sends don't stall a fixed shard
+        with BatchMailer(rate=rate / workers) as mailer:
+            while True:
+                with pending_lock:
+                    idx = next(pending, None)
+                if idx is None:
+                    return
+                giver, receiver = assignments[idx]
+                if login_failed.is_set():
+                    results[idx] = {'giver': giver['name'], 'success': False, 'error': 'login'}
+                    continue
+                success = mailer.send_assignment(giver['email'], giver['name'], receiver['name'])
+                results[idx] = {'giver': giver['name'], 'success': success}
+                if mailer.login_error:
+                    login_failed.set()
+                    results[idx]['error'] = 'login'
+                if on_result:
+                    on_result(results[idx])
+
+    if workers == 1:
+        deliver()
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(deliver) for _ in range(workers)]:
+            future.result()
+    return results
+
 def send_admin_notification(admin_email):
     """
     Sends a notification to Ricardo when all participants have registered.
     """
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 465
+    smtp_server, smtp_port, _, _ = _smtp_settings()
     
     sender_email = os.environ.get("EMAIL_USER")
     password = os.environ.get("EMAIL_PASSWORD")
@@ -84,55 +233,18 @@ def send_admin_notification(admin_email):
     if not sender_email or not password:
         return False
 
-    subject = "✨ ¡La Magia está lista! Registro completado"
-    
-    html = f"""
-    <html>
-      <body style="font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; color: #333; background-color: #f4f4f4; padding: 20px;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 30px; border-radius: 15px; border: 2px solid #d42426; box-shadow: 0 4px 10px rgba(0,0,0,0.1);">
-            <div style="text-align: center; margin-bottom: 20px;">
-                <span style="font-size: 50px;">🎅</span>
-            </div>
-            <h1 style="color: #d42426; text-align: center; margin-top: 0;">¡Hola Ricardo!</h1>
-            <p style="font-size: 16px; line-height: 1.6; text-align: center;">
-                Ya se han registrado todos los familiares en la aplicación del amigo invisible. ✨
-            </p>
-            <p style="font-size: 16px; line-height: 1.6; text-align: center; font-weight: bold; color: #0c0;">
-                ¡Ya puedes activar el sorteo y enviaremos los mails a todos los participantes!
-            </p>
-            
-            <div style="background-color: #fff5f5; border: 1px dashed #d42426; padding: 15px; text-align: center; margin: 25px 0; border-radius: 10px;">
-                <p style="margin: 0; font-size: 14px; color: #555;">Recuerda usar tu ADMIN_SECRET_KEY para disparar el sorteo:</p>
-                <code style="display: block; margin-top: 10px; font-size: 18px; color: #d42426; font-weight: bold;">/api/admin/draw?key=...</code>
-            </div>
-
-            <p style="text-align: center; font-size: 18px; color: #333; margin-top: 30px;">
-                ¡Saludos y felices Reyes! 👑👑👑
-            </p>
-            
-            <hr style="border: 0; border-top: 1px solid #eee; margin: 30px 0;">
-            <p style="text-align: center; font-size: 10px; color: #999;">
-                Enviado con magia desde tu servidor de Amigo Invisible 2026.
-            </p>
-        </div>
-      </body>
-    </html>
-    """
-
-    message = MIMEMultipart("alternative")
-    message["Subject"] = subject
-    message["From"] = sender_email
-    message["To"] = admin_email
-    message.attach(MIMEText(html, "html"))
+    template = email_templates.load('admin_notification')
+    message = template.bind(**email_templates.event_params()).render(
+        sender_email, admin_email, admin_name=os.environ.get("ADMIN_NAME", "Ricardo")
+    )
 
     try:
         print(f"DEBUG SMTP: Connecting to {smtp_server}:{smtp_port}...")
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
+        with _open_connection() as server:
             print(f"DEBUG SMTP: Logging in as {sender_email}...")
             server.login(sender_email, password)
             print(f"DEBUG SMTP: Sending mail to {admin_email}...")
-            server.sendmail(sender_email, admin_email, message.as_string())
+            server.sendmail(sender_email, admin_email, message)
         print("DEBUG SMTP: Success.")
         return True
     except Exception as e:
@@ -0,0 +1,150 @@
+import base64
+import datetime
+import html
+import os
+import random
+import re
+from email.header import Header
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+SUBJECTS = {
+    'assignment': "🎅 Tu Amigo Invisible {{ year }} es...",
+    'admin_notification': "✨ ¡La Magia está lista! Registro completado",
+}
+
+_PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# One multipart boundary per process; bodies are base64, so it can't clash
+_BOUNDARY = f"==============={random.randrange(10 ** 15):015d}=="
+
+def event_params():
+    """
+    Per-event values shared by every email: year, budget and rules
+    (EVENT_YEAR, GIFT_BUDGET, GIFT_RULES separated by '|').
+    """
+    rules = os.environ.get("GIFT_RULES", "🎫 Hay que incluir ticket regalo|💭 Si se piensa en el regalado es más fácil acertar :)")
+    return {
+        'year': os.environ.get("EVENT_YEAR") or str(datetime.date.today().year),
+        'budget': os.environ.get("GIFT_BUDGET", "30 €"),
+        'rules': [rule.strip() for rule in rules.split('|') if rule.strip()],
+    }
+
+class Template:
+    """
+    A template with {{ name }} placeholders, split into literal and variable
+    parts once. Rendering only fills the variable slots; values are
+    HTML-escaped when `escape_html` is set. A list value becomes <li> items
+    (HTML) or '- ' lines (text).
+    """
+
+    def __init__(self, source, escape_html=False):
+        self._init(_PLACEHOLDER.split(source), escape_html)
+
+    def _init(self, parts, escape_html):
+        # Literals at even indices, placeholder names at odd ones
+        self._parts = parts
+        self._slots = [(i, parts[i]) for i in range(1, len(parts), 2)]
+        self.escape_html = escape_html
+
+    @property
+    def names(self):
+        return {name for _, name in self._slots}
+
+    def _convert(self, value):
+        if isinstance(value, (list, tuple)):
+            if self.escape_html:
+                return "\n".join(f"<li>{html.escape(str(item))}</li>" for item in value)
+            return "\n".join(f"- {item}" for item in value)
+        value = str(value)
+        return html.escape(value) if self.escape_html else value
+
+    def partial(self, **values):
+        """
+        A new template with the given placeholders filled in and merged into
+        the literal text around them.
+        """
+        parts = [self._parts[0]]
+        for i in range(1, len(self._parts), 2):
+            name, literal = self._parts[i], self._parts[i + 1]
+            if name in values:
+                parts[-1] += self._convert(values[name]) + literal
+            else:
+                parts += [name, literal]
+        template = Template.__new__(Template)
+        template._init(parts, self.escape_html)
+        return template
+
+    def render(self, **values):
+        if not self._slots:
+            return self._parts[0]
+        parts = self._parts[:]
+        convert = self._convert
+        for i, name in self._slots:
+            parts[i] = convert(values[name])
+        return "".join(parts)
+
+def _header(value):
+    value = value.replace('\r', ' ').replace('\n', ' ')
+    return value if value.isascii() else Header(value, 'utf-8').encode()
+
+def _body(text):
+    return base64.encodebytes(text.encode('utf-8')).decode('ascii')
+
+class EmailTemplate:
+    """
+    Subject, plain-text and HTML parts of one email. render() writes the
+    multipart/alternative message directly, skipping the MIMEMultipart tree
+    and its generator, and reuses the encoded subject once it is fixed.
+    """
+
+    def __init__(self, subject, text, html_source):
+        self.subject = subject if isinstance(subject, Template) else Template(subject)
+        self.text = text if isinstance(text, Template) else Template(text)
+        self.html = html_source if isinstance(html_source, Template) else Template(html_source, escape_html=True)
+        self._subject_header = None if self.subject.names else _header(self.subject.render())
+
+    def bind(self, **values):
+        """
+        Fills the per-event placeholders, leaving the per-recipient ones.
+        """
+        return EmailTemplate(self.subject.partial(**values), self.text.partial(**values), self.html.partial(**values))
+
+    def render(self, sender, to, **values):
+        """
+        The complete message (RFC 5322 text) for one recipient.
+        """
+        subject = self._subject_header or _header(self.subject.render(**values))
+        return (
+            f'Content-Type: multipart/alternative; boundary="{_BOUNDARY}"\n'
+            f"MIME-Version: 1.0\n"
+            f"Subject: {subject}\n"
+            f"From: {_header(sender)}\n"
+            f"To: {_header(to)}\n"
+            f"\n"
+            f"--{_BOUNDARY}\n"
+            f'Content-Type: text/plain; charset="utf-8"\n'
+            f"MIME-Version: 1.0\n"
+            f"Content-Transfer-Encoding: base64\n"
+            f"\n"
+            f"{_body(self.text.render(**values))}"
+            f"--{_BOUNDARY}\n"
+            f'Content-Type: text/html; charset="utf-8"\n'
+            f"MIME-Version: 1.0\n"
+            f"Content-Transfer-Encoding: base64\n"
+            f"\n"
+            f"{_body(self.html.render(**values))}"
+            f"--{_BOUNDARY}--\n"
+        )
+
+@lru_cache(maxsize=None)
+def load(name):
+    """
+    The `name` email (templates/email/<name>.txt and .html), parsed once per process.
+    """
+    with open(os.path.join(TEMPLATE_DIR, f"{name}.txt"), encoding='utf-8') as f:
+        text = f.read()
+    with open(os.path.join(TEMPLATE_DIR, f"{name}.html"), encoding='utf-8') as f:
+        html_source = f.read()
+    return EmailTemplate(SUBJECTS[name], text, html_source)
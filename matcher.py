@@ -1,5 +1,34 @@
+import math
+import os
 import random
-import copy
+import re
+from array import array
+from bisect import bisect_left
+
+# Draw modes: 'default' builds a valid assignment directly; 'uniform' then
+# mixes it so every valid assignment is equally likely; 'single_cycle' makes
+# the gifting one chain that goes through everyone
+MODES = ('default', 'uniform', 'single_cycle')
+
+# Scales the default number of mixing moves in 'uniform' mode
+UNIFORM_MIXING_FACTOR = float(os.environ.get("UNIFORM_MIXING_FACTOR", "1"))
+# Tightly constrained draws accept few moves; small ones are cheap to mix longer
+MIN_MIXING_STEPS = 2000
+# Work budget (shuffled positions) for exact rejection sampling before mixing
+REJECTION_BUDGET = 200000
+
+# Several exclusions can be listed in 'relationship', e.g. "Pedro, Juan"
+_EXCLUSION_SEPARATORS = re.compile(r'[,|]')
+
+def excluded_names(giver):
+    """
+    Normalized names the giver cannot give to, from its 'relationship' field.
+    """
+    return [
+        name.strip().lower()
+        for name in _EXCLUSION_SEPARATORS.split(giver.get('relationship') or "")
+        if name.strip()
+    ]
 
 def is_valid_assignment(giver, receiver):
     """
@@ -8,46 +37,469 @@ def is_valid_assignment(giver, receiver):
     # 1. Self-exclusion
     if giver['name'] == receiver['name']:
         return False
-    
+
     # 2. Relationship exclusion
-    # If giver has a 'relationship' field, they cannot give to that person.
+    # If giver has a 'relationship' field, they cannot give to those people.
     # We strip and lower to ensure robust matching.
-    excluded_name = (giver.get('relationship') or "").strip().lower()
     receiver_name = (receiver.get('name') or "").strip().lower()
-    
-    if excluded_name and excluded_name == receiver_name:
+
+    if receiver_name in excluded_names(giver):
         return False
-        
+
     return True
 
-def generate_assignments(participants, max_attempts=1000):
+class Exclusions:
+    """
+    Compiled constraints in compressed-row form: giver i cannot give to
+    itself nor to targets[offsets[i]:offsets[i + 1]], a sorted row. Two flat
+    int arrays instead of a container per giver keep this at ~16 bytes per
+    participant; lookups bisect the row, so even a giver who excludes almost
+    everyone costs O(log k) per check.
+    """
+    __slots__ = ('offsets', 'targets')
+
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """
+        All receivers excluded for giver i, itself included.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return (i,) + tuple(self.targets[self.offsets[i]:self.offsets[i + 1]])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def excluded_set(self, i):
+        """
+        exclusions[i] as a set, for many membership checks against one giver.
+        """
+        excluded = set(self.targets[self.offsets[i]:self.offsets[i + 1]])
+        excluded.add(i)
+        return excluded
+
+    def allows(self, giver, receiver):
+        if receiver == giver:
+            return False
+        hi = self.offsets[giver + 1]
+        pos = bisect_left(self.targets, receiver, self.offsets[giver], hi)
+        return pos == hi or self.targets[pos] != receiver
+
+def _index_names(participants):
+    """
+    Normalized name -> participant index (or list of indices when repeated).
+    """
+    index = {}
+    for idx, p in enumerate(participants):
+        name = p.get('name') or ""
+        key = name.strip().lower()
+        if key == name:
+            key = name  # Reuse the participant's string instead of keeping a copy
+        found = index.get(key)
+        if found is None:
+            index[key] = idx
+        elif isinstance(found, list):
+            found.append(idx)
+        else:
+            index[key] = [found, idx]
+    return index
+
+def _lookup(index, name):
+    found = index.get((name or "").strip().lower())
+    if found is None:
+        return ()
+    return found if isinstance(found, list) else (found,)
+
+def build_exclusions(participants, history=()):
+    """
+    Compiles the constraints once: for every giver index, the receiver
+    indices it cannot be assigned to are itself, everyone listed in its
+    'relationship' field and, from `history` (giver_name, receiver_name)
+    pairs of previous draws, whoever it already gave to.
+    Exclusions are sparse, so this stays O(n + exclusions) in memory instead
+    of an n x n compatibility matrix. Works on dicts or Participant records.
+    """
+    index = _index_names(participants)
+
+    past_receivers = {}
+    for giver_name, receiver_name in history:
+        receivers = _lookup(index, receiver_name)
+        if receivers:
+            for giver in _lookup(index, giver_name):
+                past_receivers.setdefault(giver, []).extend(receivers)
+
+    offsets = array('l', [0])
+    targets = array('l')
+    for i, p in enumerate(participants):
+        excluded = []
+        namesakes = _lookup(index, p['name'])
+        if len(namesakes) > 1:
+            # Self-exclusion compares exact names, like is_valid_assignment
+            excluded.extend(j for j in namesakes if participants[j]['name'] == p['name'])
+        for name in excluded_names(p):
+            excluded.extend(_lookup(index, name))
+        excluded.extend(past_receivers.get(i, ()))
+        if excluded:
+            targets.extend(sorted(j for j in set(excluded) if j != i))
+        offsets.append(len(targets))
+
+    return Exclusions(offsets, targets)
+
+def is_valid_permutation(exclusions, perm):
+    """
+    Checks a whole giver -> receiver index permutation against compiled exclusions.
+    """
+    return len(set(perm)) == len(perm) and all(exclusions.allows(i, r) for i, r in enumerate(perm))
+
+def _augment(perm, giver, exclusions, owner, free):
+    """
+    Breadth-first search for an alternating path that gives `giver` a receiver.
+    The compatibility graph is the complement of the (sparse) exclusion sets,
+    so each receiver is scanned once and only excluded ones are re-checked,
+    keeping a search at O(n + exclusions).
+    Returns (True, None) after rewiring `perm`, or (False, visited_givers).
+    """
+    unvisited = list(range(len(perm)))
+    random.shuffle(unvisited)
+    parent = {}
+    visited_givers = [giver]
+    queue = [giver]
+    head = 0
+
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        excluded = exclusions.excluded_set(current)
+        remaining = []
+        for receiver in unvisited:
+            if receiver in excluded:
+                remaining.append(receiver)
+                continue
+            parent[receiver] = current
+            if receiver in free:
+                # Walk back the path flipping matched edges
+                free.discard(receiver)
+                while True:
+                    g = parent[receiver]
+                    previous = perm[g]
+                    perm[g] = receiver
+                    owner[receiver] = g
+                    if g == giver:
+                        return True, None
+                    receiver = previous
+            next_giver = owner[receiver]
+            visited_givers.append(next_giver)
+            queue.append(next_giver)
+        unvisited = remaining
+
+    return False, visited_givers
+
+def _find_matching(exclusions, repair_tries, stats=None):
+    """
+    Builds a giver -> receiver index permutation respecting `exclusions`.
+    Starts from a random permutation, repairs conflicts with random swaps and
+    falls back to augmenting paths for whatever is still stuck.
+    Returns (perm, None) or (None, smallest set of givers that cannot be served).
+    `stats`, if a dict, gets the 'swap_tries' and 'augmenting_paths' counts.
+    """
+    n = len(exclusions)
+    perm = list(range(n))
+    random.shuffle(perm)
+    allows = exclusions.allows
+
+    stuck = []
+    tries = 0
+    for i in range(n):
+        if allows(i, perm[i]):
+            continue
+        for _ in range(repair_tries):
+            tries += 1
+            j = random.randrange(n)
+            if allows(i, perm[j]) and allows(j, perm[i]):
+                perm[i], perm[j] = perm[j], perm[i]
+                break
+        else:
+            stuck.append(i)
+
+    if stats is not None:
+        stats['swap_tries'] = stats.get('swap_tries', 0) + tries
+        stats['augmenting_paths'] = stats.get('augmenting_paths', 0) + len(stuck)
+    if not stuck:
+        return perm, None
+
+    owner = [None] * n
+    free = set()
+    for i in stuck:
+        free.add(perm[i])
+        perm[i] = None
+    for i, receiver in enumerate(perm):
+        if receiver is not None:
+            owner[receiver] = i
+
+    conflict = None
+    for giver in stuck:
+        found, visited = _augment(perm, giver, exclusions, owner, free)
+        if not found and (conflict is None or len(visited) < len(conflict)):
+            conflict = visited
+
+    if conflict is not None:
+        return None, conflict
+    return perm, None
+
+def find_conflict(participants, history=()):
+    """
+    Pre-check for impossible draws (Hall's theorem on the compatibility graph).
+    Returns None if a valid assignment exists, otherwise the smallest
+    over-constrained group found: participants who, between them, can only
+    give to fewer people than they are. `history` as in generate_assignments.
+    """
+    if not participants:
+        return None
+
+    exclusions = build_exclusions(participants, history)
+    _, conflict = _find_matching(exclusions, repair_tries=8)
+    if conflict is None:
+        return None
+    return [participants[i] for i in conflict]
+
+def _mix(perm, exclusions, steps):
+    """
+    Markov chain over valid permutations. Each move picks k distinct givers
+    (k = 2 with probability 1/2, 3 with 1/4, ...) and rotates their
+    receivers along them, kept only if everyone stays valid. The reverse
+    rotation is proposed with the same probability, so the chain's
+    stationary distribution is uniform; and any two valid assignments differ
+    by cycles that can each be rotated on their own, so every valid
+    assignment is reachable (plain swaps alone can get stuck, e.g. n = 3).
+    """
+    n = len(perm)
+    if n < 2:
+        return perm
+    if steps is None:
+        # ~n log n moves touch every giver several times over
+        steps = max(int(n * (math.log(n) + 1) * UNIFORM_MIXING_FACTOR), MIN_MIXING_STEPS)
+    allows = exclusions.allows
+    randrange = random.randrange
+    sample = random.sample
+    population = range(n)
+    for _ in range(steps):
+        k = 2
+        while randrange(2) and k < n + 1:
+            k += 1
+        if k > n:
+            continue  # Rejected move: keeps the proposal symmetric
+        if k == 2:
+            i = randrange(n)
+            j = randrange(n)
+            if i != j and allows(i, perm[j]) and allows(j, perm[i]):
+                perm[i], perm[j] = perm[j], perm[i]
+            continue
+        givers = sample(population, k)
+        # Giver givers[t] takes the receiver of givers[t + 1]
+        if all(allows(givers[t], perm[givers[(t + 1) % k]]) for t in range(k)):
+            first = perm[givers[0]]
+            for t in range(k - 1):
+                perm[givers[t]] = perm[givers[t + 1]]
+            perm[givers[-1]] = first
+    return perm
+
+def _sample_uniform(exclusions, start, mixing_steps):
+    """
+    A uniformly random valid permutation: plain rejection sampling (exact)
+    while it fits in REJECTION_BUDGET, otherwise `start` (a valid
+    permutation) mixed by _mix.
+    """
+    n = len(exclusions)
+    allows = exclusions.allows
+    perm = list(range(n))
+    shuffle = random.shuffle
+    for _ in range(REJECTION_BUDGET // n):
+        shuffle(perm)
+        if all(allows(i, r) for i, r in enumerate(perm)):
+            return perm
+    return _mix(start, exclusions, mixing_steps)
+
+def _sattolo(n):
+    """
+    Sattolo's algorithm: a uniformly random permutation made of one single cycle.
+    """
+    perm = list(range(n))
+    for i in range(n - 1, 0, -1):
+        j = random.randrange(i)
+        perm[i], perm[j] = perm[j], perm[i]
+    return perm
+
+# Fresh random orders tried by _find_cycle before giving up
+CYCLE_RESTARTS = 20
+
+def _find_cycle(exclusions, repair_tries, stats=None):
+    """
+    Hamiltonian cycle over the compatibility graph: a circular order of the
+    givers where everyone gives to the next one. Starts from a random order
+    and repairs each forbidden link by swapping the receiver with a random
+    position when that lowers the number of forbidden links around both
+    spots. Each swap only re-checks four links, so with sparse exclusions
+    (few bad links to begin with) a draw stays near-linear.
+    Heuristic: returns the permutation, or None if no cycle was found.
+    `stats`, if a dict, gets the 'swap_tries' and 'restarts' counts.
+    """
+    n = len(exclusions)
+    if n < 2:
+        return None
+    if not exclusions.targets:
+        return _sattolo(n)
+
+    allows = exclusions.allows
+    randrange = random.randrange
+    order = list(range(n))
+
+    def broken(positions):
+        return sum(1 for k in positions if not allows(order[k], order[(k + 1) % n]))
+
+    if stats is None:
+        stats = {}
+    stats.setdefault('swap_tries', 0)
+    for restart in range(CYCLE_RESTARTS):
+        stats['restarts'] = restart
+        random.shuffle(order)
+        for k in range(n):
+            if allows(order[k], order[(k + 1) % n]):
+                continue
+            b = (k + 1) % n
+            for _ in range(repair_tries):
+                stats['swap_tries'] += 1
+                j = randrange(n)
+                if j == b:
+                    continue
+                around = {k, b, (j - 1) % n, j}
+                before = broken(around)
+                order[b], order[j] = order[j], order[b]
+                if broken(around) < before:
+                    break
+                order[b], order[j] = order[j], order[b]
+
+        if broken(range(n)) == 0:
+            perm = [0] * n
+            for k in range(n):
+                perm[order[k]] = order[(k + 1) % n]
+            return perm
+    return None
+
+def _draw(exclusions, max_attempts, mode, mixing_steps, stats=None):
+    if mode not in MODES:
+        raise ValueError(f"Unknown draw mode: {mode}")
+    if mode == 'single_cycle':
+        perm = _find_cycle(exclusions, max_attempts, stats)
+        if perm is not None:
+            return perm, None
+        # No chain found: still name the over-constrained givers when even a
+        # plain assignment is impossible (conflict stays None otherwise)
+        _, conflict = _find_matching(exclusions, 8)
+        return None, conflict
+    perm, conflict = _find_matching(exclusions, max_attempts, stats)
+    if perm is not None and mode == 'uniform':
+        perm = _sample_uniform(exclusions, perm, mixing_steps)
+    return perm, conflict
+
+def generate_assignments(participants, max_attempts=1000, history=(), mode='default', mixing_steps=None, stats=None):
     """
     Generates a valid Secret Santa assignment list.
     Returns: List of tuples (giver_dict, receiver_dict) or None if failed.
+    `max_attempts` bounds the random swaps tried per conflicting giver before
+    falling back to an exact augmenting-path search. `history` holds
+    (giver_name, receiver_name) pairs from previous draws to avoid repeating.
+    mode='uniform' then resamples by rejection when that is cheap, or runs
+    `mixing_steps` rotation moves (default ~n log n, at least
+    MIN_MIXING_STEPS), so every valid assignment is (close to) equally likely. mode='single_cycle'
+    returns one gift chain through everyone (Sattolo's algorithm without
+    exclusions, a cycle search with repair otherwise), or None if none was found.
+    `stats`, if a dict, is filled with the search effort (swap tries, ...).
+    """
+    assignments, _ = draw(participants, history, mode, max_attempts, mixing_steps, stats)
+    return assignments
+
+def draw(participants, history=(), mode='default', max_attempts=1000, mixing_steps=None, stats=None):
+    """
+    One draw, building the exclusions and the matching only once.
+    Returns: (assignments, None) on success; (None, conflict) when no valid
+    assignment exists, with conflict as in find_conflict; (None, None) when
+    a single_cycle chain wasn't found. Arguments as in generate_assignments.
     """
     if not participants:
-        return []
-
-    # Deep copy to avoid mutating original list during shuffling
-    givers = participants
-    receivers = copy.deepcopy(participants)
-    
-    for attempt in range(max_attempts):
-        random.shuffle(receivers)
-        
-        assignments = []
-        valid_round = True
-        
-        for i, giver in enumerate(givers):
-            receiver = receivers[i]
-            
-            if not is_valid_assignment(giver, receiver):
-                valid_round = False
-                break
-            
-            assignments.append((giver, receiver))
-        
-        if valid_round:
-            return assignments
-            
-    return None
+        return [], None
+
+    exclusions = build_exclusions(participants, history)
+    perm, conflict = _draw(exclusions, max_attempts, mode, mixing_steps, stats)
+    if perm is None:
+        return None, [participants[i] for i in conflict] if conflict is not None else None
+
+    return [(participants[i], participants[r]) for i, r in enumerate(perm)], None
+
+# Below this many participants in total, a process pool costs more than it saves
+PARALLEL_THRESHOLD = 20000
+
+def group_key(participant):
+    return (participant.get('group') or "").strip()
+
+def _draw_group(payload):
+    """
+    Process-pool worker for draw_groups. Plain data in (names and
+    relationships, history pairs, mode), receiver indices or conflict indices out.
+    """
+    people, history, mode = payload
+    return _draw(build_exclusions(people, history), 1000, mode, None)
+
+def draw_groups(participants, history=(), workers=None, mode='default'):
+    """
+    Draws every group (participant 'group' key) independently, spreading the
+    groups over a process pool of `workers` processes (default: all cores).
+    Whether to use the pool depends on the total participant count, not the
+    group sizes, and small groups are sent to the workers in batches.
+    `mode` as in generate_assignments.
+    Returns: (assignments of every group that could be drawn, report) where
+    report maps each group key to {'size', 'success', 'conflict'}.
+    """
+    groups = {}
+    for p in participants:
+        groups.setdefault(group_key(p), []).append(p)
+
+    history_by_giver = {}
+    for pair in history:
+        history_by_giver.setdefault((pair[0] or "").strip().lower(), []).append(pair)
+
+    keys = list(groups)
+    payloads = []
+    for key in keys:
+        members = groups[key]
+        people = [{'name': p['name'], 'relationship': p.get('relationship') or ""} for p in members]
+        group_history = [
+            pair for p in members
+            for pair in history_by_giver.get((p['name'] or "").strip().lower(), ())
+        ]
+        payloads.append((people, group_history, mode))
+
+    if workers == 1 or len(keys) == 1 or len(participants) < PARALLEL_THRESHOLD:
+        outcomes = list(map(_draw_group, payloads))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Thousands of small groups: batch them to keep IPC overhead low
+            outcomes = list(pool.map(_draw_group, payloads, chunksize=max(1, len(payloads) // (workers * 4))))
+
+    assignments = []
+    report = {}
+    for key, (perm, conflict) in zip(keys, outcomes):
+        members = groups[key]
+        if perm is None:
+            report[key] = {'size': len(members), 'success': False, 'conflict': [members[i]['name'] for i in conflict or ()]}
+        else:
+            assignments.extend((members[i], members[r]) for i, r in enumerate(perm))
+            report[key] = {'size': len(members), 'success': True, 'conflict': []}
+    return assignments, report
@@ -0,0 +1,119 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a cached lookup to a slow SMTP handshake
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic in-process counter, optionally split by labels.
+    """
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. An observation is one bisect and a few
+    additions under a lock, cheap enough for every request.
+    """
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(name, "") for name in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, [('le', bound if bound == '+Inf' else _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+def render():
+    """
+    Every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Hot paths ---
+LOAD_DATA_SECONDS = Histogram('amigo_load_data_seconds', 'Time spent loading every participant from the backend.', ['backend'])
+SAVE_EMAIL_SECONDS = Histogram('amigo_save_email_seconds', 'Time spent saving registrations (bulk=true for batched imports).', ['backend', 'bulk'])
+SAVE_EMAIL_ERRORS = Counter('amigo_save_email_errors_total', 'Registrations the backend failed to save.', ['backend'])
+MATCHER_SECONDS = Histogram('amigo_matcher_seconds', 'Time spent computing an assignment.', ['mode', 'grouped'])
+MATCHER_SWAP_TRIES = Counter('amigo_matcher_swap_tries_total', 'Random swaps tried by the matcher to repair conflicts.', ['mode'])
+MATCHER_AUGMENTING_PATHS = Counter('amigo_matcher_augmenting_paths_total', 'Givers the matcher had to place with an augmenting-path search.', ['mode'])
+MATCHER_FAILURES = Counter('amigo_matcher_failures_total', 'Draws for which no valid assignment was found.', ['mode'])
+SMTP_CONNECT_SECONDS = Histogram('amigo_smtp_connect_seconds', 'Time to open and log into an SMTP session.')
+SMTP_SEND_SECONDS = Histogram('amigo_smtp_send_seconds', 'Time per email send, retries and throttling included.', ['result'])
@@ -0,0 +1,99 @@
+import threading
+import time
+
+class ParticipantStore:
+    """
+    In-process cache in front of a participant loader (app.load_data).
+    Keeps a phone -> participant index so lookups are O(1), reloads after
+    `ttl` seconds and lets only one thread hit the backend at a time.
+    """
+
+    def __init__(self, loader, ttl=30):
+        self._loader = loader
+        self._ttl = ttl
+        self._participants = []
+        self._by_phone = {}
+        self._loaded_at = None
+        # Single-flight: concurrent misses wait for one backend fetch
+        self._load_lock = threading.Lock()
+        # Guards the installed snapshot; only ever held briefly, never across
+        # the loader, so the async app can take it on the event loop
+        self._state_lock = threading.Lock()
+        # Emails written while a fetch is in flight, replayed onto its result
+        self._loading = False
+        self._pending_emails = {}
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl
+
+    def _load(self, force=False):
+        if not force and self._is_fresh():
+            return
+        with self._load_lock:
+            # Another thread may have refreshed while we waited
+            if not force and self._is_fresh():
+                return
+            with self._state_lock:
+                self._loading = True
+            try:
+                participants = self._loader()
+            finally:
+                with self._state_lock:
+                    self._loading = False
+                    pending, self._pending_emails = self._pending_emails, {}
+            self._install(participants, pending)
+
+    def _install(self, participants, pending=None):
+        by_phone = {p['phone']: p for p in participants}
+        for phone, email in (pending or {}).items():
+            if phone in by_phone:
+                by_phone[phone]['email'] = email
+        with self._state_lock:
+            self._participants = participants
+            self._by_phone = by_phone
+            # load_data returns [] on backend errors; don't pin that for a whole TTL
+            self._loaded_at = time.monotonic() if participants else None
+
+    def all(self):
+        self._load()
+        return self._participants
+
+    def get(self, phone):
+        self._load()
+        return self._by_phone.get(phone)
+
+    def is_fresh(self):
+        return self._is_fresh()
+
+    def peek(self, phone):
+        """
+        Lookup in the cached list only, never reaching the backend.
+        """
+        return self._by_phone.get(phone)
+
+    def replace(self, participants):
+        """
+        Installs a list loaded elsewhere (the async app loads it without the
+        blocking loader). Never waits for a fetch in progress.
+        """
+        self._install(participants)
+
+    def refresh(self):
+        self._load(force=True)
+        return self._participants
+
+    def update_email(self, phone, email):
+        """
+        Write-through after a successful save_email. Never waits for a
+        fetch in progress; the email is applied to its result instead.
+        """
+        with self._state_lock:
+            if self._loading:
+                self._pending_emails[phone] = email
+            user = self._by_phone.get(phone)
+            if user is not None:
+                user['email'] = email
+
+    def invalidate(self):
+        with self._state_lock:
+            self._loaded_at = None
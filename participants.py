@@ -0,0 +1,35 @@
+class Participant:
+    """
+    Compact participant record (no per-instance __dict__). Supports the
+    dict-style access (p['name'], p.get('email')) the rest of the code and
+    the matcher already use, so plain dicts keep working alongside it.
+    """
+    __slots__ = ('phone', 'name', 'relationship', 'email', 'group')
+
+    def __init__(self, phone, name, relationship="", email="", group=""):
+        self.phone = phone
+        self.name = name
+        self.relationship = relationship
+        self.email = email
+        # Independent draw (event, family, department) this person belongs to
+        self.group = group
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self):
+        return f"Participant({self.phone!r}, {self.name!r}, {self.relationship!r}, {self.email!r}, {self.group!r})"
@@ -0,0 +1,93 @@
+import threading
+import time
+
+class RegistrationProgress:
+    """
+    registered/total counters updated on each successful registration
+    instead of recounting every participant, and re-checked against
+    `counter` (a function returning (registered, total) from the backend)
+    every `reconcile_every` seconds. Each process keeps its own counters;
+    reconciling corrects for registrations handled elsewhere.
+    Watchers block in wait() until the numbers change.
+    """
+
+    def __init__(self, counter, reconcile_every=60):
+        self._counter = counter
+        self._reconcile_every = reconcile_every
+        self._registered = 0
+        self._total = 0
+        self._version = 0
+        self._writes = 0
+        self._checked_at = None
+        self._changed = threading.Condition()
+
+    def _publish(self, registered, total):
+        # Caller holds self._changed
+        if (registered, total) != (self._registered, self._total):
+            self._registered, self._total = registered, total
+            self._version += 1
+            self._changed.notify_all()
+
+    def reconcile(self):
+        """
+        Recounts from the backend. A count that raced with record() may
+        predate that write, so it only replaces counters that were never
+        set; the next check corrects the rest.
+        """
+        with self._changed:
+            writes = self._writes
+        registered, total = self._counter()
+        with self._changed:
+            raced = self._writes != writes
+            if not raced or self._checked_at is None:
+                self._publish(registered, total)
+            self._checked_at = time.monotonic()
+        return not raced
+
+    def record(self, registered=1):
+        """
+        `registered` participants just went from no email to having one.
+        """
+        with self._changed:
+            self._writes += 1
+            if self._checked_at is not None and registered:
+                self._publish(self._registered + registered, self._total)
+
+    def invalidate(self):
+        with self._changed:
+            self._checked_at = None
+
+    def stale(self):
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self._reconcile_every
+
+    def snapshot(self):
+        if self.stale():
+            self.reconcile()
+        return self.current()
+
+    def current(self):
+        """
+        The counters as they are, without recounting even if stale.
+        """
+        with self._changed:
+            return {
+                'registered': self._registered,
+                'total': self._total,
+                'complete': self._total > 0 and self._registered >= self._total,
+                'version': self._version,
+            }
+
+    def wait(self, version, timeout):
+        """
+        Blocks until the counters move past `version` or `timeout` seconds
+        pass. Returns True if they changed.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._version == version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
@@ -0,0 +1,128 @@
+import argparse
+import sqlite3
+import threading
+import time
+import csv_journal
+from participants import Participant
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    phone TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    relationship TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    grupo TEXT NOT NULL DEFAULT ''
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deliveries (
+    draw_id TEXT NOT NULL,
+    drawn_at REAL NOT NULL,
+    position INTEGER NOT NULL,
+    giver_phone TEXT,
+    giver_name TEXT,
+    giver_email TEXT,
+    receiver_name TEXT,
+    status TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (draw_id, position)
+);
+DROP INDEX IF EXISTS deliveries_latest;
+CREATE INDEX IF NOT EXISTS deliveries_drawn_at ON deliveries (drawn_at);
+"""
+
+class SqliteStore:
+    """
+    Participants in a local SQLite file in WAL mode: lookups hit the primary
+    key on phone, readers never block the writer and each thread keeps its
+    own connection.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self._timeout = timeout
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._timeout, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints, no fsync per commit: WAL keeps it consistent
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load_all(self):
+        rows = self.connection().execute("SELECT phone, name, relationship, email, grupo FROM participants")
+        return [Participant(*row) for row in rows]
+
+    def get(self, phone):
+        row = self.connection().execute(
+            "SELECT phone, name, relationship, email, grupo FROM participants WHERE phone = ?", (phone,)
+        ).fetchone()
+        return Participant(*row) if row else None
+
+    def update_email(self, phone, email):
+        """
+        Returns: (success, error_message) like app.save_email.
+        """
+        with self.connection() as conn:
+            updated = conn.execute("UPDATE participants SET email = ? WHERE phone = ?", (email, phone)).rowcount
+        if not updated:
+            return False, "Usuario no encontrado en la base de datos"
+        return True, ""
+
+    def update_emails(self, emails):
+        """
+        Bulk update of a {phone: email} dict in one transaction.
+        Returns: the phones that were not found.
+        """
+        missing = []
+        with self.connection() as conn:
+            for phone, email in emails.items():
+                if not conn.execute("UPDATE participants SET email = ? WHERE phone = ?", (email, phone)).rowcount:
+                    missing.append(phone)
+        return missing
+
+    def progress(self):
+        """
+        (registered, total) counts without loading every row.
+        """
+        row = self.connection().execute("SELECT count(email != '' OR NULL), count(*) FROM participants").fetchone()
+        return row[0], row[1]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def migrate(csv_path, db_path):
+    """
+    Copies the participants CSV (pending journal changes included) into the
+    SQLite database. Existing phones are overwritten. Returns the row count.
+    """
+    start = time.perf_counter()
+    rows = [(
+        str(row.get('ID', '')).strip(),
+        row.get('nombre') or '',
+        row.get('parentesco') or '',
+        row.get('email') or '',
+        row.get('grupo') or ''
+    ) for row in csv_journal.read_rows(csv_path)]
+
+    store = SqliteStore(db_path)
+    with store.connection() as conn:
+        conn.executemany("INSERT OR REPLACE INTO participants VALUES (?, ?, ?, ?, ?)", rows)
+    store.close()
+    print(f"Migrated {len(rows)} participants from {csv_path} to {db_path} in {time.perf_counter() - start:.1f}s")
+    return len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the participants CSV to SQLite")
+    parser.add_argument('csv', nargs='?', default='bbdd-amigoinvisible.csv')
+    parser.add_argument('db', nargs='?', default='bbdd-amigoinvisible.db')
+    args = parser.parse_args()
+    migrate(args.csv, args.db)
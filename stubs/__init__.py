@@ -0,0 +1,4 @@
+"""
+Local stand-ins for the external services (SMTP, Supabase/PostgREST) used by
+the tests and benchmarks.
+"""
@@ -0,0 +1,309 @@
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _split_top_level(text):
+    """
+    Splits 'a.eq.1,b.in.(x,y)' on commas outside parentheses.
+    """
+    parts, depth, current = [], 0, ''
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+def _compare(value, op, arg):
+    if op == 'in':
+        return str(value) in [item.strip('"') for item in _split_top_level(arg.strip('()'))]
+    if op in ('lt', 'gt', 'lte', 'gte'):
+        try:
+            left, right = float(value), float(arg)
+        except (TypeError, ValueError):
+            left, right = str(value), arg
+        return {'lt': left < right, 'gt': left > right, 'lte': left <= right, 'gte': left >= right}[op]
+    if op == 'eq':
+        return str(value) == arg
+    if op == 'neq':
+        return str(value) != arg
+    raise ValueError(f"Unsupported operator {op}")
+
+def _condition(column, expression):
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, arg = expression.partition('.')
+
+    def check(row):
+        result = _compare(row.get(column), op, arg)
+        return not result if negate else result
+    return check
+
+def _logical(part):
+    """
+    One alternative inside or=(...): 'col.op.value' or a nested 'and(...)'.
+    """
+    if part.startswith('and('):
+        conditions = [_logical(p) for p in _split_top_level(part[4:-1])]
+        return lambda row: all(c(row) for c in conditions)
+    column, _, expression = part.partition('.')
+    return _condition(column, expression)
+
+def _parse_filters(params):
+    checks = []
+    for key, value in params:
+        if key in ('select', 'order', 'on_conflict', 'limit', 'offset'):
+            continue
+        if key == 'or':
+            alternatives = [_logical(part) for part in _split_top_level(value[1:-1])]
+            checks.append(lambda row, alts=alternatives: any(a(row) for a in alts))
+        else:
+            checks.append(_condition(key, value))
+    return lambda row: all(check(row) for check in checks)
+
+_NUMERIC_TYPES = ('smallint', 'integer', 'bigint', 'real', 'double precision', 'numeric')
+
+def load_schema(path):
+    """
+    Reads the CREATE TABLE statements of a SQL file into
+    {table: {'keys': [unique column tuples, primary key first], 'not_null': [...], 'numeric': [...]}}.
+    Only the subset of DDL used by supabase_schema.sql is understood.
+    """
+    with open(path, mode='r', encoding='utf-8') as f:
+        sql = re.sub(r'--[^\n]*', '', f.read())
+    schema = {}
+    for name, body in re.findall(r'CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)\s*\((.*?)\);', sql, re.S | re.I):
+        table = schema[name] = {'keys': [], 'not_null': [], 'numeric': []}
+        for part in _split_top_level(' '.join(body.split())):
+            part = part.strip()
+            constraint = re.match(r'(PRIMARY KEY|UNIQUE)\s*\((.*)\)', part, re.I)
+            if constraint:
+                columns = tuple(c.strip() for c in constraint.group(2).split(','))
+                if constraint.group(1).upper() == 'PRIMARY KEY':
+                    table['keys'].insert(0, columns)
+                    table['not_null'].extend(columns)
+                else:
+                    table['keys'].append(columns)
+                continue
+            column, _, definition = part.partition(' ')
+            upper = definition.upper()
+            if definition.lower().startswith(_NUMERIC_TYPES):
+                table['numeric'].append(column)
+            if 'PRIMARY KEY' in upper:
+                table['keys'].insert(0, (column,))
+            elif 'UNIQUE' in upper:
+                table['keys'].append((column,))
+            if 'NOT NULL' in upper or 'PRIMARY KEY' in upper:
+                table['not_null'].append(column)
+    return schema
+
+class _PostgRESTHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY, Nagle
+    # plus delayed ACKs add ~40 ms to every keep-alive request
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _parse(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        table = parsed.path.rsplit('/', 1)[-1]
+        params = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        return table, params, dict(params)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _send(self, status, payload=None, headers=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        if self.server.key and self.headers.get('apikey') != self.server.key:
+            self._send(401, {'message': 'Invalid API key'})
+            return False
+        return True
+
+    def _project(self, rows, select):
+        if not select or select == '*':
+            return [dict(r) for r in rows]
+        columns = select.split(',')
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    def _invalid(self, table, rows):
+        """
+        Sends the error Postgres would raise for a NOT NULL or numeric column
+        given the wrong value in any of `rows`. Returns: True if it did.
+        """
+        numeric = self.server.schema.get(table, {}).get('numeric', ())
+        for row in rows:
+            missing = [c for c in self.server.not_null.get(table, ()) if c in row and row[c] is None]
+            if missing:
+                self._send(400, {'code': '23502', 'message': f'null value in column "{missing[0]}" violates not-null constraint'})
+                return True
+            wrong = [c for c in numeric if row.get(c) is not None and (isinstance(row[c], bool) or not isinstance(row[c], (int, float)))]
+            if wrong:
+                self._send(400, {'code': '22P02', 'message': f'invalid input syntax for numeric column "{wrong[0]}": {row[wrong[0]]!r}'})
+                return True
+        return False
+
+    def _before(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_GET(self):
+        self._before()
+        if not self._authorized():
+            return
+        table, params, flat = self._parse()
+        with self.server.lock:
+            rows = [r for r in self.server.tables.setdefault(table, []) if _parse_filters(params)(r)]
+        if 'order' in flat:
+            # Stable sorts, last key first: 'a.desc,b' sorts by a, then b
+            for term in reversed(flat['order'].split(',')):
+                column, _, direction = term.partition('.')
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith('desc'))
+        else:
+            # Postgres guarantees no order without ORDER BY; neither do we
+            random.shuffle(rows)
+        start, end = 0, len(rows) - 1
+        if self.headers.get('Range'):
+            first, _, last = self.headers['Range'].partition('-')
+            start, end = int(first), min(int(last), len(rows) - 1)
+        page = rows[start:end + 1]
+        content_range = f"{start}-{start + len(page) - 1}/*" if page else "*/0"
+        self._send(200, self._project(page, flat.get('select')), {'Content-Range': content_range})
+
+    def do_PATCH(self):
+        self._before()
+        if not self._authorized():
+            return
+        table, params, _ = self._parse()
+        changes = self._body() or {}
+        if self._invalid(table, [changes]):
+            return
+        with self.server.lock:
+            matching = [r for r in self.server.tables.setdefault(table, []) if _parse_filters(params)(r)]
+            for row in matching:
+                row.update(changes)
+            updated = [dict(r) for r in matching]
+        if 'return=representation' in (self.headers.get('Prefer') or ''):
+            self._send(200, updated)
+        else:
+            self._send(204)
+
+    def do_POST(self):
+        self._before()
+        if not self._authorized():
+            return
+        table, _, flat = self._parse()
+        payload = self._body()
+        rows = payload if isinstance(payload, list) else [payload]
+        prefer = self.headers.get('Prefer') or ''
+        keys = (flat.get('on_conflict') or self.server.primary_keys.get(table, 'id')).split(',')
+        declared = self.server.schema.get(table, {}).get('keys')
+        if declared is not None and tuple(keys) not in declared:
+            self._send(400, {'code': '42P10', 'message': 'there is no unique or exclusion constraint matching the ON CONFLICT specification'})
+            return
+
+        # Like Postgres, NOT NULL is checked before ON CONFLICT, for the whole statement
+        for row in rows:
+            missing = [c for c in self.server.not_null.get(table, ()) if row.get(c) is None]
+            if missing:
+                self._send(400, {'code': '23502', 'message': f'null value in column "{missing[0]}" violates not-null constraint'})
+                return
+        if self._invalid(table, rows):
+            return
+
+        with self.server.lock:
+            existing = self.server.tables.setdefault(table, [])
+            index = {tuple(str(r.get(k)) for k in keys): r for r in existing}
+            for row in rows:
+                key = tuple(str(row.get(k)) for k in keys)
+                if key in index:
+                    if 'resolution=merge-duplicates' not in prefer:
+                        self._send(409, {'message': 'duplicate key value violates unique constraint'})
+                        return
+                    index[key].update(row)
+                else:
+                    stored = dict(row)
+                    existing.append(stored)
+                    index[key] = stored
+
+        if 'return=representation' in prefer:
+            self._send(201, rows)
+        else:
+            self._send(201)
+
+class StubPostgRESTServer(ThreadingHTTPServer):
+    """
+    In-memory stand-in for Supabase's PostgREST API on localhost: eq/neq/lt/gt/
+    in/not/or/and filters, select, order, Range pagination, PATCH and POST with
+    on_conflict upserts. `latency` delays every request; `not_null` maps a
+    table to columns every inserted or upserted row must carry. `schema`
+    (see load_schema) adds each table's keys, NOT NULL and numeric columns,
+    and rejects upserts on columns without a unique constraint.
+    """
+    daemon_threads = True
+
+    def __init__(self, tables=None, key='test-key', latency=0.0, primary_keys=None, not_null=None, schema=None):
+        super().__init__(('127.0.0.1', 0), _PostgRESTHandler)
+        self.tables = tables if tables is not None else {}
+        self.key = key
+        self.latency = latency
+        self.schema = schema or {}
+        self.primary_keys = {'draw_jobs': 'slot'}
+        self.primary_keys.update({t: ','.join(s['keys'][0]) for t, s in self.schema.items() if s['keys']})
+        self.primary_keys.update(primary_keys or {})
+        self.not_null = {t: s['not_null'] for t, s in self.schema.items()}
+        self.not_null.update(not_null or {})
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def env(self):
+        """
+        Environment that points the app at this server.
+        """
+        return {"SUPABASE_URL": self.url, "SUPABASE_KEY": self.key}
@@ -0,0 +1,105 @@
+import socketserver
+import threading
+import time
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        # Stands in for the TCP + TLS handshake cost of a real provider
+        if server.connect_delay:
+            time.sleep(server.connect_delay)
+        with server.lock:
+            server.connections += 1
+        self._reply('220 stub ESMTP ready')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-stub\r\n250-AUTH PLAIN LOGIN\r\n250 OK\r\n')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                if server.reject_login:
+                    self._reply('535 Authentication credentials invalid')
+                else:
+                    self._reply('235 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                chunks = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b'.\r\n':
+                        break
+                    chunks.append(data_line)
+                if server.message_delay:
+                    time.sleep(server.message_delay)
+                with server.lock:
+                    server.messages.append(b''.join(chunks))
+                    if server.drop_after and len(server.messages) % server.drop_after == 0:
+                        # Simulate the provider closing the session mid-batch
+                        self._reply('250 OK')
+                        break
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                break
+            else:
+                self._reply('502 Command not implemented')
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimal plain-text SMTP server on localhost that accepts any login (or,
+    with `reject_login`, none) and records every message. `connect_delay` and
+    `message_delay` add artificial latency; `drop_after` closes the
+    connection after every N messages. It never offers STARTTLS.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay=0.0, message_delay=0.0, drop_after=0, reject_login=False):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.drop_after = drop_after
+        self.reject_login = reject_login
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def env(self):
+        """
+        Environment that points email_service at this server.
+        """
+        return {
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_USE_SSL": "false",
+            "SMTP_STARTTLS": "false",
+            "EMAIL_USER": "santa@test.com",
+            "EMAIL_PASSWORD": "secret",
+        }
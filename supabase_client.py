@@ -0,0 +1,144 @@
+import http.client
+import json
+import queue
+import urllib.parse
+
+class SupabaseError(Exception):
+    """
+    Non-2xx answer from PostgREST. `code` mirrors urllib.error.HTTPError.
+    """
+
+    def __init__(self, code, body):
+        super().__init__(f"HTTP Error {code}: {body}")
+        self.code = code
+        self.body = body
+
+def _select_query(table, columns, filters, order):
+    query = f"{table}?select={columns}"
+    if filters:
+        query += f"&{filters}"
+    if not any(part.startswith('order=') for part in filters.split('&')):
+        query += f"&order={order}"
+    return query
+
+class SupabaseClient:
+    """
+    Minimal PostgREST client over a small pool of keep-alive connections, so
+    repeated calls skip the TCP + TLS handshake that urllib.urlopen pays
+    every time.
+    """
+
+    def __init__(self, base_url, key, pool_size=4, timeout=10):
+        parsed = urllib.parse.urlsplit(base_url)
+        self._https = parsed.scheme == 'https'
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._prefix = parsed.path.rstrip('/') + '/rest/v1/'
+        self._key = key
+        self._timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _headers(self, extra=None):
+        headers = {
+            "apikey": self._key,
+            "Authorization": f"Bearer {self._key}",
+            "Content-Type": "application/json",
+            "Connection": "keep-alive"
+        }
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def _new_connection(self):
+        if self._https:
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Sends one request on a pooled connection.
+        Returns: (status, response headers, decoded JSON or None).
+        """
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        url = self._prefix + path
+
+        conn, reused = self._acquire()
+        try:
+            try:
+                conn.request(method, url, body=data, headers=self._headers(headers))
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry on a fresh one
+                conn.close()
+                conn = self._new_connection()
+                conn.request(method, url, body=data, headers=self._headers(headers))
+                response = conn.getresponse()
+            payload = response.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+        text = payload.decode('utf-8')
+        if response.status >= 400:
+            raise SupabaseError(response.status, text)
+        return response.status, response.headers, json.loads(text) if text else None
+
+    def select(self, table, columns='*', filters='', page_size=1000, order='id'):
+        """
+        Streams rows page by page using Range headers, so memory stays bounded
+        by `page_size` whatever the table size. Pages are sorted by `order`
+        (a unique key) unless `filters` has its own order=: without a stable
+        order Postgres may skip or repeat rows between pages.
+        """
+        query = _select_query(table, columns, filters, order)
+        offset = 0
+        while True:
+            _, _, rows = self.request('GET', query, headers={
+                "Range-Unit": "items",
+                "Range": f"{offset}-{offset + page_size - 1}"
+            })
+            rows = rows or []
+            yield from rows
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
+    def update(self, table, filters, data):
+        """
+        PATCH matching rows. Returns the updated rows.
+        """
+        _, _, rows = self.request('PATCH', f"{table}?{filters}", data, {"Prefer": "return=representation"})
+        return rows or []
+
+    def insert(self, table, rows):
+        _, _, created = self.request('POST', table, rows, {"Prefer": "return=representation"})
+        return created or []
+
+    def upsert(self, table, rows, on_conflict):
+        self.request('POST', f"{table}?on_conflict={on_conflict}", rows, {"Prefer": "resolution=merge-duplicates,return=minimal"})
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,36 @@
+-- Tables the app needs in Supabase besides `participants`.
+-- Run once in the Supabase SQL editor (or psql) before the first draw.
+-- Timestamps are epoch seconds as written by time.time(), not timestamptz:
+-- the app filters on them with plain numbers.
+
+-- Draw job state (draw_jobs.SupabaseJobStore): a single row, slot = 'current'.
+-- The primary key on slot is what makes the first insert a compare-and-set.
+CREATE TABLE IF NOT EXISTS draw_jobs (
+    slot text PRIMARY KEY,
+    job_id text NOT NULL,
+    status text NOT NULL,
+    trigger text NOT NULL,
+    created_at double precision NOT NULL,
+    updated_at double precision NOT NULL,
+    total integer NOT NULL DEFAULT 0,
+    sent integer NOT NULL DEFAULT 0,
+    failed integer NOT NULL DEFAULT 0,
+    message text NOT NULL DEFAULT ''
+);
+
+-- Delivery ledger (delivery_ledger.SupabaseLedger): one row per giver and draw.
+-- Upserts use on_conflict=draw_id,position, which needs this primary key.
+CREATE TABLE IF NOT EXISTS deliveries (
+    draw_id text NOT NULL,
+    drawn_at double precision NOT NULL,
+    position integer NOT NULL,
+    giver_phone text,
+    giver_name text,
+    giver_email text,
+    receiver_name text,
+    status text,
+    attempts integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (draw_id, position)
+);
+-- Finds the draws of the last DRAW_HISTORY_YEARS years
+CREATE INDEX IF NOT EXISTS deliveries_drawn_at ON deliveries (drawn_at);
@@ -1,69 +1,129 @@
-import csv
-import json
-import urllib.request
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import csv_journal
+from supabase_client import SupabaseClient
 
 load_dotenv()
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Remote column for the CSV 'grupo' column, as in app.py
+SUPABASE_GROUP_COLUMN = os.environ.get("SUPABASE_GROUP_COLUMN")
 
-def sync():
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: Supabase credentials not found.")
-        return
+CSV_FILE = 'bbdd-amigoinvisible.csv'
+COLUMNS = ('id', 'name', 'relationship', 'email')
 
-    # 1. Read CSV
+def _columns(group_column):
+    return COLUMNS + (group_column,) if group_column else COLUMNS
+
+def read_csv_participants(path=CSV_FILE, group_column=None):
+    """
+    CSV rows as Supabase rows; the 'grupo' column goes to `group_column`.
+    """
     participants = []
+    warned = False
+    # Include registrations still pending in the CSV journal
+    for row in csv_journal.read_rows(path):
+        participant = {
+            "id": row['ID'].strip(),
+            "name": row['nombre'].strip(),
+            "relationship": row['parentesco'].strip(),
+            "email": (row.get('email') or '').strip()
+        }
+        group = (row.get('grupo') or '').strip()
+        if group_column:
+            participant[group_column] = group
+        elif group and not warned:
+            print("Warning: the CSV has groups but SUPABASE_GROUP_COLUMN is not set; they won't be synced.")
+            warned = True
+        participants.append(participant)
+    return participants
+
+def _text(value):
+    # Supabase may return numbers (a numeric id column) or null; the CSV has text
+    return '' if value is None else str(value).strip()
+
+def diff(local, remote, group_column=None):
+    """
+    Compares CSV rows with the remote table by `id`.
+    Returns: (inserted rows, changed rows, unchanged count)
+    """
+    columns = _columns(group_column)
+    remote_by_id = {
+        _text(r.get('id')): {c: _text(r.get(c)) for c in columns}
+        for r in remote
+    }
+    inserted, changed, unchanged = [], [], 0
+    for row in local:
+        current = remote_by_id.get(row['id'])
+        if current is None:
+            inserted.append(row)
+        elif current != row:
+            changed.append(row)
+        else:
+            unchanged += 1
+    return inserted, changed, unchanged
+
+def sync(chunk_size=500, workers=4, client=None, path=CSV_FILE, group_column=None):
+    """
+    Uploads only new or changed participants, in chunks sent concurrently.
+    `group_column` defaults to SUPABASE_GROUP_COLUMN.
+    Returns a report dict (also printed), or None on error.
+    """
+    group_column = group_column or SUPABASE_GROUP_COLUMN
+    if client is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            print("Error: Supabase credentials not found.")
+            return None
+        client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY, pool_size=workers)
+
+    # 1. Read CSV
     try:
-        with open('bbdd-amigoinvisible.csv', mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                participants.append({
-                    "id": row['ID'].strip(),
-                    "name": row['nombre'].strip(),
-                    "relationship": row['parentesco'].strip(),
-                    "email": row.get('email', '').strip()
-                })
+        participants = read_csv_participants(path, group_column)
     except Exception as e:
         print(f"Error reading CSV: {e}")
-        return
+        return None
 
     print(f"Found {len(participants)} participants in CSV.")
 
-    # 2. Clear Supabase table (DELETE all)
-    # Note: In Supabase, to delete all you need a filter or specific permissions. 
-    # Usually 'id=neq.0' works or similar if RLS allows.
-    # Alternatively, we can just UPSERT if we have IDs.
-    
-    url = f"{SUPABASE_URL}/rest/v1/participants"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates" # Upsert behavior
-    }
-
-    # Since we want a "Clean" state as requested ("actualiza la tabla"), 
-    # and the user expects only these 2, we should ideally truncate.
-    # But for a simple test, UPSERTing these 2 is safer than a blind DELETE.
-    
-    print("Syncing to Supabase...")
-    data = json.dumps(participants).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers=headers, method='POST')
-    
-    # Bypass SSL verification for local script update
-    import ssl
-    context = ssl._create_unverified_context()
-    
+    start = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, context=context) as response:
-            print(f"Status: {response.getcode()}")
-            print("Sync complete!")
+        # 2. Fetch remote state and diff by id
+        remote = client.select('participants', columns=','.join(_columns(group_column)))
+        inserted, changed, unchanged = diff(participants, remote, group_column)
+        pending = inserted + changed
+
+        # 3. Upsert the difference, several chunks in flight at once
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        print(f"Syncing {len(pending)} rows to Supabase in {len(chunks)} chunks...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for future in [pool.submit(client.upsert, 'participants', chunk, 'id') for chunk in chunks]:
+                future.result()
     except Exception as e:
         print(f"Error syncing: {e}")
+        return None
+
+    elapsed = time.perf_counter() - start
+    report = {
+        'total': len(participants),
+        'inserted': len(inserted),
+        'changed': len(changed),
+        'unchanged': unchanged,
+        'chunks': len(chunks),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(len(pending) / elapsed, 1) if elapsed else 0.0
+    }
+    print(f"Sync complete! {report['inserted']} inserted, {report['changed']} changed, "
+          f"{report['unchanged']} unchanged in {report['seconds']}s ({report['rows_per_second']} rows/s)")
+    return report
 
 if __name__ == "__main__":
-    sync()
+    parser = argparse.ArgumentParser(description="Sync the participants CSV to Supabase")
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    sync(chunk_size=args.chunk_size, workers=args.workers)
 # Sync Utility
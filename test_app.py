@@ -0,0 +1,270 @@
+import time
+import pytest
+import app as app_module
+import csv_journal
+import delivery_ledger
+import draw_jobs
+from participant_store import ParticipantStore
+from progress import RegistrationProgress
+from stubs.smtp_server import StubSMTPServer
+
+ADMIN = {'X-Admin-Key': 'secret'}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / 'participants.csv'
+    path.write_text(
+        'ID;nombre;parentesco;email\n'
+        '600000001;Ricardo;Liliana;\n'
+        '600000002;Liliana;Ricardo;\n'
+        '600000003;Juan;;juan@test.com\n'
+        '600000004;Maria;;\n',
+        encoding='utf-8'
+    )
+    monkeypatch.setenv('ADMIN_SECRET_KEY', 'secret')
+    monkeypatch.setattr(app_module, 'USE_SUPABASE', None)
+    monkeypatch.setattr(app_module, 'CSV_FILE', str(path))
+    monkeypatch.setattr(app_module, 'participant_store', ParticipantStore(app_module.load_data))
+    monkeypatch.setattr(app_module, 'draw_store', draw_jobs.FileJobStore(str(tmp_path / 'draw.json')))
+    monkeypatch.setattr(app_module, 'ledger', delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv')))
+    monkeypatch.setattr(app_module, 'registration_counter', RegistrationProgress(app_module.registration_progress))
+    return app_module.app.test_client()
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = StubSMTPServer(message_delay=0.2).start()
+    for key, value in server.env().items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setenv('EMAIL_WORKERS', '1')
+    monkeypatch.setattr(delivery_ledger, 'RETRY_BASE_DELAY', 0)
+    yield server
+    server.stop()
+
+def _wait_for_job(client, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get('/api/admin/draw/status', headers=ADMIN).get_json()['job']
+        if job and job['status'] not in draw_jobs.ACTIVE_STATUSES or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+def _register_everyone(client):
+    for phone in ('600000001', '600000002', '600000004'):
+        body = client.post('/api/register_email', json={'phone': phone, 'email': f'{phone}@test.com'}).get_json()
+        assert body['success'], body
+
+def test_last_registration_starts_one_background_draw(client, smtp):
+    assert client.get('/api/admin/draw/status').status_code == 401
+    assert client.get('/api/admin/draw/status', headers=ADMIN).get_json() == {'success': True, 'job': None}
+
+    start = time.perf_counter()
+    _register_everyone(client)
+    # Four emails at 200 ms each go out after the response, not before it
+    assert time.perf_counter() - start < 0.6
+    assert client.get('/api/admin/draw/status', headers=ADMIN).get_json()['job']['trigger'] == 'auto'
+
+    job = _wait_for_job(client)
+    assert (job['status'], job['total'], job['sent'], job['failed']) == ('done', 4, 4, 0)
+    assert len(smtp.messages) == 4
+
+    # Registering again (a retry, or a changed email) doesn't draw again
+    assert client.post('/api/register_email', json={'phone': '600000004', 'email': 'maria@test.com'}).get_json()['success']
+    time.sleep(0.1)
+    assert _wait_for_job(client)['id'] == job['id']
+    assert len(smtp.messages) == 4
+
+def test_auto_draw_without_email_credentials(client, smtp, monkeypatch):
+    monkeypatch.delenv('EMAIL_USER')
+    _register_everyone(client)
+    job = _wait_for_job(client)
+    # Every send failed, but the draw itself didn't crash
+    assert (job['status'], job['sent'], job['failed']) == ('done', 0, 4)
+    assert 'Error interno' not in job['message']
+
+def test_resume_route_sends_only_what_failed(client, smtp, monkeypatch):
+    assert client.post('/api/admin/draw/resume').status_code == 401
+    assert client.post('/api/admin/draw/resume', headers=ADMIN).status_code == 404
+    for phone in ('600000001', '600000002', '600000004'):
+        app_module.save_email(phone, f'{phone}@test.com')
+
+    # The SMTP login is wrong for the whole draw: nothing gets out
+    monkeypatch.delenv('EMAIL_PASSWORD')
+    body = client.post('/api/admin/draw', headers=ADMIN).get_json()
+    assert [r['success'] for r in body['results']] == [False] * 4
+    job_id = client.get('/api/admin/draw/status', headers=ADMIN).get_json()['job']['id']
+    drawn = [(e['giver_name'], e['receiver_name']) for e in app_module.ledger.load(job_id)]
+
+    monkeypatch.setenv('EMAIL_PASSWORD', 'secret')
+    body = client.post('/api/admin/draw/resume', headers=ADMIN).get_json()
+    assert body['success'] and [r['success'] for r in body['results']] == [True] * 4
+    assert [(e['giver_name'], e['receiver_name']) for e in app_module.ledger.load(job_id)] == drawn
+    assert len(smtp.messages) == 4
+
+    # Nothing left: resuming again sends no duplicates
+    assert client.post('/api/admin/draw/resume', headers=ADMIN).get_json()['success']
+    assert len(smtp.messages) == 4
+    assert client.get('/api/admin/draw/status', headers=ADMIN).get_json()['job']['id'] == job_id
+
+def test_group_draw_route(client, smtp, tmp_path, monkeypatch):
+    path = tmp_path / 'groups.csv'
+    path.write_text(
+        'ID;nombre;parentesco;email;grupo\n'
+        '1;Ana;;ana@test.com;oficina\n2;Bea;;bea@test.com;oficina\n3;Carla;;carla@test.com;oficina\n'
+        '4;Dani;Eva;dani@test.com;familia\n5;Eva;Dani;eva@test.com;familia\n',
+        encoding='utf-8'
+    )
+    monkeypatch.setattr(app_module, 'CSV_FILE', str(path))
+    monkeypatch.setattr(app_module, 'participant_store', ParticipantStore(app_module.load_data))
+    assert client.post('/api/admin/draw/groups').status_code == 401
+
+    body = client.post('/api/admin/draw/groups', headers=ADMIN).get_json()
+    assert body['success']
+    # 'familia' can't be drawn (Dani and Eva exclude each other), 'oficina' still is
+    assert body['groups']['oficina'] == {'size': 3, 'success': True, 'conflict': []}
+    assert body['groups']['familia']['success'] is False
+    assert body['groups']['familia']['conflict'][0] in ('Dani', 'Eva')
+    assert 'familia' in body['message']
+    assert sorted(r['giver'] for r in body['results']) == ['Ana', 'Bea', 'Carla']
+    assert len(smtp.messages) == 3
+    job = client.get('/api/admin/draw/status', headers=ADMIN).get_json()['job']
+    assert (job['status'], job['sent']) == ('done', 3)
+
+def test_bulk_import_json(client):
+    response = client.post('/api/admin/register_emails', headers=ADMIN, json=[
+        {'phone': '600000001', 'email': 'ricardo@test.com'},
+        {'phone': '600000002', 'email': 'no-es-un-email'},
+        {'phone': '600000003', 'email': 'juan@test.com'},
+        {'phone': '699999999', 'email': 'nadie@test.com'},
+        {'phone': '600000001', 'email': 'otro@test.com'},
+    ])
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [(r['success'], r['message']) for r in body['results']] == [
+        (True, 'Registrado'),
+        (False, 'Email no válido'),
+        (True, 'Sin cambios'),
+        (False, 'Teléfono no encontrado'),
+        (False, 'Teléfono repetido en la importación'),
+    ]
+    assert (body['registered'], body['failed']) == (1, 3)
+
+    # One rewrite of the base file, nothing left in the journal
+    rows = {row['ID']: row['email'] for row in csv_journal.read_rows(app_module.CSV_FILE)}
+    assert rows['600000001'] == 'ricardo@test.com'
+    assert rows['600000002'] == ''
+    assert app_module.participant_store.get('600000001')['email'] == 'ricardo@test.com'
+
+def test_bulk_import_csv(client):
+    data = 'ID;email\n600000002;liliana@test.com\n600000004;maria@test.com\n'
+    response = client.post('/api/admin/register_emails', headers=ADMIN, data=data, content_type='text/csv')
+    body = response.get_json()
+    assert [r['message'] for r in body['results']] == ['Registrado', 'Registrado']
+    rows = {row['ID']: row['email'] for row in csv_journal.read_rows(app_module.CSV_FILE)}
+    assert (rows['600000002'], rows['600000004']) == ('liliana@test.com', 'maria@test.com')
+
+def test_bulk_import_csv_with_bom(client):
+    data = '\ufeffID;email\r\n600000002;liliana@test.com\r\n'.encode('utf-8')
+    body = client.post('/api/admin/register_emails', headers=ADMIN, data=data, content_type='text/csv').get_json()
+    assert [r['message'] for r in body['results']] == ['Registrado']
+
+def test_bulk_import_requires_admin(client):
+    assert client.post('/api/admin/register_emails', json=[]).status_code == 401
+    assert client.post('/api/admin/register_emails', headers=ADMIN, json={'foo': 1}).status_code == 400
+
+def test_bulk_import_supabase_chunks(client, monkeypatch):
+    from stubs.postgrest_server import StubPostgRESTServer
+    from supabase_client import SupabaseClient
+    server = StubPostgRESTServer({'participants': [
+        {'id': str(600000000 + i), 'name': f'P{i}', 'relationship': '', 'email': ''} for i in range(25)
+    ]}, not_null={'participants': ['id', 'name']}).start()
+    try:
+        monkeypatch.setattr(app_module, 'USE_SUPABASE', True)
+        monkeypatch.setattr(app_module, 'BULK_CHUNK_SIZE', 10)
+        monkeypatch.setattr(app_module, 'supabase', SupabaseClient(server.url, server.key))
+        rows = [{'phone': str(600000000 + i), 'email': f'p{i}@test.com'} for i in range(24)]
+        body = client.post('/api/admin/register_emails', headers=ADMIN, json={'rows': rows}).get_json()
+    finally:
+        server.stop()
+
+    assert body['registered'] == 24
+    assert [method for method, _ in server.requests].count('POST') == 3
+    assert [r['email'] for r in server.tables['participants']] == [f'p{i}@test.com' for i in range(24)] + ['']
+
+def test_bulk_save_supabase_unknown_phone(client, monkeypatch):
+    from stubs.postgrest_server import StubPostgRESTServer
+    from supabase_client import SupabaseClient
+    server = StubPostgRESTServer({'participants': [
+        {'id': '600000001', 'name': 'Ricardo', 'relationship': 'Liliana', 'email': ''},
+    ]}, not_null={'participants': ['id', 'name']}).start()
+    try:
+        monkeypatch.setattr(app_module, 'USE_SUPABASE', True)
+        monkeypatch.setattr(app_module, 'supabase', SupabaseClient(server.url, server.key))
+        # e.g. deleted after the import was validated
+        result = app_module.save_emails({'600000001': 'ricardo@test.com', '699999999': 'nadie@test.com'})
+    finally:
+        server.stop()
+
+    assert result == (True, "", ['699999999'])
+    assert server.tables['participants'] == [
+        {'id': '600000001', 'name': 'Ricardo', 'relationship': 'Liliana', 'email': 'ricardo@test.com'}
+    ]
+
+def test_sqlite_backend(client, tmp_path, monkeypatch):
+    import sqlite_store
+    db_path = str(tmp_path / 'participants.db')
+    sqlite_store.migrate(app_module.CSV_FILE, db_path)
+    monkeypatch.setattr(app_module, 'USE_SQLITE', True)
+    monkeypatch.setattr(app_module, 'sqlite_db', sqlite_store.SqliteStore(db_path))
+
+    assert client.post('/api/check_user', json={'phone': '600000002'}).get_json()['name'] == 'Liliana'
+    body = client.post('/api/register_email', json={'phone': '600000002', 'email': 'liliana@test.com'}).get_json()
+    assert body['success']
+    assert app_module.sqlite_db.get('600000002')['email'] == 'liliana@test.com'
+    assert app_module.registration_progress() == (2, 4)
+
+def test_metrics_endpoint(client):
+    assert client.get('/api/admin/metrics').status_code == 401
+    client.post('/api/check_user', json={'phone': '600000001'})
+    client.post('/api/register_email', json={'phone': '600000001', 'email': 'ricardo@test.com'})
+
+    response = client.get('/api/admin/metrics', headers=ADMIN)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE amigo_load_data_seconds histogram' in text
+    assert 'amigo_load_data_seconds_bucket{backend="csv",le="+Inf"}' in text
+    assert 'amigo_save_email_seconds_count{backend="csv",bulk="false"}' in text
+
+def test_progress_counted_incrementally(client, monkeypatch):
+    recounts = []
+    def counter():
+        recounts.append(1)
+        return app_module.registration_progress()
+    monkeypatch.setattr(app_module, 'registration_counter', RegistrationProgress(counter))
+
+    client.post('/api/register_email', json={'phone': '600000001', 'email': 'ricardo@test.com'})
+    client.post('/api/register_email', json={'phone': '600000001', 'email': 'otro@test.com'})
+    client.post('/api/admin/register_emails', headers=ADMIN, json=[{'phone': '600000002', 'email': 'liliana@test.com'}])
+    progress = app_module.registration_counter.snapshot()
+    assert (progress['registered'], progress['total'], progress['complete']) == (3, 4, False)
+    assert len(recounts) == 1
+
+def test_progress_stream(client, monkeypatch):
+    assert client.get('/api/admin/progress').status_code == 401
+    monkeypatch.setattr(app_module, 'PROGRESS_STREAM_SECONDS', 0)
+
+    response = client.get('/api/admin/progress?key=secret')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = [block for block in response.get_data(as_text=True).split('\n\n') if block.startswith('event:')]
+    assert events == ['event: progress\ndata: {"registered": 1, "total": 4, "complete": false, "version": 1}']
+
+def test_wsgi_app_does_not_import_asyncio():
+    # Only the ASGI entry point pays for asyncio's import time
+    import os
+    import subprocess
+    import sys
+    code = "import app, sys; print('asyncio' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == 'False'
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import pytest
+import app as app_module
+import asgi
+from participant_store import ParticipantStore
+from progress import RegistrationProgress
+from stubs.postgrest_server import StubPostgRESTServer
+from async_supabase import AsyncSupabaseClient
+from supabase_client import SupabaseClient
+
+@pytest.fixture
+def csv_app(tmp_path, monkeypatch):
+    path = tmp_path / 'participants.csv'
+    path.write_text(
+        'ID;nombre;parentesco;email\n'
+        '600000001;Ricardo;Liliana;\n'
+        '600000002;Liliana;Ricardo;\n'
+        '600000003;Juan;;\n',
+        encoding='utf-8'
+    )
+    monkeypatch.setenv('ADMIN_SECRET_KEY', 'secret')
+    monkeypatch.setattr(app_module, 'USE_SUPABASE', None)
+    monkeypatch.setattr(app_module, 'CSV_FILE', str(path))
+    monkeypatch.setattr(app_module, 'participant_store', ParticipantStore(app_module.load_data))
+    monkeypatch.setattr(app_module, 'registration_counter', RegistrationProgress(app_module.registration_progress))
+    monkeypatch.setattr(asgi, 'supabase', None)
+    return path
+
+def _call(method, path, payload=None, body=b''):
+    async def scenario():
+        messages = []
+        data = json.dumps(payload).encode('utf-8') if payload is not None else body
+
+        async def receive():
+            return {'type': 'http.request', 'body': data, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+                 'headers': [(b'content-type', b'application/json')]}
+        await asgi.app(scope, receive, send)
+        return messages
+    messages = asyncio.run(scenario())
+    return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+def test_same_contract_as_flask(csv_app):
+    requests = [
+        ('/api/check_user', {'phone': '600000001'}),
+        ('/api/check_user', {'phone': '699999999'}),
+        ('/api/register_email', {'phone': '600000001', 'email': 'ricardo@test.com'}),
+        ('/api/register_email', {'phone': '699999999', 'email': 'nadie@test.com'}),
+    ]
+    for path, payload in requests:
+        status, body = _call('POST', path, payload)
+        assert status == 200
+        assert json.loads(body) == app_module.app.test_client().post(path, json=payload).get_json()
+
+    assert app_module.find_participant('600000001')['email'] == 'ricardo@test.com'
+    assert app_module.registration_counter.snapshot()['registered'] == 1
+    status, body = _call('POST', '/api/check_user', body=b'not json')
+    assert json.loads(body)['message'].startswith('Error interno')
+
+def test_other_routes_served_by_flask(csv_app):
+    status, body = _call('GET', '/')
+    assert status == 200 and b'<html' in body.lower()
+    status, body = _call('POST', '/api/admin/draw', {})
+    assert status == 401 and json.loads(body)['message'] == 'No autorizado'
+    assert _call('GET', '/api/check_user')[0] == 405
+
+def test_supabase_registration(monkeypatch):
+    rows = [{'id': '600000001', 'name': 'Ricardo', 'relationship': '', 'email': ''},
+            {'id': '600000002', 'name': 'Liliana', 'relationship': '', 'email': ''}]
+    server = StubPostgRESTServer({'participants': rows}).start()
+    try:
+        monkeypatch.setattr(app_module, 'USE_SUPABASE', True)
+        monkeypatch.setattr(app_module, 'supabase', SupabaseClient(server.url, server.key))
+        monkeypatch.setattr(app_module, 'participant_store', ParticipantStore(app_module.load_data))
+        monkeypatch.setattr(app_module, 'registration_counter', RegistrationProgress(app_module.registration_progress))
+        monkeypatch.setattr(asgi, 'supabase', AsyncSupabaseClient(server.url, server.key))
+
+        status, body = _call('POST', '/api/register_email', {'phone': '600000001', 'email': 'ricardo@test.com'})
+        assert json.loads(body)['success']
+        assert server.tables['participants'][0]['email'] == 'ricardo@test.com'
+        assert app_module.participant_store.peek('600000001')['email'] == 'ricardo@test.com'
+    finally:
+        server.stop()
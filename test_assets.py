@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import os
+import pytest
+import assets
+
+def _static(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'style.css').write_text('body { color: red; }\n' * 50, encoding='utf-8')
+    (static / 'tiny.js').write_text('x', encoding='utf-8')
+    return str(static), str(static / 'dist')
+
+def test_build_fingerprints_and_compresses(tmp_path):
+    static, dist = _static(tmp_path)
+    manifest = assets.build(static, dist)
+
+    css = manifest['style.css']
+    assert css['file'].startswith('style.') and css['file'].endswith('.css')
+    assert 'gzip' in css['encodings']
+    with open(os.path.join(dist, css['encodings']['gzip']['file']), 'rb') as f:
+        assert gzip.decompress(f.read()) == ('body { color: red; }\n' * 50).encode()
+    # Compression that doesn't pay off is skipped
+    assert manifest['tiny.js']['encodings'] == {}
+    assert assets.load_manifest(dist) == manifest
+
+def test_resolve_negotiates_variants(tmp_path):
+    static, dist = _static(tmp_path)
+    assets.build(static, dist)
+    served = assets.Assets(dist)
+    url = served.url('style.css')
+    filename = url.rsplit('/', 1)[1]
+
+    variant, mimetype, headers = served.resolve(filename, 'gzip, deflate')
+    assert variant == filename + '.gz'
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Cache-Control'] == assets.CACHE_CONTROL
+    assert served.resolve(filename, 'gzip;q=0, identity')[0] == filename
+    assert served.resolve(filename, '*')[0] == filename
+    assert served.resolve('style.css') is None
+    assert served.url('missing.css') is None
+
+def test_committed_build_is_current():
+    manifest = assets.load_manifest()
+    for name, entry in manifest.items():
+        with open(os.path.join(assets.STATIC_DIR, name), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        assert digest in entry['file'], f"static/{name} changed: run python assets.py"
+
+def test_committed_build_has_every_variant(tmp_path):
+    if assets.missing_encoders():
+        pytest.skip(f"encoders not installed: {assets.missing_encoders()} (requirements-build.txt)")
+    # A build without brotli or Pillow still hashes the sources the same way
+    fresh = assets.build(assets.STATIC_DIR, str(tmp_path / 'dist'), strict=True)
+    committed = assets.load_manifest()
+    variants = lambda manifest: {name: (sorted(e['encodings']), sorted(e['formats'])) for name, e in manifest.items()}
+    assert variants(committed) == variants(fresh), "static/dist was built without some encoders: pip install -r requirements-build.txt and run python assets.py"
+
+def test_strict_build_fails_without_encoders(tmp_path, monkeypatch):
+    static, dist = _static(tmp_path)
+    monkeypatch.setattr(assets, 'brotli', None)
+    with pytest.raises(RuntimeError, match='br'):
+        assets.build(static, dist, strict=True)
+    assert 'br' not in assets.build(static, dist)['style.css']['encodings']
+
+def test_app_serves_fingerprinted_assets():
+    from app import app
+    client = app.test_client()
+    page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert page.headers['Content-Encoding'] == 'gzip'
+    html = gzip.decompress(page.data).decode('utf-8')
+    url = assets.Assets().url('style.css')
+    assert url in html
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == assets.CACHE_CONTROL
+    assert 'Content-Disposition' not in response.headers
+    assert client.get('/assets/nope.css').status_code == 404
@@ -0,0 +1,44 @@
+import multiprocessing
+import csv_journal
+
+def _write_header(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('ID;nombre;parentesco;email\n')
+        for i in range(count):
+            f.write(f'{600000000 + i};P{i};;\n')
+
+def _register(args):
+    path, phone = args
+    return csv_journal.append_email(path, phone, f'{phone}@test.com')
+
+def test_parallel_registrations_are_not_lost(tmp_path):
+    path = str(tmp_path / 'participants.csv')
+    _write_header(path, 200)
+
+    phones = [str(600000000 + i) for i in range(200)]
+    with multiprocessing.Pool(4) as pool:
+        results = pool.map(_register, [(path, phone) for phone in phones])
+    assert all(ok for ok, _ in results)
+
+    rows = csv_journal.read_rows(path)
+    assert all(row['email'] == f"{row['ID']}@test.com" for row in rows)
+
+    # Compaction folds everything back into the base file
+    assert csv_journal.compact(path) == 200
+    assert csv_journal.read_rows(path) == rows
+
+def test_unknown_phone(tmp_path):
+    path = str(tmp_path / 'participants.csv')
+    _write_header(path, 3)
+    assert csv_journal.append_email(path, '123', 'x@test.com') == (False, "Usuario no encontrado en CSV")
+
+def test_apply_emails_in_one_rewrite(tmp_path):
+    path = str(tmp_path / 'participants.csv')
+    _write_header(path, 5)
+    csv_journal.append_email(path, '600000000', 'first@test.com')
+
+    missing = csv_journal.apply_emails(path, {'600000001': 'a@test.com', '600000002': 'b@test.com', '123': 'x@test.com'})
+    assert missing == ['123']
+    assert not (tmp_path / 'participants.csv.journal').exists()
+    emails = [row['email'] for row in csv_journal.read_rows(path)]
+    assert emails == ['first@test.com', 'a@test.com', 'b@test.com', '', '']
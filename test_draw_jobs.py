@@ -0,0 +1,130 @@
+import time
+import draw_jobs
+import delivery_ledger
+import matcher
+from stubs.smtp_server import StubSMTPServer
+
+PARTICIPANTS = [
+    {'phone': '1', 'name': 'Ricardo', 'relationship': 'Liliana', 'email': 'r@test.com'},
+    {'phone': '2', 'name': 'Liliana', 'relationship': 'Ricardo', 'email': 'l@test.com'},
+    {'phone': '3', 'name': 'Juan', 'relationship': '', 'email': 'j@test.com'},
+    {'phone': '4', 'name': 'Maria', 'relationship': '', 'email': 'm@test.com'},
+]
+
+def test_only_one_active_draw(tmp_path):
+    store = draw_jobs.FileJobStore(str(tmp_path / 'draw.json'))
+    job = store.try_start('admin')
+    assert job is not None
+    assert store.try_start('admin') is None
+    assert store.get()['status'] == 'queued'
+
+    store.update(job, status='done')
+    # The auto-draw never repeats a completed draw; the admin can redraw
+    assert store.try_start('auto', skip_if_done=True) is None
+    assert store.try_start('admin') is not None
+
+def test_run_draw_job_records_progress(tmp_path, monkeypatch):
+    server = StubSMTPServer().start()
+    for key, value in server.env().items():
+        monkeypatch.setenv(key, value)
+    store = draw_jobs.FileJobStore(str(tmp_path / 'draw.json'))
+    ledger = delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv'))
+    try:
+        job = draw_jobs.run_draw_job(store, store.try_start('admin'), lambda: PARTICIPANTS, ledger)
+    finally:
+        server.stop()
+
+    assert job['status'] == 'done'
+    assert [r['success'] for r in job['results']] == [True] * 4
+    saved = store.get()
+    assert saved['status'] == 'done'
+    assert (saved['total'], saved['sent'], saved['failed']) == (4, 4, 0)
+    assert 'results' not in saved
+    assert [e['status'] for e in ledger.load(job['id'])] == ['sent'] * 4
+
+def test_run_draw_job_reports_conflict(tmp_path):
+    store = draw_jobs.FileJobStore(str(tmp_path / 'draw.json'))
+    impossible = [
+        {'name': 'A', 'relationship': 'B', 'email': 'a@test.com'},
+        {'name': 'B', 'relationship': 'A', 'email': 'b@test.com'},
+    ]
+    ledger = delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv'))
+    job = draw_jobs.run_draw_job(store, store.try_start('admin'), lambda: impossible, ledger)
+    assert job['status'] == 'failed'
+    assert job['reason'] == 'conflict'
+    assert store.get()['message'].startswith('Sorteo imposible')
+
+def test_run_draw_job_matches_once(tmp_path, monkeypatch):
+    calls = []
+    find_matching = matcher._find_matching
+    monkeypatch.setattr(matcher, '_find_matching', lambda *args, **kwargs: calls.append(1) or find_matching(*args, **kwargs))
+    monkeypatch.setattr(delivery_ledger, 'deliver', lambda ledger, entries, on_result=None: entries)
+    store = draw_jobs.FileJobStore(str(tmp_path / 'draw.json'))
+    ledger = delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv'))
+
+    job = draw_jobs.run_draw_job(store, store.try_start('admin'), lambda: PARTICIPANTS, ledger, mode='default')
+    assert job['status'] == 'done'
+    assert len(calls) == 1
+
+    impossible = [{'name': 'A', 'relationship': 'B', 'email': 'a@test.com'}, {'name': 'B', 'relationship': 'A', 'email': 'b@test.com'}]
+    job = draw_jobs.run_draw_job(store, store.try_start('admin'), lambda: impossible, ledger, mode='default')
+    assert job['reason'] == 'conflict'
+    assert len(calls) == 2
+
+def test_resume_sends_only_undelivered(tmp_path, monkeypatch):
+    store = draw_jobs.FileJobStore(str(tmp_path / 'draw.json'))
+    ledger = delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv'))
+    monkeypatch.setattr(delivery_ledger, 'RETRY_BASE_DELAY', 0)
+
+    # SMTP is down: every attempt fails, but the assignments are kept
+    monkeypatch.setenv("EMAIL_USER", "")
+    job = draw_jobs.run_draw_job(store, store.try_start('admin'), lambda: PARTICIPANTS, ledger)
+    assert job['status'] == 'done'
+    assert store.get()['failed'] == 4
+    before = [(e['giver_name'], e['receiver_name']) for e in ledger.load(job['id'])]
+    assert all(e['attempts'] == delivery_ledger.MAX_ATTEMPTS for e in ledger.load(job['id']))
+
+    server = StubSMTPServer().start()
+    for key, value in server.env().items():
+        monkeypatch.setenv(key, value)
+    try:
+        resumed = draw_jobs.resume_draw_job(store, store.try_resume(job['id']), ledger)
+        again = draw_jobs.resume_draw_job(store, store.try_resume(job['id']), ledger)
+    finally:
+        server.stop()
+
+    assert [r['success'] for r in resumed['results']] == [True] * 4
+    assert [(e['giver_name'], e['receiver_name']) for e in ledger.load(job['id'])] == before
+    # The second resume had nothing left to send
+    assert [r['success'] for r in again['results']] == [True] * 4
+    assert len(server.messages) == 4
+
+def _record_in(ledger, draw_id, when, assignments, sent=True):
+    """
+    Records a draw as if it had been made at `when` (epoch seconds).
+    """
+    entries = ledger.record(draw_id, assignments)
+    for entry in entries:
+        entry.update(drawn_at=when, status='sent' if sent else 'failed')
+    ledger.update(entries)
+    return entries
+
+def _year(year, month=12):
+    return time.mktime((year, month, 15, 12, 0, 0, 0, 0, -1))
+
+def test_ledger_recent_pairs(tmp_path):
+    ledger = delivery_ledger.FileLedger(str(tmp_path / 'deliveries.csv'))
+    a, b, c = ({'name': n, 'email': f'{n}@test.com'} for n in 'ABC')
+    now = _year(2026, month=6)
+    _record_in(ledger, '2024', _year(2024), [(a, b), (b, c), (c, a)])
+    _record_in(ledger, '2025-first', _year(2025, month=11), [(a, b), (b, c), (c, a)])
+    # A re-draw the same year replaces the first one; one nobody got doesn't count
+    _record_in(ledger, '2025', _year(2025), [(a, c), (c, b), (b, a)])
+    _record_in(ledger, '2025-failed', _year(2025) + 60, [(a, b), (b, c), (c, a)], sent=False)
+    # This year's own draw is the one being replaced, not history
+    _record_in(ledger, '2026', _year(2026, month=1), [(a, b), (b, c), (c, a)])
+
+    assert ledger.recent_pairs(0, now) == []
+    assert ledger.recent_pairs(1, now) == [('A', 'C'), ('C', 'B'), ('B', 'A')]
+    assert ledger.recent_pairs(2, now) == [('A', 'C'), ('C', 'B'), ('B', 'A'), ('A', 'B'), ('B', 'C'), ('C', 'A')]
+    assert len(ledger.recent_pairs(5, now)) == 6
@@ -0,0 +1,86 @@
+import time
+import email_service
+from stubs.smtp_server import StubSMTPServer
+
+def _assignments(count):
+    people = [{'name': f'P{i}', 'email': f'p{i}@test.com'} for i in range(count)]
+    return [(people[i], people[(i + 1) % count]) for i in range(count)]
+
+def test_batch_reuses_one_session(monkeypatch):
+    server = StubSMTPServer().start()
+    try:
+        for key, value in server.env().items():
+            monkeypatch.setenv(key, value)
+        results = email_service.send_assignment_emails(_assignments(20), rate=0, workers=1)
+    finally:
+        server.stop()
+
+    assert [r['success'] for r in results] == [True] * 20
+    assert [r['giver'] for r in results] == [f'P{i}' for i in range(20)]
+    assert server.connections == 1
+    assert len(server.messages) == 20
+
+def test_batch_reconnects_when_dropped(monkeypatch):
+    server = StubSMTPServer(drop_after=5).start()
+    try:
+        for key, value in server.env().items():
+            monkeypatch.setenv(key, value)
+        results = email_service.send_assignment_emails(_assignments(12), rate=0, workers=1)
+    finally:
+        server.stop()
+
+    assert all(r['success'] for r in results)
+    assert len(server.messages) == 12
+    assert server.connections == 3
+
+def test_parallel_sessions_keep_result_order(monkeypatch):
+    server = StubSMTPServer(message_delay=0.05).start()
+    try:
+        for key, value in server.env().items():
+            monkeypatch.setenv(key, value)
+        start = time.perf_counter()
+        results = email_service.send_assignment_emails(_assignments(24), rate=0, workers=4)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert results == [{'giver': f'P{i}', 'success': True} for i in range(24)]
+    assert server.connections == 4
+    # 24 sends of 50 ms each take 1.2 s one after another
+    assert elapsed < 0.8
+
+def test_rejected_login_fails_the_batch(monkeypatch):
+    server = StubSMTPServer(reject_login=True).start()
+    try:
+        for key, value in server.env().items():
+            monkeypatch.setenv(key, value)
+        results = email_service.send_assignment_emails(_assignments(10), rate=0, workers=2)
+    finally:
+        server.stop()
+
+    assert not any(r['success'] for r in results)
+    assert all(r['error'] == 'login' for r in results)
+    # One session per worker, no reconnect or new login per message
+    assert server.connections <= 2
+    assert server.messages == []
+
+def test_plain_smtp_requires_starttls_before_login(monkeypatch):
+    server = StubSMTPServer().start()
+    try:
+        for key, value in server.env().items():
+            monkeypatch.setenv(key, value)
+        monkeypatch.setenv("SMTP_STARTTLS", "true")
+        results = email_service.send_assignment_emails(_assignments(3), rate=0, workers=1)
+    finally:
+        server.stop()
+
+    assert not any(r['success'] for r in results)
+    # The stub offers no STARTTLS, so the password is never sent
+    assert server.logins == 0
+
+def test_missing_credentials_fail_without_raising(monkeypatch):
+    monkeypatch.delenv("EMAIL_USER", raising=False)
+    monkeypatch.delenv("EMAIL_PASSWORD", raising=False)
+    assert email_service.send_assignment_email('p0@test.com', 'P0', 'P1') is False
+    results = email_service.send_assignment_emails(_assignments(3), rate=0, workers=2)
+    assert results == [{'giver': f'P{i}', 'success': False} for i in range(3)]
@@ -0,0 +1,41 @@
+import email
+import email.policy
+import email_templates
+import email_service
+
+def _parse(raw):
+    message = email.message_from_string(raw, policy=email.policy.default)
+    text = message.get_body(preferencelist=('plain',)).get_content()
+    html = message.get_body(preferencelist=('html',)).get_content()
+    return message, text, html
+
+def test_assignment_message_parts(monkeypatch):
+    monkeypatch.setenv('EVENT_YEAR', '2027')
+    monkeypatch.setenv('GIFT_BUDGET', '50 €')
+    monkeypatch.setenv('GIFT_RULES', 'Sin calcetines|Con <ticket> regalo')
+    raw = email_service.build_assignment_message('santa@test.com', 'ana@test.com', 'Ana & Luis', '<b>Peñalver</b>')
+    message, text, html = _parse(raw)
+
+    assert message['Subject'] == '🎅 Tu Amigo Invisible 2027 es...'
+    assert (message['From'], message['To']) == ('santa@test.com', 'ana@test.com')
+    assert message.get_content_type() == 'multipart/alternative'
+
+    assert '¡Hola Ana & Luis!' in text
+    assert '<b>Peñalver</b>' in text
+    assert '- Con <ticket> regalo' in text
+    assert '¡Hola Ana &amp; Luis!' in html
+    assert '&lt;b&gt;Peñalver&lt;/b&gt;' in html
+    assert '<li>Con &lt;ticket&gt; regalo</li>' in html
+    assert '<strong>50 €</strong>' in html
+
+def test_template_parsed_once_and_bound_per_event():
+    assert email_templates.load('assignment') is email_templates.load('assignment')
+    template = email_templates.load('assignment').bind(year='2030', budget='10 €', rules=['Una'])
+    assert template.html.names == {'giver_name', 'receiver_name'}
+    assert template.subject.names == set()
+
+def test_headers_cannot_be_injected():
+    template = email_templates.EmailTemplate('Hola {{ name }}', '{{ name }}', '{{ name }}')
+    raw = template.render('santa@test.com', 'a@test.com\nBcc: evil@test.com', name='X\r\nBcc: evil@test.com')
+    message, _, _ = _parse(raw)
+    assert message['Bcc'] is None
@@ -1,4 +1,8 @@
-from matcher import generate_assignments
+import itertools
+import random
+import time
+import matcher
+from matcher import build_exclusions, draw, draw_groups, find_conflict, generate_assignments, is_valid_assignment, is_valid_permutation
 
 def test_matching():
     # Dummy data
@@ -40,5 +44,302 @@ def test_matching():
     else:
         print("ERROR: Generated assignment for impossible case!")
 
+def test_large_group_with_exclusions():
+    # Every participant excludes the next one, plus a few tightly constrained people
+    n = 2000
+    participants = [
+        {'name': f'P{i}', 'relationship': f'P{(i + 1) % n}'} for i in range(n)
+    ]
+    assignments = generate_assignments(participants)
+
+    assert assignments is not None
+    assert len(assignments) == n
+    assert len({id(receiver) for _, receiver in assignments}) == n
+    for giver, receiver in assignments:
+        assert is_valid_assignment(giver, receiver)
+
+def test_tight_three_person_case():
+    # Only one valid permutation exists; the engine must always find it
+    participants = [
+        {'name': 'A', 'relationship': 'B'},
+        {'name': 'B', 'relationship': 'C'},
+        {'name': 'C', 'relationship': 'A'},
+    ]
+    for _ in range(50):
+        assignments = generate_assignments(participants, max_attempts=1)
+        assert assignments is not None
+        assert [r['name'] for _, r in assignments] == ['C', 'A', 'B']
+
+def test_conflict_report():
+    possible_participants = [
+        {'name': 'A', 'relationship': 'B'},
+        {'name': 'B', 'relationship': 'A'},
+        {'name': 'C', 'relationship': ''},
+        {'name': 'D', 'relationship': ''},
+    ]
+    assert find_conflict(possible_participants) is None
+
+    # E and F can only give to each other, and each one excludes the other
+    impossible_participants = [
+        {'name': 'E', 'relationship': 'F'},
+        {'name': 'F', 'relationship': 'E'},
+    ]
+    conflict = find_conflict(impossible_participants)
+    assert conflict is not None
+    assert len(conflict) == 1
+    assert conflict[0]['name'] in ('E', 'F')
+
+def test_draw_returns_assignments_or_conflict():
+    participants = [{'name': n, 'relationship': ''} for n in 'ABCD']
+    assignments, conflict = draw(participants)
+    assert conflict is None
+    assert all(is_valid_assignment(g, r) for g, r in assignments)
+
+    impossible = [{'name': 'E', 'relationship': 'F'}, {'name': 'F', 'relationship': 'E'}]
+    assignments, conflict = draw(impossible, mode='uniform')
+    assert assignments is None
+    assert [p['name'] for p in conflict] in (['E'], ['F'])
+    assert draw([]) == ([], None)
+
+def test_multiple_exclusions_and_history():
+    participants = [
+        {'name': 'Ana', 'relationship': 'Luis, Eva'},
+        {'name': 'Luis', 'relationship': 'Ana'},
+        {'name': 'Eva', 'relationship': ''},
+        {'name': 'Juan', 'relationship': ''},
+    ]
+    # Last year Eva gave to Juan
+    history = [('Eva', 'Juan')]
+    exclusions = build_exclusions(participants, history)
+    assert [set(e) for e in exclusions] == [{0, 1, 2}, {0, 1}, {2, 3}, {3}]
+
+    for _ in range(20):
+        assignments = generate_assignments(participants, history=history)
+        for giver, receiver in assignments:
+            assert is_valid_assignment(giver, receiver)
+            assert (giver['name'], receiver['name']) not in history
+        assert (assignments[0][1]['name'], assignments[1][1]['name']) == ('Juan', 'Eva')
+
+    # If Luis also gave to Eva, Ana and Luis can only give to Juan
+    conflict = find_conflict(participants, history + [('Luis', 'Eva')])
+    assert sorted(p['name'] for p in conflict) == ['Ana', 'Luis']
+
+def test_near_total_exclusion_list_is_fast():
+    n = 30000
+    participants = [{'name': f'P{i}', 'relationship': ''} for i in range(n)]
+    # P0 excludes everyone else, in reverse order so the row has to be sorted
+    participants[0]['relationship'] = ', '.join(f'P{i}' for i in range(n - 1, 0, -1))
+    exclusions = build_exclusions(participants)
+    assert not exclusions.allows(0, 1) and not exclusions.allows(0, n - 1)
+    assert exclusions.allows(1, 0) and exclusions.allows(1, n - 1)
+
+    start = time.perf_counter()
+    assignments, conflict = draw(participants)
+    elapsed = time.perf_counter() - start
+    assert assignments is None
+    assert [p['name'] for p in conflict] == ['P0']
+    # Scanning the whole row per check made this quadratic (seconds, minutes at 100k)
+    assert elapsed < 3
+
+    participants[0]['relationship'] = ', '.join(f'P{i}' for i in range(n - 1, 1, -1))
+    assignments, conflict = draw(participants)
+    assert conflict is None
+    assert dict((g['name'], r['name']) for g, r in assignments)['P0'] == 'P1'
+
+def test_compiled_constraints_at_scale():
+    n = 50000
+    participants = [
+        {'name': f'P{i}', 'relationship': f'P{(i + 1) % n}, P{(i + 2) % n}'} for i in range(n)
+    ]
+    history = [(f'P{i}', f'P{(i + 3) % n}') for i in range(n)]
+    exclusions = build_exclusions(participants, history)
+    assert all(len(e) == 4 for e in exclusions)
+
+    assignments = generate_assignments(participants, history=history)
+    index = {id(p): i for i, p in enumerate(participants)}
+    assert is_valid_permutation(exclusions, [index[id(r)] for _, r in assignments])
+
+def test_group_draws(monkeypatch):
+    participants = []
+    for g in range(300):
+        for i in range(4):
+            participants.append({'name': f'G{g}-P{i}', 'relationship': f'G{g}-P{(i + 1) % 4}', 'group': f'G{g}'})
+    # A group of one can never be drawn
+    participants.append({'name': 'Solo', 'relationship': '', 'group': 'lonely'})
+
+    for workers in (1, 2):
+        # Force the process pool for the second run despite the small size
+        monkeypatch.setattr(matcher, 'PARALLEL_THRESHOLD', 0 if workers > 1 else 20000)
+        assignments, report = draw_groups(participants, workers=workers)
+        assert len(report) == 301
+        assert report['lonely'] == {'size': 1, 'success': False, 'conflict': ['Solo']}
+        assert len(assignments) == 1200
+        for giver, receiver in assignments:
+            assert giver['group'] == receiver['group']
+            assert is_valid_assignment(giver, receiver)
+
+def test_many_small_groups_use_the_pool(monkeypatch):
+    import concurrent.futures
+    chunksizes = []
+
+    class InlinePool:
+        def __init__(self, max_workers):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            pass
+        def map(self, fn, payloads, chunksize=1):
+            chunksizes.append(chunksize)
+            return map(fn, payloads)
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(matcher, 'PARALLEL_THRESHOLD', 1000)
+    # Every group is tiny, but 2000 participants in total are over the threshold
+    participants = [{'name': f'P{i}', 'relationship': '', 'group': f'g{i // 4}'} for i in range(2000)]
+    assignments, report = draw_groups(participants, workers=2)
+    assert len(assignments) == 2000 and len(report) == 500
+    # 500 groups over 2 workers go out in batches, not one task per group
+    assert chunksizes == [62]
+
+def _exact_pair_frequencies(participants):
+    """
+    Pair probabilities under a uniform draw, by enumerating every valid permutation.
+    """
+    n = len(participants)
+    counts = {}
+    valid = 0
+    for perm in itertools.permutations(range(n)):
+        if all(is_valid_assignment(participants[i], participants[r]) for i, r in enumerate(perm)):
+            valid += 1
+            for i, r in enumerate(perm):
+                counts[(i, r)] = counts.get((i, r), 0) + 1
+    return {pair: c / valid for pair, c in counts.items()}
+
+def test_uniform_mode_pair_frequencies():
+    participants = [
+        {'name': 'Ricardo', 'relationship': 'Liliana'},
+        {'name': 'Liliana', 'relationship': 'Ricardo'},
+        {'name': 'Juan', 'relationship': ''},
+        {'name': 'Maria', 'relationship': ''},
+        {'name': 'Pedro', 'relationship': 'Juan'},
+        {'name': 'Eva', 'relationship': 'Maria, Pedro'},
+    ]
+    expected = _exact_pair_frequencies(participants)
+    index = {id(p): i for i, p in enumerate(participants)}
+
+    random.seed(2026)
+    draws = 6000
+    observed = {}
+    for _ in range(draws):
+        for giver, receiver in generate_assignments(participants, mode='uniform'):
+            pair = (index[id(giver)], index[id(receiver)])
+            observed[pair] = observed.get(pair, 0) + 1
+
+    assert set(observed) <= set(expected)
+    # Chi-square on the pair counts of each giver
+    for giver in range(len(participants)):
+        statistic = 0.0
+        for (g, r), probability in expected.items():
+            if g == giver:
+                expected_count = probability * draws
+                statistic += (observed.get((g, r), 0) - expected_count) ** 2 / expected_count
+        # Well above the 99.9% critical value for at most 4 degrees of freedom (18.5)
+        assert statistic < 25, (participants[giver]['name'], statistic)
+
+def _assignment_chi_square(participants, draws, **options):
+    """
+    Chi-square of whole-assignment counts against a uniform draw over every
+    valid permutation. Returns (statistic, degrees of freedom).
+    """
+    valid = [
+        perm for perm in itertools.permutations(range(len(participants)))
+        if all(is_valid_assignment(participants[i], participants[r]) for i, r in enumerate(perm))
+    ]
+    index = {id(p): i for i, p in enumerate(participants)}
+    observed = {}
+    for _ in range(draws):
+        perm = tuple(index[id(r)] for _, r in generate_assignments(participants, mode='uniform', **options))
+        observed[perm] = observed.get(perm, 0) + 1
+    assert set(observed) <= set(valid)
+    expected = draws / len(valid)
+    return sum((observed.get(perm, 0) - expected) ** 2 / expected for perm in valid), len(valid) - 1
+
+def test_uniform_mode_where_swaps_are_disconnected():
+    # Pairwise swaps can't move between these four assignments; the default
+    # draw favours one of them ~37% of the time
+    relationships = {'A': 'B,F', 'B': 'D', 'C': 'F,B,E', 'D': 'C,F,E', 'E': 'F,D,A', 'F': 'A,D'}
+    participants = [{'name': name, 'relationship': excluded} for name, excluded in relationships.items()]
+    random.seed(2026)
+    statistic, dof = _assignment_chi_square(participants, 2000)
+    # 99.9% critical value for 3 degrees of freedom
+    assert statistic < 16.3, statistic
+
+def test_uniform_mixing_chain_reaches_every_assignment(monkeypatch):
+    # Without rejection sampling: n = 3 has no valid swap at all, and n = 4
+    # mixes 4-cycles with pairs of 2-cycles
+    monkeypatch.setattr(matcher, 'REJECTION_BUDGET', 0)
+    random.seed(2026)
+    for n in (3, 4):
+        participants = [{'name': f'P{i}', 'relationship': ''} for i in range(n)]
+        statistic, dof = _assignment_chi_square(participants, 2000, mixing_steps=100)
+        # 99.9% critical values for 1 and 8 degrees of freedom
+        assert statistic < {1: 10.8, 8: 26.1}[dof], (n, statistic)
+
+def test_uniform_mode_where_rejection_fails():
+    n = 3000
+    participants = [
+        {'name': f'P{i}', 'relationship': f'P{(i + 1) % n}, P{(i + 2) % n}, P{(i + 3) % n}'} for i in range(n)
+    ]
+    assignments = generate_assignments(participants, mode='uniform')
+    assert len(assignments) == n
+    assert all(is_valid_assignment(g, r) for g, r in assignments)
+
+def _is_single_cycle(assignments):
+    receiver_of = {id(giver): receiver for giver, receiver in assignments}
+    start = assignments[0][0]
+    current, steps = receiver_of[id(start)], 1
+    while current is not start:
+        current, steps = receiver_of[id(current)], steps + 1
+    return steps == len(assignments)
+
+def test_single_cycle_without_exclusions():
+    participants = [{'name': f'P{i}', 'relationship': ''} for i in range(500)]
+    assignments = generate_assignments(participants, mode='single_cycle')
+    assert len(assignments) == 500
+    assert all(is_valid_assignment(g, r) for g, r in assignments)
+    assert _is_single_cycle(assignments)
+
+def test_single_cycle_with_exclusions():
+    couples = [
+        {'name': 'Ricardo', 'relationship': 'Liliana'},
+        {'name': 'Liliana', 'relationship': 'Ricardo'},
+        {'name': 'Juan', 'relationship': 'Maria'},
+        {'name': 'Maria', 'relationship': 'Juan'},
+    ]
+    n = 20000
+    large = [
+        {'name': f'P{i}', 'relationship': f'P{(i + 1) % n}, P{(i + 7) % n}'} for i in range(n)
+    ]
+    for participants in (couples, large):
+        assignments = generate_assignments(participants, mode='single_cycle')
+        assert len(assignments) == len(participants)
+        assert all(is_valid_assignment(g, r) for g, r in assignments)
+        assert _is_single_cycle(assignments)
+
+def test_single_cycle_impossible():
+    # A plain assignment exists (A<->B, C<->D) but no single chain: C and D
+    # can only give to each other
+    participants = [
+        {'name': 'A', 'relationship': ''},
+        {'name': 'B', 'relationship': ''},
+        {'name': 'C', 'relationship': 'A, B'},
+        {'name': 'D', 'relationship': 'A, B'},
+    ]
+    assert generate_assignments(participants, mode='single_cycle') is None
+    # With groups, a failed chain is reported without a conflict list
+    _, report = draw_groups(participants, mode='single_cycle')
+    assert report[''] == {'size': 4, 'success': False, 'conflict': []}
+
 if __name__ == "__main__":
     test_matching()
@@ -0,0 +1,25 @@
+import metrics
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('test_latency_seconds', 'Test latency.', ['stage'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, stage='load')
+    with histogram.time(stage='save'):
+        pass
+
+    lines = histogram.render()
+    assert lines[:2] == ['# HELP test_latency_seconds Test latency.', '# TYPE test_latency_seconds histogram']
+    assert 'test_latency_seconds_bucket{stage="load",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="load",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="load",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_sum{stage="load"} 6.05' in lines
+    assert 'test_latency_seconds_count{stage="load"} 4' in lines
+    assert histogram.count(stage='save') == 1
+
+def test_counter_and_label_escaping():
+    counter = metrics.Counter('test_events_total', 'Test events.', ['name'])
+    counter.inc(name='a"b')
+    counter.inc(2, name='a"b')
+    assert counter.value(name='a"b') == 3
+    assert 'test_events_total{name="a\\"b"} 3' in counter.render()
+    assert 'test_events_total' in metrics.render()
@@ -0,0 +1,67 @@
+import threading
+import time
+from participant_store import ParticipantStore
+
+def test_single_fetch_and_write_through():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return [{'phone': '600123456', 'name': 'Ricardo', 'relationship': '', 'email': ''}]
+
+    store = ParticipantStore(loader, ttl=60)
+    threads = [threading.Thread(target=store.get, args=('600123456',)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Concurrent misses share one backend fetch
+    assert len(calls) == 1
+    assert store.get('600123456')['name'] == 'Ricardo'
+    assert store.get('000000000') is None
+
+    store.update_email('600123456', 'r@test.com')
+    assert store.get('600123456')['email'] == 'r@test.com'
+    assert len(calls) == 1
+
+    store.invalidate()
+    store.all()
+    assert len(calls) == 2
+
+def test_empty_result_is_not_cached():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return []
+
+    store = ParticipantStore(loader, ttl=60)
+    store.all()
+    store.all()
+    assert len(calls) == 2
+
+def test_writes_do_not_wait_for_a_slow_fetch():
+    release = threading.Event()
+
+    def loader():
+        release.wait(5)
+        # Fetched before the email below was saved
+        return [{'phone': '600123456', 'name': 'Ricardo', 'relationship': '', 'email': ''}]
+
+    store = ParticipantStore(loader, ttl=60)
+    reload = threading.Thread(target=store.refresh)
+    reload.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    store.update_email('600123456', 'r@test.com')
+    store.replace([{'phone': '600123456', 'name': 'Ricardo', 'relationship': '', 'email': 'r@test.com'}])
+    store.invalidate()
+    # What the async app does on the event loop must not block on the fetch
+    assert time.perf_counter() - start < 0.5
+
+    release.set()
+    reload.join()
+    assert store.peek('600123456')['email'] == 'r@test.com'
@@ -0,0 +1,35 @@
+import threading
+from progress import RegistrationProgress
+
+def test_record_and_reconcile():
+    backend = {'counts': (1, 3)}
+    progress = RegistrationProgress(lambda: backend['counts'], reconcile_every=60)
+    assert progress.snapshot()['registered'] == 1
+
+    progress.record()
+    progress.record(0)
+    assert progress.snapshot()['registered'] == 2
+
+    # A registration handled by another process shows up on the next recount
+    backend['counts'] = (3, 3)
+    progress.reconcile()
+    snapshot = progress.snapshot()
+    assert (snapshot['registered'], snapshot['complete']) == (3, True)
+
+def test_reconcile_racing_a_registration_keeps_counters():
+    progress = RegistrationProgress(lambda: (1, 3))
+    progress.reconcile()
+    progress._counter = lambda: (progress.record(), (1, 3))[1]
+    assert progress.reconcile() is False
+    assert progress.snapshot()['registered'] == 2
+
+def test_wait_wakes_on_change():
+    progress = RegistrationProgress(lambda: (0, 2))
+    version = progress.snapshot()['version']
+    assert progress.wait(version, 0.01) is False
+
+    timer = threading.Timer(0.05, progress.record)
+    timer.start()
+    assert progress.wait(version, 5) is True
+    timer.join()
+    assert progress.snapshot()['registered'] == 1
@@ -0,0 +1,64 @@
+import time
+import threading
+import delivery_ledger
+import sqlite_store
+
+def _write_csv(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('ID;nombre;parentesco;email\n')
+        for i in range(count):
+            f.write(f'{600000000 + i};P{i};P{(i + 1) % count};\n')
+
+def test_migrate_and_lookup(tmp_path):
+    csv_path = str(tmp_path / 'participants.csv')
+    db_path = str(tmp_path / 'participants.db')
+    _write_csv(csv_path, 100)
+    assert sqlite_store.migrate(csv_path, db_path) == 100
+
+    store = sqlite_store.SqliteStore(db_path)
+    user = store.get('600000042')
+    assert (user['name'], user['relationship'], user['email']) == ('P42', 'P43', '')
+    assert store.get('123') is None
+    assert len(store.load_all()) == 100
+    assert store.connection().execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+def test_concurrent_updates(tmp_path):
+    csv_path = str(tmp_path / 'participants.csv')
+    db_path = str(tmp_path / 'participants.db')
+    _write_csv(csv_path, 200)
+    sqlite_store.migrate(csv_path, db_path)
+    store = sqlite_store.SqliteStore(db_path)
+
+    def register(start):
+        for i in range(start, 200, 4):
+            assert store.update_email(str(600000000 + i), f'p{i}@test.com') == (True, "")
+    threads = [threading.Thread(target=register, args=(start,)) for start in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.progress() == (200, 200)
+    assert store.update_email('123', 'x@test.com')[0] is False
+    assert store.update_emails({'600000000': 'new@test.com', '123': 'x@test.com'}) == ['123']
+    assert store.get('600000000')['email'] == 'new@test.com'
+
+def test_sqlite_ledger(tmp_path):
+    store = sqlite_store.SqliteStore(str(tmp_path / 'participants.db'))
+    ledger = delivery_ledger.SqliteLedger(store)
+    pairs = [({'name': 'A', 'email': 'a@test.com'}, {'name': 'B'}), ({'name': 'B', 'email': 'b@test.com'}, {'name': 'A'})]
+    entries = ledger.record('draw-1', pairs)
+    entries[1]['status'] = 'sent'
+    ledger.update([entries[1]])
+    assert [e['status'] for e in ledger.load('draw-1')] == ['pending', 'sent']
+
+    draw_2 = ledger.record('draw-2', [(pairs[0][0], {'name': 'C'})])
+    draw_3 = ledger.record('draw-3', [(pairs[0][0], {'name': 'D'})])
+    # draw-1 was in 2024, draw-2 in 2025 and draw-3 later in 2025 but never sent
+    for entries, year, status in ((entries, 2024, 'sent'), (draw_2, 2025, 'sent'), (draw_3, 2025, 'failed')):
+        for entry in entries:
+            entry.update(drawn_at=time.mktime((year, 12, 1 + len(entries), 12, 0, 0, 0, 0, -1)), status=status)
+        ledger.update(entries)
+    now = time.mktime((2026, 6, 1, 12, 0, 0, 0, 0, -1))
+    assert ledger.recent_pairs(1, now) == [('A', 'C')]
+    assert ledger.recent_pairs(2, now) == [('A', 'C'), ('A', 'B'), ('B', 'A')]
@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+import time
+import draw_jobs
+import delivery_ledger
+from async_supabase import AsyncSupabaseClient
+from supabase_client import SupabaseClient, SupabaseError
+from stubs.postgrest_server import StubPostgRESTServer, load_schema
+
+@pytest.fixture
+def server():
+    rows = [
+        {'id': str(600000000 + i), 'name': f'P{i}', 'relationship': '', 'email': '', 'notes': 'x' * 50}
+        for i in range(2500)
+    ]
+    server = StubPostgRESTServer({'participants': rows}).start()
+    yield server
+    server.stop()
+
+def test_paginated_select_on_one_connection(server):
+    client = SupabaseClient(server.url, server.key)
+    rows = list(client.select('participants', columns='id,name,email', page_size=1000))
+
+    assert len(rows) == 2500
+    assert set(rows[0]) == {'id', 'name', 'email'}
+    # The stub shuffles unordered results, like Postgres may: pages must be
+    # sorted on the key or rows get skipped and repeated
+    assert len({row['id'] for row in rows}) == 2500
+    assert all('order=id' in path for _, path in server.requests)
+    # Three pages over a single keep-alive connection
+    assert len(server.requests) == 3
+    assert server.connections == 1
+
+def test_update_and_errors(server):
+    client = SupabaseClient(server.url, server.key)
+    updated = client.update('participants', "id=eq.600000007", {'email': 'p7@test.com'})
+    assert updated[0]['email'] == 'p7@test.com'
+    assert client.update('participants', "id=eq.123", {'email': 'x@test.com'}) == []
+
+    bad_client = SupabaseClient(server.url, 'wrong-key')
+    with pytest.raises(SupabaseError) as error:
+        list(bad_client.select('participants'))
+    assert error.value.code == 401
+
+def test_job_store_and_ledger_over_supabase(server):
+    client = SupabaseClient(server.url, server.key)
+    store = draw_jobs.SupabaseJobStore(client)
+    job = store.try_start('admin')
+    assert job is not None
+    assert store.try_start('admin') is None
+    store.update(job, status='done')
+    assert store.get()['status'] == 'done'
+    assert store.try_start('auto', skip_if_done=True) is None
+    assert store.try_resume(job['id'])['status'] == 'queued'
+
+    # A stale running job can be replaced, an old completed one only by the admin
+    server.tables['draw_jobs'][0].update(status='running', updated_at=0)
+    assert store.try_start('admin') is not None
+    server.tables['draw_jobs'][0].update(status='done', updated_at=0)
+    assert store.try_start('auto', skip_if_done=True) is None
+
+    ledger = delivery_ledger.SupabaseLedger(client)
+    people = [{'phone': '1', 'name': 'A', 'email': 'a@test.com'}, {'phone': '2', 'name': 'B', 'email': 'b@test.com'}]
+    entries = ledger.record(job['id'], [(people[0], people[1]), (people[1], people[0])])
+    entries[1]['status'] = 'sent'
+    ledger.update([entries[1]])
+    assert [e['status'] for e in ledger.load(job['id'])] == ['pending', 'sent']
+
+def test_job_store_against_shipped_schema():
+    schema = load_schema('supabase_schema.sql')
+    assert schema['draw_jobs']['keys'] == [('slot',)]
+    assert {'created_at', 'updated_at'} <= set(schema['draw_jobs']['numeric'])
+
+    server = StubPostgRESTServer(schema=schema).start()
+    try:
+        store = draw_jobs.SupabaseJobStore(SupabaseClient(server.url, server.key))
+        job = store.try_start('admin')
+        assert store.try_start('auto') is None
+        store.update(job, status='running', total=3, sent=1)
+        store.update(job, status='done')
+        assert store.try_resume(job['id'])['status'] == 'queued'
+        server.tables['draw_jobs'][0].update(status='running', updated_at=0)
+        assert store.try_start('admin') is not None
+        assert len(server.tables['draw_jobs']) == 1
+
+        # What a timestamptz column or a missing key would have let through
+        with pytest.raises(SupabaseError) as error:
+            store._client.update('draw_jobs', 'slot=eq.current', {'updated_at': '2026-01-01T00:00:00Z'})
+        assert error.value.code == 400
+        with pytest.raises(SupabaseError) as error:
+            store._client.upsert('draw_jobs', [dict(server.tables['draw_jobs'][0])], on_conflict='job_id')
+        assert error.value.code == 400
+    finally:
+        server.stop()
+
+def test_ledger_against_shipped_schema():
+    schema = load_schema('supabase_schema.sql')
+    assert schema['deliveries']['keys'] == [('draw_id', 'position')]
+
+    server = StubPostgRESTServer(schema=schema).start()
+    try:
+        ledger = delivery_ledger.SupabaseLedger(SupabaseClient(server.url, server.key))
+        people = [{'phone': str(i), 'name': f'P{i}', 'email': f'p{i}@test.com'} for i in range(3)]
+        first = ledger.record('d1', [(people[i], people[(i + 1) % 3]) for i in range(3)])
+        first[2]['status'] = 'sent'
+        first[2]['attempts'] = 1
+        ledger.update(first)
+        assert [e['status'] for e in ledger.load('d1')] == ['pending', 'pending', 'sent']
+
+        # d1 was drawn in 2024, d2 in 2025; d3 (2025 too) sent nothing
+        ledger.record('d2', [(people[i], people[(i + 2) % 3]) for i in range(3)])
+        ledger.record('d3', [(people[i], people[(i + 1) % 3]) for i in range(3)])
+        drawn = {'d1': (2024, 'pending'), 'd2': (2025, 'sent'), 'd3': (2025, 'failed')}
+        for row in server.tables['deliveries']:
+            year, status = drawn[row['draw_id']]
+            day = 2 if row['draw_id'] == 'd3' else 1
+            row['drawn_at'] = time.mktime((year, 12, day, 12, 0, 0, 0, 0, -1))
+            if row['status'] != 'sent':
+                row['status'] = status
+
+        assert len(server.tables['deliveries']) == 9
+        now = time.mktime((2026, 6, 1, 12, 0, 0, 0, 0, -1))
+        assert ledger.recent_pairs(1, now) == [('P0', 'P2'), ('P1', 'P0'), ('P2', 'P1')]
+        assert len(ledger.recent_pairs(2, now)) == 6
+    finally:
+        server.stop()
+
+def test_async_client(server):
+    async def scenario():
+        client = AsyncSupabaseClient(server.url, server.key)
+        rows = await client.select('participants', columns='id,email', page_size=1000)
+        updated = await client.update('participants', "id=eq.600000007", {'email': 'p7@test.com'})
+        missing = await client.update('participants', "id=eq.123", {'email': 'x@test.com'})
+        with pytest.raises(SupabaseError) as error:
+            await AsyncSupabaseClient(server.url, 'wrong-key').select('participants')
+        await client.close()
+        return rows, updated, missing, error.value.code
+
+    rows, updated, missing, code = asyncio.run(scenario())
+    assert len(rows) == 2500 and set(rows[0]) == {'id', 'email'}
+    assert updated[0]['email'] == 'p7@test.com'
+    assert missing == []
+    assert code == 401
+    # Four requests, one keep-alive connection for the working client
+    assert server.connections == 2
+
+def test_async_connect_is_bounded_by_timeout(monkeypatch):
+    async def never_connects(*args, **kwargs):
+        await asyncio.sleep(60)
+    monkeypatch.setattr(asyncio, 'open_connection', never_connects)
+
+    client = AsyncSupabaseClient('http://10.255.255.1', 'key', timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.request('GET', 'participants'))
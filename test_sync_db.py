@@ -0,0 +1,46 @@
+import sync_db
+from supabase_client import SupabaseClient
+from stubs.postgrest_server import StubPostgRESTServer
+
+def test_sync_uploads_only_the_difference(tmp_path):
+    path = tmp_path / 'participants.csv'
+    lines = ['ID;nombre;parentesco;email']
+    lines += [f'{600000000 + i};P{i};;' for i in range(1200)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    # Remote already has the first 1000 rows, one of them outdated
+    remote = [{'id': str(600000000 + i), 'name': f'P{i}', 'relationship': None, 'email': None} for i in range(1000)]
+    remote[5]['name'] = 'Old name'
+    server = StubPostgRESTServer({'participants': remote}).start()
+    try:
+        client = SupabaseClient(server.url, server.key)
+        report = sync_db.sync(chunk_size=50, workers=4, client=client, path=str(path))
+        uploads = [r for r in server.requests if r[0] == 'POST']
+        again = sync_db.sync(chunk_size=50, workers=4, client=client, path=str(path))
+    finally:
+        server.stop()
+
+    assert (report['inserted'], report['changed'], report['unchanged']) == (200, 1, 999)
+    assert report['chunks'] == len(uploads) == 5
+    assert len(server.tables['participants']) == 1200
+    assert server.tables['participants'][5]['name'] == 'P5'
+    assert (again['inserted'], again['changed'], again['chunks']) == (0, 0, 0)
+
+def test_diff_treats_numeric_ids_as_text():
+    local = [{'id': '1', 'name': 'A', 'relationship': '', 'email': ''}]
+    remote = [{'id': 1, 'name': 'A ', 'relationship': None, 'email': None}]
+    assert sync_db.diff(local, remote) == ([], [], 1)
+
+def test_sync_keeps_groups(tmp_path):
+    path = tmp_path / 'participants.csv'
+    path.write_text('ID;nombre;parentesco;email;grupo\n1;A;;;oficina\n2;B;;;familia\n', encoding='utf-8')
+    remote = [{'id': 1, 'name': 'A', 'relationship': None, 'email': None, 'team': 'oficina'}]
+    server = StubPostgRESTServer({'participants': remote}).start()
+    try:
+        client = SupabaseClient(server.url, server.key)
+        report = sync_db.sync(client=client, path=str(path), group_column='team')
+    finally:
+        server.stop()
+
+    assert (report['inserted'], report['changed'], report['unchanged']) == (1, 0, 1)
+    assert server.tables['participants'][1]['team'] == 'familia'